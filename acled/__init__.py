@@ -0,0 +1,3 @@
+"""
+Data layer shared by the Armed Conflicts Analytics dashboard and its build steps.
+"""
@@ -0,0 +1,257 @@
+"""
+Command-line build steps for the dashboard data.
+
+Usage:
+    python -m acled snapshot [--csv PATH] [--out PATH]
+    python -m acled partitions [--csv PATH] [--out PATH]
+    python -m acled clean [--raw PATH] [--out PATH] [--chunksize N]
+    python -m acled features [--clean PATH] [--out PATH] [--chunksize N]
+    python -m acled eps [--features PATH] [--min-samples N ...] [--sample N] [--jobs N] [--plot PATH]
+    python -m acled cluster [--features PATH] [--out PATH] [--sample N] [--eps X] [--min-samples N] [--jobs N]
+    python -m acled knn [--features PATH] [--clusters PATH] [--out PATH]
+    python -m acled propagate [--features PATH] [--model PATH] [--out PATH] [--batch-size N] [--jobs N]
+    python -m acled tails [--top N] [--bootstrap N] [--jobs N] [--out PATH]
+    python -m acled profiles [--out PATH]
+    python -m acled assign BATCH_CSV [--store PATH] [--features PATH] [--model PATH] [--clean PATH]
+    python -m acled export CONFIGS_JSON [--each KEY ...] [--format parquet|json] [--granularity G] [--jobs N] [--out PATH]
+    python -m acled serve [--app PATH] [--server.port N ...]
+"""
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+from acled import (cleaning, clustering, export, features, incremental, kdistance, profiles, propagation, store,
+                   tailfit)
+from acled.filters import filter_options
+from acled.timeindex import GRANULARITIES, TimeIndex
+
+
+def _snapshot(args: argparse.Namespace) -> None:
+    path = store.build_snapshot(args.csv, args.out)
+    print(f"Snapshot written to {path}")
+
+
+def _partitions(args: argparse.Namespace) -> None:
+    path = store.build_partitioned_store(args.csv, args.out)
+    print(f"Partitioned store written to {path}")
+
+
+def _clean(args: argparse.Namespace) -> None:
+    path = cleaning.clean_export(args.raw, args.out, args.chunksize)
+    print(f"Cleaned export written to {path}")
+
+
+def _features(args: argparse.Namespace) -> None:
+    path = features.build_features(args.clean, args.out, args.chunksize)
+    print(f"Feature matrix written to {path}")
+
+
+def _eps(args: argparse.Namespace) -> None:
+    curves = kdistance.feature_curves(args.features, args.min_samples, args.sample, args.jobs)
+    first = next(iter(curves.values()))
+    print(f"k-distance curves from {first.sample_size:,} query rows, within {first.tolerance:.2%} "
+          f"of the rows of the exact curves ({first.confidence:.0%} confidence)")
+    print(f"{'min_samples':>11} {'eps (knee)':>10} {'band':>15}")
+    for k, curve in curves.items():
+        band = f"{curve.knee_lower:.3f}-{curve.knee_upper:.3f}"
+        print(f"{k:>11} {curve.knee:>10.3f} {band:>15}")
+    if args.plot is not None:
+        print(f"Plot written to {kdistance.plot_curves(curves, args.plot)}")
+
+
+def _cluster(args: argparse.Namespace) -> None:
+    path = clustering.cluster_features(args.features, args.out, args.sample, args.eps, args.min_samples, args.jobs)
+    print(f"Cluster labels written to {path}")
+
+
+def _knn(args: argparse.Namespace) -> None:
+    path = propagation.train_knn(args.features, args.clusters, args.out)
+    print(f"k-NN model written to {path}")
+
+
+def _propagate(args: argparse.Namespace) -> None:
+    def progress(done: int, total: int) -> None:
+        print(f"\r{done}/{total} batches", end="", flush=True)
+
+    path = propagation.propagate(args.features, args.model, args.out, args.batch_size, args.jobs, progress)
+    print(f"\nPropagated labels written to {path}")
+
+
+def _tails(args: argparse.Namespace) -> None:
+    # the events the dashboard shows: the partitioned store if built, else the deployment sample
+    df = store.read_partitions() if store.PARTITIONED_STORE.exists() else store.load_frame()
+    path = tailfit.build_tail_table(df, args.out, args.top or None, args.bootstrap, args.jobs)
+    print(f"Tail fits written to {path}")
+
+
+def _profiles(args: argparse.Namespace) -> None:
+    # the store's generation, or the deploy CSV's size and mtime, lets the dashboard
+    # tell whether the saved profiles are stale
+    if store.PARTITIONED_STORE.exists():
+        df, generation, source_file = store.read_partitions(), store.read_summary().get("generation"), None
+    else:
+        source_file = store.source_file()
+        df, generation = store.load_frame(), None
+    path = profiles.build_profiles(df, args.out, generation, source_file)
+    print(f"Cluster profiles written to {path}")
+
+
+def _assign(args: argparse.Namespace) -> None:
+    counts = incremental.assign_batch(args.batch, args.store, args.features, args.model, args.clean)
+    print(f"{counts['events']} events read: {counts['added']} added, {counts['replaced']} replaced, "
+          f"{counts['skipped']} skipped")
+
+
+def _export(args: argparse.Namespace) -> None:
+    # the events the dashboard shows, with its sidebar options
+    if store.PARTITIONED_STORE.exists():
+        summary = store.read_summary()
+        df, generation, source_file = store.read_partitions(), summary.get("generation"), None
+    else:
+        summary, source_file = None, store.source_file()
+        df, generation = store.load_frame(), None
+    options = filter_options(summary, None if summary is not None else df)
+    configs = export.expand(export.read_configs(args.configs), options, args.each)
+
+    # the saved profile cells while they match the data, as in the dashboard
+    cluster_profiles = None
+    if profiles.PROFILES.exists():
+        cluster_profiles = profiles.read_profiles()
+        if cluster_profiles.source != {"rows": len(df), "generation": generation, "source_file": source_file}:
+            cluster_profiles = None
+    if cluster_profiles is None:
+        cluster_profiles = profiles.ClusterProfiles.from_frame(df, generation, source_file)
+
+    path = export.export(TimeIndex(df), cluster_profiles, options, configs, args.out, args.format,
+                         args.granularity, args.jobs)
+    print(f"Metrics of {len(configs)} filter configurations written to {path}")
+
+
+def _serve(args: argparse.Namespace) -> None:
+    from streamlit.web import cli
+
+    from acled import warmup
+
+    # progress of the warm-up on stderr, next to Streamlit's own log
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(message)s"))
+    warmup.logger.addHandler(handler)
+    warmup.logger.setLevel(logging.INFO)
+
+    # Streamlit runs in this process, so the dashboard finds the warm-up's results
+    warmup.start()
+    sys.argv = ["streamlit", "run", str(args.app), *args.streamlit_options]
+    cli.main()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m acled", description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    snapshot = commands.add_parser("snapshot", help="build the typed Arrow snapshot of the deployment CSV")
+    snapshot.add_argument("--csv", type=Path, default=store.DEPLOY_CSV)
+    snapshot.add_argument("--out", type=Path, default=store.SNAPSHOT)
+    snapshot.set_defaults(func=_snapshot)
+
+    partitions = commands.add_parser(
+        "partitions", help="build the year/region partitioned store of the full-resolution dataset"
+    )
+    partitions.add_argument("--csv", type=Path, default=store.FULL_CSV)
+    partitions.add_argument("--out", type=Path, default=store.PARTITIONED_STORE)
+    partitions.set_defaults(func=_partitions)
+
+    clean = commands.add_parser("clean", help="clean the raw ACLED export in bounded-memory chunks")
+    clean.add_argument("--raw", type=Path, default=cleaning.RAW_CSV)
+    clean.add_argument("--out", type=Path, default=cleaning.CLEAN_CSV)
+    clean.add_argument("--chunksize", type=int, default=cleaning.CHUNK_SIZE)
+    clean.set_defaults(func=_clean)
+
+    matrix = commands.add_parser("features", help="encode the cleaned export into the memory-mapped feature matrix")
+    matrix.add_argument("--clean", type=Path, default=cleaning.CLEAN_CSV)
+    matrix.add_argument("--out", type=Path, default=features.FEATURES_DIR)
+    matrix.add_argument("--chunksize", type=int, default=cleaning.CHUNK_SIZE)
+    matrix.set_defaults(func=_features)
+
+    eps = commands.add_parser("eps", help="estimate the k-distance curves and their knees for choosing eps")
+    eps.add_argument("--features", type=Path, default=features.FEATURES_DIR)
+    eps.add_argument("--min-samples", type=int, nargs="+", default=kdistance.SWEEP)
+    eps.add_argument("--sample", type=int, default=kdistance.SAMPLE_SIZE, help="query rows")
+    eps.add_argument("--jobs", type=int, default=-1, help="query threads (-1: one per CPU)")
+    eps.add_argument("--plot", type=Path, default=None, help="save the k-distance plot to this file")
+    eps.set_defaults(func=_eps)
+
+    cluster = commands.add_parser("cluster", help="DBSCAN-cluster the feature matrix, or a sample of it")
+    cluster.add_argument("--features", type=Path, default=features.FEATURES_DIR)
+    cluster.add_argument("--out", type=Path, default=clustering.CLUSTERS)
+    cluster.add_argument("--sample", type=int, default=None, help="rows to sample (default: all rows)")
+    cluster.add_argument("--eps", type=float, default=clustering.EPS)
+    cluster.add_argument("--min-samples", type=int, default=clustering.MIN_SAMPLES)
+    cluster.add_argument("--jobs", type=int, default=-1, help="worker processes (-1: one per CPU)")
+    cluster.set_defaults(func=_cluster)
+
+    knn = commands.add_parser("knn", help="fit the k-NN classifier on the clustered rows")
+    knn.add_argument("--features", type=Path, default=features.FEATURES_DIR)
+    knn.add_argument("--clusters", type=Path, default=clustering.CLUSTERS)
+    knn.add_argument("--out", type=Path, default=propagation.KNN_MODEL)
+    knn.set_defaults(func=_knn)
+
+    propagate = commands.add_parser(
+        "propagate", help="label every row with the k-NN classifier, resuming if interrupted"
+    )
+    propagate.add_argument("--features", type=Path, default=features.FEATURES_DIR)
+    propagate.add_argument("--model", type=Path, default=propagation.KNN_MODEL)
+    propagate.add_argument("--out", type=Path, default=propagation.FULL_LABELS)
+    propagate.add_argument("--batch-size", type=int, default=propagation.BATCH_SIZE)
+    propagate.add_argument("--jobs", type=int, default=-1, help="worker processes (-1: one per CPU)")
+    propagate.set_defaults(func=_propagate)
+
+    tails = commands.add_parser("tails", help="fit the fatality tails of clusters and regions, with bootstrap intervals")
+    tails.add_argument("--top", type=int, default=15, help="largest clusters to fit (0: all clusters)")
+    tails.add_argument("--bootstrap", type=int, default=tailfit.N_BOOTSTRAP, help="resamples per group")
+    tails.add_argument("--jobs", type=int, default=-1, help="worker processes (-1: one per CPU)")
+    tails.add_argument("--out", type=Path, default=tailfit.TAIL_FITS)
+    tails.set_defaults(func=_tails)
+
+    cluster_profiles = commands.add_parser(
+        "profiles", help="aggregate the mergeable cluster profiles of the Cluster Profile tab"
+    )
+    cluster_profiles.add_argument("--out", type=Path, default=profiles.PROFILES)
+    cluster_profiles.set_defaults(func=_profiles)
+
+    assign = commands.add_parser("assign", help="label newly published events and upsert them into the store")
+    assign.add_argument("batch", type=Path, help="CSV with the raw ACLED export columns")
+    assign.add_argument("--store", type=Path, default=store.PARTITIONED_STORE)
+    assign.add_argument("--features", type=Path, default=features.FEATURES_DIR)
+    assign.add_argument("--model", type=Path, default=propagation.KNN_MODEL)
+    assign.add_argument("--clean", type=Path, default=cleaning.CLEAN_CSV, help="cleaned export whose medians to use")
+    assign.set_defaults(func=_assign)
+
+    batch = commands.add_parser(
+        "export", help="export the dashboard metrics of many filter configurations, without Streamlit"
+    )
+    batch.add_argument("configs", type=Path, help="JSON list of named filter configurations")
+    batch.add_argument("--each", nargs="+", default=[], choices=list(export.FILTER_OPTIONS),
+                       help="split every configuration into one per value of these filters")
+    batch.add_argument("--format", choices=export.FORMATS, default="parquet")
+    batch.add_argument("--granularity", choices=list(GRANULARITIES), default="Month", help="of the cluster timelines")
+    batch.add_argument("--jobs", type=int, default=-1, help="worker processes (-1: one per CPU)")
+    batch.add_argument("--out", type=Path, default=export.EXPORTS)
+    batch.set_defaults(func=_export)
+
+    serve = commands.add_parser(
+        "serve", help="run the dashboard, warming up its data in the background from server start"
+    )
+    serve.add_argument("--app", type=Path, default=store.ROOT / "dashboard_app.py")
+    serve.set_defaults(func=_serve)
+
+    # options the parser does not know are passed on to `streamlit run` by serve
+    args, args.streamlit_options = parser.parse_known_args(argv)
+    if args.streamlit_options and args.func is not _serve:
+        parser.error(f"unrecognized arguments: {' '.join(args.streamlit_options)}")
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
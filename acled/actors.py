@@ -0,0 +1,144 @@
+"""
+Inverted index over the actors of the events, for the sidebar's actor filter.
+
+ACLED names the two sides of an event in actor1 and actor2; there are
+thousands of actors, far too many for one bitmap each as in FilterIndex.
+Both columns are dictionary-encoded against one sorted dictionary of actor
+names (an actor has the same id on either side), and every actor keeps the
+sorted positions of the rows it appears in, on either side, compressed as in
+Roaring bitmaps:
+
+- row positions are split into blocks of 65,536 rows; within a block a
+  position is its low 16 bits, stored as a uint16 (2 bytes per row instead
+  of 4);
+- a block where the actor has more than BITMAP_THRESHOLD rows stores a
+  65,536-bit bitmap instead (8 KB), which is smaller from that count on.
+
+The rows of one actor decode from its blocks only, so their cost follows
+the events of the actor, not the size of the dataset; combined with other
+filters, the blocks are ORed into a packed row mask like FilterIndex's
+(a bitmap block as a whole). Names are also kept
+case-folded in sorted order, so the names starting with a typed prefix are
+one binary search away.
+"""
+
+import numpy as np
+import pandas as pd
+
+from acled.derive import category_codes
+
+ACTOR_COLUMNS = ["actor1", "actor2"]
+
+# rows per block, and the rows in a block above which it is stored as a bitmap
+BLOCK_BITS = 16
+BITMAP_THRESHOLD = (1 << BLOCK_BITS) // 16
+
+
+def _dictionary_codes(values: pd.Series, names: pd.Index) -> np.ndarray:
+    """Position in `names` of every value (-1 for missing)."""
+    codes, uniques = category_codes(values)
+    # code -1 reads the appended -1
+    lookup = np.append(names.get_indexer(uniques), -1)
+    return lookup[codes]
+
+
+class ActorIndex:
+    """Compressed row lists of every actor of one loaded dataset, with prefix search over the names."""
+
+    def __init__(self, df: pd.DataFrame, columns: list = ACTOR_COLUMNS):
+        self.n_rows = len(df)
+        values = [df[col] for col in columns]
+        names = set()
+        for column in values:
+            present = column.cat.categories if isinstance(column.dtype, pd.CategoricalDtype) else column.dropna()
+            names.update(name for name in present.tolist() if name)
+        self.names = pd.Index(sorted(names), dtype=object)
+
+        # (actor, row) of every side naming an actor, once per event, sorted by actor then row
+        ids = np.concatenate([_dictionary_codes(column, self.names) for column in values])
+        rows = np.tile(np.arange(self.n_rows, dtype=np.int64), len(values))
+        named = ids >= 0
+        keys = np.unique(ids[named].astype(np.int64) * self.n_rows + rows[named])
+        actors, rows = keys // self.n_rows, keys % self.n_rows
+        self.counts = np.bincount(actors, minlength=len(self.names)).astype(np.int32)
+
+        # one block per (actor, high bits of the row), in the same order
+        blocks = actors * ((self.n_rows >> BLOCK_BITS) + 1) + (rows >> BLOCK_BITS)
+        starts = np.flatnonzero(np.diff(blocks, prepend=-1))
+        sizes = np.diff(np.append(starts, len(blocks)))
+        self._block_high = (rows[starts] >> BLOCK_BITS).astype(np.int32)
+        self._offsets = np.searchsorted(actors[starts], np.arange(len(self.names) + 1)).astype(np.int32)
+
+        # dense blocks as bitmaps, the others as their low 16 bits
+        dense = sizes > BITMAP_THRESHOLD
+        self._block_bitmap = np.where(dense, np.cumsum(dense) - 1, -1).astype(np.int32)
+        sparse_rows = np.repeat(~dense, sizes)
+        self._low = (rows[sparse_rows] & 0xFFFF).astype(np.uint16)
+        self._low_offsets = np.concatenate([[0], np.cumsum(np.where(dense, 0, sizes))]).astype(np.int64)
+        self._bitmaps = np.zeros((dense.sum(), (1 << BLOCK_BITS) // 8), dtype=np.uint8)
+        for bitmap, start, size in zip(range(dense.sum()), starts[dense], sizes[dense]):
+            bits = np.zeros(1 << BLOCK_BITS, dtype=bool)
+            bits[rows[start:start + size] & 0xFFFF] = True
+            self._bitmaps[bitmap] = np.packbits(bits)
+
+        # case-folded names in sorted order, for prefix search
+        folded = np.array([name.casefold() for name in self.names], dtype=str)
+        self._search_order = np.argsort(folded, kind="stable").astype(np.int32)
+        self._folded = folded[self._search_order]
+
+    @property
+    def nbytes(self) -> int:
+        arrays = [self.counts, self._block_high, self._offsets, self._block_bitmap, self._low, self._low_offsets,
+                  self._bitmaps, self._search_order, self._folded]
+        return sum(a.nbytes for a in arrays) + int(self.names.memory_usage(deep=True))
+
+    def _decode(self, actor: int) -> np.ndarray:
+        """Sorted row positions of one actor."""
+        pieces = []
+        for block in range(self._offsets[actor], self._offsets[actor + 1]):
+            base = np.int64(self._block_high[block]) << BLOCK_BITS
+            bitmap = self._block_bitmap[block]
+            if bitmap >= 0:
+                pieces.append(base + np.flatnonzero(np.unpackbits(self._bitmaps[bitmap])))
+            else:
+                pieces.append(base + self._low[self._low_offsets[block]:self._low_offsets[block + 1]])
+        return np.concatenate(pieces) if pieces else np.zeros(0, dtype=np.int64)
+
+    def mask(self, names) -> np.ndarray:
+        """Packed row mask (as np.packbits) of the events naming any of `names` on either side."""
+        mask = np.zeros((self.n_rows + 7) // 8, dtype=np.uint8)
+        block_bytes = (1 << BLOCK_BITS) // 8
+        ids = self.names.get_indexer(list(names))
+        for actor in ids[ids >= 0]:
+            for block in range(self._offsets[actor], self._offsets[actor + 1]):
+                first = int(self._block_high[block]) * block_bytes
+                bitmap = self._block_bitmap[block]
+                if bitmap >= 0:
+                    # blocks start on a byte, so a bitmap is ORed in as a whole
+                    stop = min(first + block_bytes, len(mask))
+                    np.bitwise_or(mask[first:stop], self._bitmaps[bitmap][:stop - first], out=mask[first:stop])
+                    continue
+                low = self._low[self._low_offsets[block]:self._low_offsets[block + 1]].astype(np.int64)
+                # the rows are sorted and distinct: the bits of each byte sum to their OR
+                byte, starts = np.unique(low >> 3, return_index=True)
+                bits = np.add.reduceat((128 >> (low & 7)).astype(np.uint8), starts)
+                mask[first + byte] |= bits
+        return mask
+
+    def rows(self, names) -> np.ndarray:
+        """Sorted row positions of the events naming any of `names` on either side; unknown names match nothing."""
+        ids = self.names.get_indexer(list(names))
+        ids = ids[ids >= 0]
+        if len(ids) == 1:
+            return self._decode(ids[0]).astype(np.int32)
+        return np.flatnonzero(np.unpackbits(self.mask(names), count=self.n_rows)).astype(np.int32)
+
+    def search(self, prefix: str, limit: int = 50) -> list:
+        """Names starting with `prefix` (ignoring case), the most active actors first, at most `limit`."""
+        prefix = prefix.strip().casefold()
+        lo = np.searchsorted(self._folded, prefix, side="left")
+        hi = np.searchsorted(self._folded, prefix + "\U0010ffff", side="left")
+        matches = self._search_order[lo:hi]
+        matches = matches[self.counts[matches] > 0]
+        best = matches[np.argsort(-self.counts[matches], kind="stable")[:limit]]
+        return self.names[best].tolist()
@@ -0,0 +1,103 @@
+"""
+Process-wide LRU cache of filter results.
+
+Sessions that land on the same sidebar selections (all regions, one region,
+the default date range, ...) share one cached result: the selected row
+positions and the cube slice the pages aggregate from. Entries are keyed by a
+canonical signature of the global_filters dict and evicted least recently
+used first once the configured memory ceiling is reached. The same cache
+holds other per-selection results, such as the Pareto page's tail fits.
+"""
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+
+def filter_signature(filters: dict) -> tuple:
+    """Order-independent, hashable key for a global_filters dict."""
+    signature = []
+    for key in sorted(filters):
+        value = filters[key]
+        if key == "date_range":
+            value = tuple(str(np.datetime64(day, "D")) for day in value)
+        else:
+            value = tuple(sorted(value or ()))
+        signature.append((key, value))
+    return tuple(signature)
+
+
+@dataclass(frozen=True)
+class FilterResult:
+    """Row selection and cube slice for one filter signature."""
+
+    rows: np.ndarray
+    cells: pd.DataFrame
+
+    @property
+    def nbytes(self) -> int:
+        return self.rows.nbytes + int(self.cells.memory_usage(deep=True).sum())
+
+
+class ResultCache:
+    """Thread-safe LRU mapping of filter signature -> result (with an `nbytes` size), bounded in bytes."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, filters: dict, compute):
+        """Cached result for `filters`, calling `compute(filters)` on a miss."""
+        key = filter_signature(filters)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        # compute outside the lock so other sessions are not blocked
+        result = compute(filters)
+        self._put(key, result)
+        return result
+
+    def _put(self, key: tuple, result) -> None:
+        size = result.nbytes
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = result
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,275 @@
+"""
+Chunked cleaning of the raw ACLED export (notebooks/02_cleaning_engineering.ipynb).
+
+The raw export is streamed in fixed-size chunks, so memory is bounded by the
+chunk size rather than the export size. Two passes are made:
+
+1. count population_best per country on fixed log-spaced bins (a mergeable
+   quantile sketch, as in DDSketch) to get the per-country medians;
+2. apply the notebook's column drops, source_scale/region remapping, Oceania
+   removal and median fill, and append each cleaned chunk to the output CSV.
+
+The sketch of a country has N_BINS counts whatever the size of the export,
+and a median read from it is within MEDIAN_ERROR (relative) of the exact
+one, so the output is the notebook's acled_clean.csv up to the filled
+population_best values. The medians are saved next to it
+(acled_clean_medians.json) to fill newly published events the same way,
+see acled/incremental.py.
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from acled.store import ROOT
+
+# ---------------- Paths ----------------
+RAW_CSV = ROOT / "data" / "raw" / "original_acled.csv"
+CLEAN_CSV = ROOT / "data" / "clean" / "acled_clean.csv"
+
+CHUNK_SIZE = 200_000
+
+# ---------------- Loading (notebook 01/02) ----------------
+TO_KEEP = ['event_id_cnty', 'event_date', 'disorder_type', 'event_type', 'sub_event_type', 'actor1',
+           'inter1', 'actor2', 'inter2', 'interaction', 'region', 'country', 'latitude', 'longitude',
+           'geo_precision', 'source', 'source_scale', 'notes', 'fatalities', 'population_1km',
+           'population_best']
+
+DTYPE_MAP = {
+    "event_id_cnty": "string",
+    "disorder_type": "category",
+    "event_type": "category",
+    "sub_event_type": "category",
+    "actor1": "category",
+    "inter1": "category",
+    "actor2": "category",
+    "inter2": "category",
+    "interaction": "category",
+    "region": "category",
+    "country": "category",
+    "latitude": "float32",
+    "longitude": "float32",
+    "geo_precision": "int8",
+    "source": "category",
+    "source_scale": "category",
+    "notes": "string",
+    "fatalities": "int16",
+    "population_1km": "float32",
+    "population_best": "float32"
+}
+
+# columns dropped in notebook 02, see the notebook for the reasoning behind each
+DROPPED_COLUMNS = ['disorder_type', 'event_date', 'actor1', 'actor2', 'inter1', 'inter2',
+                   'population_1km', 'source', 'notes']
+
+CLEAN_COLUMNS = [col for col in TO_KEEP if col not in DROPPED_COLUMNS]
+
+# ---------------- Remapping (notebook 02) ----------------
+SOURCE_SCALE_MAPPING = {
+    # LOCAL / SUBNATIONAL
+    'Subnational': 'Local/Subnational',
+    'Local partner-Other': 'Local/Subnational',
+    'Local partner-Regional': 'Local/Subnational',
+    'Local partner-National': 'Local/Subnational',
+    'Local partner-New media': 'Local/Subnational',
+    'Local partner-International': 'Local/Subnational',
+    'Subnational-National': 'Local/Subnational',
+    'Other-Subnational': 'Local/Subnational',
+    'New media-Subnational': 'Local/Subnational',
+    'Subnational-Regional': 'Local/Subnational',
+    'Subnational-International': 'Local/Subnational',
+    # NATIONAL
+    'National': 'National',
+    'National-Regional': 'National',
+    'National-International': 'National',
+    'Other-National': 'National',
+    'New media-National': 'National',
+    # REGIONAL
+    'Regional': 'Regional',
+    'Regional-International': 'Regional',
+    'Other-Regional': 'Regional',
+    'New media-Regional': 'Regional',
+    # INTERNATIONAL
+    'International': 'International',
+    'Other-International': 'International',
+    'New media-International': 'International',
+    # PURE NEW MEDIA
+    'New media': 'New media',
+    'Other-New media': 'New media',
+    # OTHER
+    'Other': 'Other'
+}
+
+REGION_MAPPING = {
+    # Africa (merge all African subregions)
+    'Africa': 'Africa',
+    'Middle Africa': 'Africa',
+    'Northern Africa': 'Africa',
+    'Southern Africa': 'Africa',
+    'Western Africa': 'Africa',
+    'Eastern Africa': 'Africa',
+
+    # Middle East
+    'Middle East': 'Middle East',
+
+    # Asia
+    'South Asia': 'Asia',
+    'Southeast Asia': 'Asia',
+    'East Asia': 'Asia',
+    'Central Asia': 'Asia',
+    'Caucasus and Central Asia': 'Asia',
+
+    # Europe
+    'Europe': 'Europe',
+    'Central Europe': 'Europe',
+    'Eastern Europe': 'Europe',
+
+    # Americas
+    'South America': 'Americas',
+    'Central America': 'Americas',
+    'North America': 'Americas',
+    'Caribbean': 'Americas',
+
+    # Oceania / Other
+    'Oceania': 'Oceania',
+    'Australia': 'Oceania',
+    'Pacific Islands': 'Oceania',
+
+    # Catch-all (in case ACLED returns unexpected labels)
+    'Other': 'Oceania'
+}
+
+
+# ---------------- Chunk transforms ----------------
+
+def read_chunks(raw_path: Path = RAW_CSV, chunksize: int = CHUNK_SIZE):
+    """Stream the raw export with the notebook dtypes, skipping the dropped columns."""
+    return pd.read_csv(
+        raw_path,
+        usecols=CLEAN_COLUMNS,
+        dtype={col: DTYPE_MAP[col] for col in CLEAN_COLUMNS},
+        chunksize=chunksize,
+        low_memory=False,
+    )
+
+
+def clean_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Row-local part of the notebook cleaning: remapping and Oceania removal."""
+    chunk = chunk[CLEAN_COLUMNS].copy()
+    chunk["source_scale"] = chunk["source_scale"].map(SOURCE_SCALE_MAPPING)
+    chunk["region"] = chunk["region"].map(REGION_MAPPING)
+
+    # drop 'Oceania' due to low number of events
+    return chunk[chunk["region"] != "Oceania"]
+
+
+# ---------------- Per-country medians ----------------
+
+# population_best is counted on log-spaced bins: bin k holds (GAMMA**(k-1), GAMMA**k]
+# and stands for the value 2 * GAMMA**k / (GAMMA + 1), within MEDIAN_ERROR of all of them.
+# Bin 0 holds the values <= 0; values outside [MIN_VALUE, MAX_VALUE] go to the end bins.
+MEDIAN_ERROR = 0.005
+GAMMA = (1 + MEDIAN_ERROR) / (1 - MEDIAN_ERROR)
+MIN_VALUE, MAX_VALUE = 1e-2, 1e10
+
+_FIRST_BIN = int(np.ceil(np.log(MIN_VALUE) / np.log(GAMMA)))
+_LAST_BIN = int(np.ceil(np.log(MAX_VALUE) / np.log(GAMMA)))
+N_BINS = _LAST_BIN - _FIRST_BIN + 2
+_BIN_VALUES = np.concatenate([[0.0], 2 * GAMMA ** np.arange(_FIRST_BIN, _LAST_BIN + 1) / (GAMMA + 1)])
+
+
+def population_bins(values: np.ndarray) -> np.ndarray:
+    """Sketch bin of every (non-null) population_best value."""
+    values = np.asarray(values, dtype=np.float64)
+    positive = values > 0
+    k = np.ceil(np.log(np.where(positive, values, 1.0)) / np.log(GAMMA))
+    bins = np.clip(k, _FIRST_BIN, _LAST_BIN).astype(np.int64) - _FIRST_BIN + 1
+    return np.where(positive, bins, 0)
+
+
+def count_population(chunk: pd.DataFrame, counts: dict) -> None:
+    """Add the chunk's non-null population_best values to the per-country sketches in `counts`."""
+    valid = chunk[["country", "population_best"]].dropna()
+    codes, countries = pd.factorize(valid["country"])
+    flat = codes.astype(np.int64) * N_BINS + population_bins(valid["population_best"].to_numpy())
+    binned = np.bincount(flat, minlength=len(countries) * N_BINS).reshape(len(countries), N_BINS)
+    for country, row in zip(countries, binned):
+        if country in counts:
+            counts[country] += row
+        else:
+            counts[country] = row
+
+
+def median_from_counts(counts: np.ndarray) -> np.float32:
+    """Median of the values counted in a sketch, within MEDIAN_ERROR of the exact one."""
+    cumulative = np.cumsum(counts)
+    total = cumulative[-1]
+
+    # bins of the lower and upper middle element in the sorted data
+    lower = _BIN_VALUES[np.searchsorted(cumulative, (total - 1) // 2, side="right")]
+    upper = _BIN_VALUES[np.searchsorted(cumulative, total // 2, side="right")]
+    return np.float32((lower + upper) / 2)
+
+
+def population_counts(raw_path: Path = RAW_CSV, chunksize: int = CHUNK_SIZE) -> dict:
+    """First pass: per-country sketch of population_best over the cleaned rows."""
+    counts = {}
+    for chunk in read_chunks(raw_path, chunksize):
+        count_population(clean_chunk(chunk), counts)
+    return counts
+
+
+def country_medians(raw_path: Path = RAW_CSV, chunksize: int = CHUNK_SIZE) -> dict:
+    """Per-country median of population_best over the cleaned rows."""
+    counts = population_counts(raw_path, chunksize)
+    return {country: median_from_counts(values) for country, values in counts.items()}
+
+
+def medians_path(clean_path: Path = CLEAN_CSV) -> Path:
+    return clean_path.with_name(clean_path.stem + "_medians.json")
+
+
+def read_medians(clean_path: Path = CLEAN_CSV) -> dict:
+    """Per-country medians used for the cleaned export, and the median over all countries."""
+    return json.loads(medians_path(clean_path).read_text())
+
+
+def fill_population(chunk: pd.DataFrame, medians: dict, overall: float = None) -> None:
+    """
+    Fill missing population_best in place with the median of the event's country,
+    or with `overall` for countries without one.
+    """
+    fill = chunk["country"].astype(object).map(medians).astype("float32")
+    if overall is not None:
+        fill = fill.fillna(np.float32(overall))
+    # groupby().transform() in the notebook also blanks rows without a country
+    chunk["population_best"] = chunk["population_best"].fillna(fill).where(chunk["country"].notna())
+
+
+# ---------------- Pipeline ----------------
+
+def clean_export(raw_path: Path = RAW_CSV, out_path: Path = CLEAN_CSV, chunksize: int = CHUNK_SIZE) -> Path:
+    """Clean the raw export chunk by chunk and write acled_clean.csv incrementally."""
+    counts = population_counts(raw_path, chunksize)
+    medians = {country: median_from_counts(values) for country, values in counts.items()}
+
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = out_path.with_suffix(".csv.tmp")
+    with open(tmp_path, "w", newline="") as out:
+        for i, chunk in enumerate(read_chunks(raw_path, chunksize)):
+            chunk = clean_chunk(chunk)
+
+            fill_population(chunk, medians)
+            chunk.to_csv(out, index=False, header=i == 0)
+
+    tmp_path.replace(out_path)
+
+    # kept for filling new events; the overall median covers countries not seen yet
+    overall = median_from_counts(sum(counts.values())) if counts else None
+    medians_path(out_path).write_text(json.dumps({
+        "countries": {country: float(median) for country, median in medians.items()},
+        "overall": None if overall is None else float(overall),
+    }, indent=1))
+    return out_path
@@ -0,0 +1,306 @@
+"""
+Density clustering of the full feature matrix (notebooks/03_modelling.ipynb).
+
+The notebook runs sklearn's DBSCAN(algorithm='brute') on a 250k-row sample,
+because the brute-force neighborhoods grow quadratically with the row count.
+dbscan() returns the labels sklearn's DBSCAN gives on the same rows, with
+work and memory growing with the neighborhood sizes instead:
+
+1. identical feature rows (frequent after the encoding) are collapsed into
+   weighted points;
+2. the integer-valued columns (ordinal codes and one-hot event types) form a
+   grid: points with the same codes share a cell, and two cells can only hold
+   neighbors if their codes are within eps. Each cell pair gets the radius
+   left for the continuous columns, searched with a KD-tree per cell;
+3. per group of cells, the neighborhoods of the owned points are counted
+   across the adjacent cells, which decides the core points;
+4. per group of cells, core points within eps are joined into components,
+   and the components of different groups sharing a core point are merged;
+5. clusters are numbered and border points assigned in sklearn's order.
+
+Steps 3 and 4 run per group of cells in a process pool.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from sklearn.neighbors import KDTree
+
+from acled.features import FEATURES_DIR, open_features
+from acled.store import ROOT
+
+# ---------------- Paths ----------------
+CLUSTERS = ROOT / "models" / "dbscan_labels.npz"
+
+# ---------------- Parameters (notebook 03) ----------------
+# set based on the k-distance plot
+EPS = 1.2
+MIN_SAMPLES = 8
+
+# owned points per task, and pending edges kept before they are merged
+PARTITION_SIZE = 50_000
+EDGE_BUFFER = 4_000_000
+
+# integer columns with at most this many values are gridded instead of searched
+MAX_LEVELS = 256
+
+
+# ---------------- Grid ----------------
+
+def collapse_duplicates(X: np.ndarray) -> tuple:
+    """Unique rows of `X`, the first row index of each, the row -> unique map and the counts."""
+    unique, first, inverse, counts = np.unique(X, axis=0, return_index=True,
+                                               return_inverse=True, return_counts=True)
+    return unique, first, inverse.reshape(-1), counts
+
+
+def discrete_columns(points: np.ndarray) -> np.ndarray:
+    """Columns holding a few integer values, such as the ordinal codes and one-hot columns."""
+    columns = [j for j in range(points.shape[1])
+               if np.array_equal(points[:, j], np.round(points[:, j]))
+               and len(np.unique(points[:, j])) <= MAX_LEVELS]
+    return np.array(columns, dtype=np.intp)
+
+
+def adjacent_cells(keys: np.ndarray, eps: float) -> tuple:
+    """
+    Pairs of cells whose codes are within eps (each cell with itself included),
+    with the radius left for the continuous columns, sorted by cell.
+    """
+    keys = keys.astype(np.float64)
+    cells, others, radii = [], [], []
+    for start in range(0, len(keys), 256):
+        d2 = ((keys[start:start + 256, None, :] - keys[None, :, :]) ** 2).sum(axis=-1)
+        i, j = np.nonzero(d2 <= eps * eps)
+        cells.append(i + start)
+        others.append(j)
+        radii.append(np.sqrt(eps * eps - d2[i, j]))
+    return np.concatenate(cells), np.concatenate(others), np.concatenate(radii)
+
+
+# ---------------- Per-task work (process pool) ----------------
+
+# grid, points and core flags of the running clustering, set once per worker
+_shared = {}
+
+
+def _init(state: dict) -> None:
+    _shared.clear()
+    _shared.update(state)
+
+
+def _tree(cell: int, core_only: bool) -> tuple:
+    """KD-tree over the continuous columns of a cell or its core points (None if empty), and their ids."""
+    key = (cell, core_only)
+    if key not in _shared:
+        lo, hi = _shared["bounds"][cell], _shared["bounds"][cell + 1]
+        ids = np.arange(lo, hi)
+        if core_only:
+            ids = ids[_shared["core"][lo:hi]]
+        _shared[key] = (KDTree(_shared["continuous"][ids]) if len(ids) else None), ids
+    return _shared[key]
+
+
+def _adjacent(cell: int):
+    start, stop = _shared["adjacency"][cell], _shared["adjacency"][cell + 1]
+    return zip(_shared["others"][start:stop], _shared["radii"][start:stop])
+
+
+def _flatten(neighborhoods, sources: np.ndarray) -> tuple:
+    lengths = np.fromiter(map(len, neighborhoods), dtype=np.intp, count=len(neighborhoods))
+    if not lengths.sum():
+        return sources[:0], sources[:0]
+    return np.repeat(sources, lengths), np.concatenate(neighborhoods)
+
+
+def _core_points(first_cell: int, last_cell: int) -> np.ndarray:
+    """Core flags of the points of cells first_cell..last_cell, counting neighbors with their weights."""
+    bounds, min_samples = _shared["bounds"], _shared["min_samples"]
+    flags = []
+    for cell in range(first_cell, last_cell):
+        query = _shared["continuous"][bounds[cell]:bounds[cell + 1]]
+        distinct = np.zeros(len(query), dtype=np.intp)
+        for other, radius in _adjacent(cell):
+            distinct += _tree(other, False)[0].query_radius(query, radius, count_only=True)
+        core = distinct >= min_samples
+
+        # duplicates only matter where the distinct points are too few
+        unsure = np.flatnonzero(~core)
+        if len(unsure):
+            weighted = np.zeros(len(unsure), dtype=np.int64)
+            for other, radius in _adjacent(cell):
+                tree, ids = _tree(other, False)
+                weighted += [_shared["weights"][ids[neighbors]].sum()
+                             for neighbors in tree.query_radius(query[unsure], radius)]
+            core[unsure] = weighted >= min_samples
+        flags.append(core)
+    return np.concatenate(flags)
+
+
+def _components(first_cell: int, last_cell: int) -> tuple:
+    """
+    Component of every core point reached from cells first_cell..last_cell, and
+    the (border point, core point) pairs within eps for their non-core points.
+    """
+    bounds, core, continuous = _shared["bounds"], _shared["core"], _shared["continuous"]
+    labels = np.arange(len(core))
+    touched, pending, border_points, border_cores = [], [], [], []
+    n_pending = 0
+
+    def merge(labels):
+        source = np.concatenate([edge[0] for edge in pending])
+        target = np.concatenate([edge[1] for edge in pending])
+        pending.clear()
+        a, b = labels[source], labels[target]
+        joined = a != b
+        graph = coo_matrix((np.ones(joined.sum(), dtype=np.int8), (a[joined], b[joined])),
+                           shape=(len(labels), len(labels)))
+        return connected_components(graph, directed=False)[1][labels]
+
+    for cell in range(first_cell, last_cell):
+        ids = np.arange(bounds[cell], bounds[cell + 1])
+        cores, others = ids[core[ids]], ids[~core[ids]]
+        touched.append(cores)
+        for other, radius in _adjacent(cell):
+            tree, other_cores = _tree(other, True)
+            if not len(other_cores):
+                continue
+            if len(cores):
+                source, target = _flatten(tree.query_radius(continuous[cores], radius), cores)
+                pending.append((source, other_cores[target]))
+                n_pending += len(source)
+                touched.append(other_cores[np.unique(target)])
+            # non-core points have fewer than min_samples neighbors, so these lists are short
+            if len(others):
+                source, target = _flatten(tree.query_radius(continuous[others], radius), others)
+                border_points.append(source)
+                border_cores.append(other_cores[target])
+        if n_pending > EDGE_BUFFER:
+            labels, n_pending = merge(labels), 0
+    if pending:
+        labels = merge(labels)
+
+    touched = np.unique(np.concatenate(touched))
+    empty = [np.zeros(0, dtype=np.intp)]
+    return touched, labels[touched], np.concatenate(border_points or empty), np.concatenate(border_cores or empty)
+
+
+def _map(func, tasks: list, n_jobs: int, state: dict) -> list:
+    if n_jobs == 1 or len(tasks) == 1:
+        _init(state)
+        try:
+            return [func(*task) for task in tasks]
+        finally:
+            _shared.clear()
+    with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init, initargs=(state,)) as pool:
+        return list(pool.map(func, *zip(*tasks)))
+
+
+# ---------------- DBSCAN ----------------
+
+def dbscan(X: np.ndarray, eps: float = EPS, min_samples: int = MIN_SAMPLES, n_jobs: int = None,
+           partition_size: int = PARTITION_SIZE) -> np.ndarray:
+    """Labels of sklearn's DBSCAN(eps, min_samples) on `X` (noise is -1), computed per group of cells."""
+    if not np.isfinite(X).all():
+        raise ValueError("the feature matrix contains NaN or infinite values")
+    n_jobs = os.cpu_count() if n_jobs == -1 else n_jobs or 1
+
+    points, first, inverse, weights = collapse_duplicates(X)
+
+    # sort the points by grid cell, so each cell is a contiguous range
+    discrete = discrete_columns(points)
+    keys, cell_of = np.unique(points[:, discrete], axis=0, return_inverse=True)
+    cell_of = cell_of.reshape(-1)
+    order = np.argsort(cell_of, kind="stable")
+    position = np.empty_like(order)
+    position[order] = np.arange(len(order))
+    points, first, weights, inverse = points[order], first[order], weights[order], position[inverse]
+    bounds = np.searchsorted(cell_of[order], np.arange(len(keys) + 1))
+
+    cells, others, radii = adjacent_cells(keys, eps)
+    continuous = np.delete(points, discrete, axis=1).astype(np.float64)
+    if not continuous.shape[1]:
+        # every column is gridded: a cell holds a single point and its neighbors are
+        # the points of the adjacent cells, which the trees find over a constant column
+        continuous = np.zeros((len(points), 1))
+    state = {
+        "bounds": bounds,
+        "adjacency": np.searchsorted(cells, np.arange(len(keys) + 1)),
+        "others": others,
+        "radii": radii,
+        "continuous": continuous,
+        "weights": weights,
+        "min_samples": min_samples,
+    }
+
+    # group consecutive cells into tasks of about partition_size points
+    cuts = np.searchsorted(bounds, np.arange(0, len(points), partition_size))
+    cuts = np.unique(np.r_[cuts, len(keys)])
+    tasks = [(int(a), int(b)) for a, b in zip(cuts[:-1], cuts[1:])]
+
+    core = np.concatenate(_map(_core_points, tasks, n_jobs, state))
+    results = _map(_components, tasks, n_jobs, {**state, "core": core})
+
+    # merge: a bipartite graph of the task components and the core points they contain
+    component_nodes, point_nodes, border_points, border_cores = [], [], [], []
+    offset = 0
+    for touched, labels, border, border_core in results:
+        local = np.unique(labels, return_inverse=True)[1].reshape(-1)
+        component_nodes.append(offset + local)
+        point_nodes.append(touched)
+        border_points.append(border)
+        border_cores.append(border_core)
+        offset += len(touched)
+    component_nodes = np.concatenate(component_nodes)
+    point_nodes = np.concatenate(point_nodes) + offset
+    graph = coo_matrix((np.ones(len(point_nodes), dtype=np.int8), (component_nodes, point_nodes)),
+                       shape=(offset + len(points), offset + len(points)))
+    component = connected_components(graph, directed=False)[1][offset:]
+
+    # sklearn starts a cluster from each unlabeled core point in row order, so
+    # clusters are numbered by their first core row, and a border point goes to
+    # the cluster with the earliest first core row among its neighbors
+    unique_labels = np.full(len(points), -1, dtype=np.intp)
+    core_ids = np.flatnonzero(core)
+    if len(core_ids):
+        first_row = np.full(component.max() + 1, len(X), dtype=np.intp)
+        np.minimum.at(first_row, component[core_ids], first[core_ids])
+        rank = np.argsort(np.argsort(first_row))
+        unique_labels[core_ids] = rank[component[core_ids]]
+
+        border_points = np.concatenate(border_points)
+        border_labels = unique_labels[np.concatenate(border_cores)]
+        order = np.lexsort((border_labels, border_points))
+        border_points, border_labels = border_points[order], border_labels[order]
+        earliest = np.diff(border_points, prepend=-1) != 0
+        unique_labels[border_points[earliest]] = border_labels[earliest]
+
+    return unique_labels[inverse]
+
+
+# ---------------- Build step ----------------
+
+def sample_rows(n_rows: int, size: int, seed: int = 42) -> np.ndarray:
+    """The rows DataFrame.sample(size, random_state=seed) picks, in the same order."""
+    return np.random.RandomState(seed).choice(n_rows, size=size, replace=False)
+
+
+def cluster_features(features_path: Path = FEATURES_DIR, out_path: Path = CLUSTERS, sample_size: int = None,
+                     eps: float = EPS, min_samples: int = MIN_SAMPLES, n_jobs: int = None) -> Path:
+    """Cluster the feature matrix (or a sample of it) and save the row positions with their labels."""
+    features = open_features(features_path)
+    if sample_size is None or sample_size >= len(features):
+        rows = np.arange(len(features))
+        X = features.matrix
+    else:
+        rows = sample_rows(len(features), sample_size)
+        X = features.matrix[rows]
+
+    labels = dbscan(X, eps, min_samples, n_jobs)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    np.savez(out_path, rows=rows, labels=labels.astype(np.int32), eps=eps, min_samples=min_samples)
+    return out_path
@@ -0,0 +1,42 @@
+"""
+Derived columns of the dashboard dataset.
+
+Computed once per dataset version (when the snapshot is built, or when the
+CSV fallback is parsed) so reruns and pages read them instead of re-deriving
+them from fatalities and event_date.
+"""
+
+import numpy as np
+import pandas as pd
+
+# fatality severity bins, right-inclusive: 0-3, 4-10, 11-50, 50+
+SEVERITY_LEVELS = ["Low (0-3)", "Moderate (4-10)", "High (11-50)", "Extreme (50+)"]
+SEVERITY_BINS = [-np.inf, 3, 10, 50, np.inf]
+SEVERITY_DTYPE = pd.CategoricalDtype(SEVERITY_LEVELS, ordered=True)
+
+DERIVED_COLUMNS = ["fatality_severity", "year", "month"]
+
+
+def fatality_severity(fatalities: pd.Series) -> pd.Series:
+    """Vectorised severity binning as an ordered categorical."""
+    return pd.cut(fatalities, SEVERITY_BINS, labels=SEVERITY_LEVELS, ordered=True).astype(SEVERITY_DTYPE)
+
+
+def category_codes(values: pd.Series, sort: bool = False) -> tuple:
+    """
+    Integer code of every value (-1 for missing) and the distinct values they
+    index; a categorical column's stored codes and categories are reused
+    instead of hashing the values again.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy(), values.cat.categories
+    return pd.factorize(values, sort=sort)
+
+
+def enrich(df: pd.DataFrame) -> pd.DataFrame:
+    """Add the derived columns to a frame with the deployment schema."""
+    return df.assign(
+        fatality_severity=fatality_severity(df["fatalities"]),
+        year=df["event_date"].dt.year.astype("int16"),
+        month=df["event_date"].dt.month.astype("int8"),
+    )
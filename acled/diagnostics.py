@@ -0,0 +1,151 @@
+"""
+Per-stage timings of one dashboard rerun.
+
+dashboard_app.py creates a Recorder at the top of every rerun and the pages
+wrap their named stages (loading, filtering, aggregation, rendering) in
+`with recorder.stage(name) as stage:`, setting `stage.rows` where a row count
+means something. At the end of the rerun the stages are shown in the sidebar
+diagnostics panel and emitted as one JSON log line each.
+
+Diagnostics are off unless ACLED_DIAGNOSTICS (or the ?diagnostics= query
+parameter) is set: `1` times the stages, `memory` also traces the bytes
+allocated by each stage with tracemalloc. While off, stage() returns one
+shared no-op context manager.
+
+tracemalloc traces the whole server process from the first memory-mode
+rerun on, slowing every rerun of every session down (timings are then only
+comparable with each other), and its peak is process-wide: the allocations
+of a stage are only its own while a single session is running. Memory mode
+is therefore only turned on by ACLED_DIAGNOSTICS, for a profiling run of the
+server; the query parameter can only ask for timings.
+"""
+
+import json
+import logging
+import time
+import tracemalloc
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# values of ACLED_DIAGNOSTICS / ?diagnostics= that turn the recorder on
+MODES = {"1": "time", "true": "time", "time": "time", "memory": "memory"}
+
+
+def select_mode(setting: str = "", query: str = "") -> str | None:
+    """
+    Mode of a rerun from ACLED_DIAGNOSTICS (`setting`) and the ?diagnostics=
+    query parameter, which takes precedence but cannot turn memory mode on.
+    """
+    setting_mode = MODES.get(setting.lower())
+    query_mode = MODES.get(query.lower())
+    if query_mode == "memory" and setting_mode != "memory":
+        query_mode = "time"
+    return query_mode or setting_mode
+
+
+class _Stage:
+    """One timed stage; `rows` may be set inside the with block."""
+
+    __slots__ = ("name", "depth", "rows", "seconds", "allocated", "_start", "_memory", "_peak")
+
+    def __init__(self, name: str, depth: int, rows=None):
+        self.name = name
+        self.depth = depth
+        self.rows = rows
+        self.seconds = None
+        self.allocated = None
+
+
+class _NullStage:
+    """Shared stand-in while diagnostics are off: entering and setting rows do nothing."""
+
+    rows = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class Recorder:
+    """Stages of one rerun, in the order they started; stages may nest."""
+
+    def __init__(self, mode: str | None = None, page: str | None = None):
+        self.mode = mode
+        self.page = page
+        self.rerun = uuid.uuid4().hex[:8]
+        self.stages = []
+        self._open = []
+        if mode == "memory" and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode is not None
+
+    def stage(self, name: str, rows=None):
+        """Context manager timing the named stage."""
+        if self.mode is None:
+            return _NULL_STAGE
+        return _Timer(self, name, rows)
+
+    def records(self) -> list:
+        """One dict per stage: name, depth, milliseconds, rows and (in memory mode) allocated bytes."""
+        return [
+            {"stage": s.name, "depth": s.depth, "ms": None if s.seconds is None else round(s.seconds * 1e3, 2),
+             "rows": s.rows, "allocated_bytes": s.allocated}
+            for s in self.stages
+        ]
+
+    def log(self) -> None:
+        """Emit every stage as one structured (JSON) log line."""
+        if self.mode is None:
+            return
+        if not logger.handlers:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(message)s"))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+        for record in self.records():
+            logger.info(json.dumps({"rerun": self.rerun, "page": self.page, **record}))
+
+
+class _Timer:
+    def __init__(self, recorder: Recorder, name: str, rows):
+        self._recorder = recorder
+        self._stage = _Stage(name, len(recorder._open), rows)
+
+    def __enter__(self) -> _Stage:
+        stage, recorder = self._stage, self._recorder
+        recorder.stages.append(stage)
+        if recorder.mode == "memory":
+            current, peak = tracemalloc.get_traced_memory()
+            # the enclosing stage keeps its peak so far, then the peak restarts for this one
+            if recorder._open:
+                parent = recorder._open[-1]
+                parent._peak = max(parent._peak, peak)
+            tracemalloc.reset_peak()
+            stage._memory, stage._peak = current, current
+        recorder._open.append(stage)
+        stage._start = time.perf_counter()
+        return stage
+
+    def __exit__(self, *exc) -> bool:
+        stage, recorder = self._stage, self._recorder
+        stage.seconds = time.perf_counter() - stage._start
+        recorder._open.pop()
+        if recorder.mode == "memory":
+            stage._peak = max(stage._peak, tracemalloc.get_traced_memory()[1])
+            stage.allocated = stage._peak - stage._memory
+            if recorder._open:
+                parent = recorder._open[-1]
+                parent._peak = max(parent._peak, stage._peak)
+        return False
@@ -0,0 +1,221 @@
+"""
+Headless batch export of the dashboard's metrics for many filter configurations.
+
+Briefing packs need the same numbers for dozens of selections. Each filter
+configuration is a global_filters dict of the dashboard (see
+acled/filters.py) and is answered without Streamlit, by the same code the
+pages run:
+
+- the Overview KPIs and severity breakdown, from the day-level time index;
+- the temporal activity of the selected clusters (the top 15 if none is
+  selected), from the same index at a chosen granularity;
+- the Cluster Profile summary of every selected cluster present after
+  filtering, merged from the profile cells, which resolve the date range to
+  whole years as on the page.
+
+The time index and the profile cells are built (or read) once and dumped
+with joblib; every worker of the process pool memory-maps that dump, so the
+workers share one copy of the aggregates instead of loading the data each.
+
+Configurations are read from a JSON list of objects, each with a "name" and
+any of the global_filters keys (event_type, regions, clusters,
+fatality_severity, date_range as two ISO dates); a missing key keeps the
+dashboard default, an empty list leaves the dimension unfiltered. `each`
+expands every configuration into one per combination of single values of
+the given keys (e.g. one per region x event type).
+
+Results go to one Parquet table per metric (kpis, severity, timelines,
+profiles; one row per configuration and item, keyed by "config") or to one
+JSON document.
+"""
+
+import datetime
+import itertools
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import joblib
+import pandas as pd
+
+from acled.derive import SEVERITY_LEVELS
+from acled.filters import default_filters
+from acled.store import ROOT
+from acled.timeindex import GRANULARITIES
+
+# ---------------- Paths ----------------
+EXPORTS = ROOT / "exports"
+
+FORMATS = ["parquet", "json"]
+TABLES = ["kpis", "severity", "timelines", "profiles"]
+
+# keys a configuration may set, and the option list each defaults to when expanded
+FILTER_OPTIONS = {
+    "event_type": "event_types",
+    "regions": "regions",
+    "clusters": "top_15_clusters",
+    "fatality_severity": "severity_levels",
+}
+
+
+# ---------------- Configurations ----------------
+
+def read_configs(path: Path) -> list:
+    """Named filter configurations of a JSON file (see the module docstring)."""
+    configs = json.loads(Path(path).read_text())
+    if not isinstance(configs, list):
+        raise ValueError(f"{path} must hold a JSON list of filter configurations")
+    return configs
+
+
+def resolve(config: dict, options: dict) -> tuple:
+    """Name and global_filters of `config`, the dashboard defaults filling the keys it does not set."""
+    unknown = set(config) - {"name", "date_range", *FILTER_OPTIONS}
+    if unknown:
+        raise ValueError(f"unknown filter keys {sorted(unknown)} in configuration {config.get('name')!r}")
+    filters = default_filters(options)
+    filters.update({key: list(config[key]) for key in FILTER_OPTIONS if key in config})
+    if config.get("date_range") is not None:
+        filters["date_range"] = tuple(datetime.date.fromisoformat(str(day)) for day in config["date_range"])
+    return str(config.get("name", "")), filters
+
+
+def expand(configs: list, options: dict, each: list = ()) -> list:
+    """
+    (name, filters) of every configuration, split into one per combination of
+    single values of the `each` keys (the selected values, or every option
+    if the selection is empty).
+    """
+    expanded = []
+    for i, config in enumerate(configs):
+        name, filters = resolve(config, options)
+        name = name or f"config {i + 1}"
+        values = [filters[key] or options[FILTER_OPTIONS[key]] for key in each]
+        for combination in itertools.product(*values):
+            split = {**filters, **{key: [value] for key, value in zip(each, combination)}}
+            expanded.append((" / ".join([name, *map(str, combination)]), split))
+    return expanded
+
+
+# ---------------- Metrics ----------------
+
+def metrics(time_index, profiles, options: dict, filters: dict, granularity: str = "Month") -> dict:
+    """The exported metrics of one filter configuration, as tables (see the module docstring)."""
+    cells = time_index.slice(filters)
+    severity = time_index.events_by(cells, "fatality_severity").reindex(SEVERITY_LEVELS, fill_value=0)
+
+    # clusters shown by the Cluster Insights page
+    clusters = filters["clusters"] or options["top_15_clusters"]
+    present = set(cells["cluster"])
+    timeline = time_index.timeline({**filters, "clusters": clusters}, granularity, by="cluster")
+
+    rows = []
+    for cluster in [c for c in clusters if c in present]:
+        cluster_filters = {**filters, "clusters": [cluster]}
+        kpis = time_index.kpis(cells[cells["cluster"] == cluster])
+        first_date, last_date = time_index.date_span(cluster_filters)
+        profile = profiles.profile(cluster, filters)
+        rows.append({
+            "cluster": cluster,
+            "events": kpis["total_events"],
+            "fatalities": kpis["total_fatalities"],
+            "mean_fatalities": kpis["avg_fatalities"],
+            "median_fatalities": profile["median_fatalities"],
+            "event_type": profile["event_type"],
+            "sub_event_type": profile["sub_event_type"],
+            "interaction": profile["interaction"],
+            "region": profile["region"],
+            "country": profile["country"],
+            "median_population_best": profile["median_population_best"],
+            "first_date": first_date,
+            "last_date": last_date,
+        })
+
+    return {
+        "kpis": pd.DataFrame([time_index.kpis(cells)]),
+        "severity": severity.rename_axis("fatality_severity").reset_index(name="events"),
+        "timelines": timeline,
+        "profiles": pd.DataFrame(rows, columns=["cluster", "events", "fatalities", "mean_fatalities",
+                                                "median_fatalities", "event_type", "sub_event_type", "interaction",
+                                                "region", "country", "median_population_best", "first_date",
+                                                "last_date"]),
+    }
+
+
+# ---------------- Workers ----------------
+
+# aggregates of the running export, memory-mapped once per worker
+_shared = {}
+
+
+def _init(aggregates_path: Path) -> None:
+    _shared.update(joblib.load(aggregates_path, mmap_mode="r"))
+
+
+def _export_one(task: tuple) -> dict:
+    return metrics(_shared["time_index"], _shared["profiles"], _shared["options"], *task)
+
+
+# ---------------- Export ----------------
+
+def _write_parquet(configs: list, results: list, out_path: Path) -> Path:
+    """One Parquet file per metric in `out_path`, the rows of every configuration keyed by its name."""
+    out_path.mkdir(parents=True, exist_ok=True)
+    for table in TABLES:
+        frame = pd.concat([result[table].assign(config=name) for (name, _), result in zip(configs, results)],
+                          ignore_index=True)
+        tmp_path = out_path / f"{table}.parquet.tmp"
+        frame[["config", *frame.columns.drop("config")]].to_parquet(tmp_path, index=False)
+        tmp_path.replace(out_path / f"{table}.parquet")
+    return out_path
+
+
+def _write_json(configs: list, results: list, out_path: Path) -> Path:
+    """One JSON document in `out_path`: every configuration with its filters and metrics."""
+    document = []
+    for (name, filters), result in zip(configs, results):
+        entry = {"config": name, "filters": {**filters, "date_range": [str(day) for day in filters["date_range"]]}}
+        for table in TABLES:
+            entry[table] = json.loads(result[table].to_json(orient="records", date_format="iso"))
+        entry["kpis"] = entry["kpis"][0]
+        document.append(entry)
+
+    out_path.mkdir(parents=True, exist_ok=True)
+    path = out_path / "export.json"
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(json.dumps(document, indent=1, default=str))
+    tmp_path.replace(path)
+    return path
+
+
+def export(time_index, profiles, options: dict, configs: list, out_path: Path = EXPORTS, fmt: str = "parquet",
+           granularity: str = "Month", n_jobs: int = None) -> Path:
+    """
+    Compute the metrics of every (name, filters) in `configs` on a process pool
+    and write them to `out_path` in format `fmt`.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown format {fmt!r}, expected one of {FORMATS}")
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"unknown granularity {granularity!r}, expected one of {list(GRANULARITIES)}")
+    if not configs:
+        raise ValueError("no filter configurations to export")
+    n_jobs = os.cpu_count() if n_jobs == -1 else n_jobs or 1
+    tasks = [(filters, granularity) for _, filters in configs]
+
+    if n_jobs == 1:
+        results = [metrics(time_index, profiles, options, *task) for task in tasks]
+    else:
+        with tempfile.TemporaryDirectory(prefix="acled-export-") as tmp:
+            aggregates_path = Path(tmp) / "aggregates.joblib"
+            joblib.dump({"time_index": time_index, "profiles": profiles, "options": options}, aggregates_path)
+            with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init, initargs=(aggregates_path,)) as pool:
+                # a few chunks per worker: even shares without a round trip per configuration
+                chunksize = max(1, len(tasks) // (4 * n_jobs))
+                results = list(pool.map(_export_one, tasks, chunksize=chunksize))
+
+    if fmt == "parquet":
+        return _write_parquet(configs, results, out_path)
+    return _write_json(configs, results, out_path)
@@ -0,0 +1,220 @@
+"""
+Standardized DBSCAN feature matrix (notebooks/02_cleaning_engineering.ipynb).
+
+The notebook writes the feature set as data/final/dbscan_input.csv, which the
+modelling steps re-parse and cast to float32. Instead, the cleaned export is
+encoded chunk by chunk into a float32 .npy matrix that is opened memory-mapped,
+with two sidecars next to it:
+
+- event_ids.npy: the event_id_cnty of every row, also memory-mapped;
+- features.json: column names, the fitted StandardScaler parameters and the
+  category encodings, so that new events can be encoded the same way.
+
+Two passes are made over the cleaned export: the first fits the scaler
+incrementally and collects the categories, the second writes the rows.
+"""
+
+import json
+import shutil
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from acled.cleaning import CHUNK_SIZE, CLEAN_COLUMNS, CLEAN_CSV, DTYPE_MAP
+from acled.store import ROOT
+
+# ---------------- Paths ----------------
+FEATURES_DIR = ROOT / "data" / "final" / "features"
+
+_MATRIX = "matrix.npy"
+_IDS = "event_ids.npy"
+_META = "features.json"
+
+# bump when the encoding or the file layout changes
+FEATURES_VERSION = 1
+
+# ---------------- Encodings (notebook 02) ----------------
+# manual ordinal encoding based on domain knowledge
+REGION_ORDER = {
+    "Africa": 0,
+    "Middle East": 1,
+    "Asia": 2,
+    "Europe": 3,
+    "Americas": 4,
+    "Oceania": 5
+}
+
+SOURCE_SCALE_ORDER = {
+    "Local/Subnational": 0,
+    "National": 1,
+    "Regional": 2,
+    "International": 3,
+    "New media": 4,
+    "Other": 5
+}
+
+# rescaled with StandardScaler after the log transform of the counts
+NUMERIC_COLUMNS = ["latitude", "longitude", "fatalities_log", "popbest_log"]
+
+CODE_COLUMNS = ["interaction_code", "region_code", "source_scale_code"]
+
+
+@dataclass(frozen=True)
+class FeatureMatrix:
+    """The memory-mapped feature matrix with its row ids and encoding parameters."""
+
+    matrix: np.ndarray
+    event_ids: np.ndarray
+    meta: dict
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    @property
+    def columns(self) -> list:
+        return self.meta["columns"]
+
+    def scaler(self):
+        """A fitted StandardScaler with the persisted parameters."""
+        return make_scaler(self.meta["scaler"])
+
+    def to_frame(self) -> pd.DataFrame:
+        """Copy into the DataFrame layout of dbscan_input.csv (indexed by event_id_cnty)."""
+        index = pd.Index(self.event_ids.astype(str), name="event_id_cnty")
+        return pd.DataFrame(np.asarray(self.matrix), index=index, columns=self.columns)
+
+
+# ---------------- Encoding ----------------
+
+def read_clean_chunks(clean_path: Path = CLEAN_CSV, chunksize: int = CHUNK_SIZE):
+    """Stream the cleaned export (acled_clean.csv) with the notebook dtypes."""
+    return pd.read_csv(
+        clean_path,
+        dtype={col: DTYPE_MAP[col] for col in CLEAN_COLUMNS},
+        chunksize=chunksize,
+        low_memory=False,
+    )
+
+
+def prepare(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Row filter and log transform that precede the encoding."""
+    # drop rows with geo_precision == 3 (low precision)
+    chunk = chunk[chunk["geo_precision"] != 3].copy()
+    chunk["fatalities_log"] = np.log1p(chunk["fatalities"])
+    chunk["popbest_log"] = np.log1p(chunk["population_best"])
+    return chunk
+
+
+def make_scaler(params: dict):
+    """Rebuild a fitted StandardScaler from its persisted parameters."""
+    from sklearn.preprocessing import StandardScaler
+
+    scaler = StandardScaler()
+    scaler.mean_ = np.array(params["mean"])
+    scaler.var_ = np.array(params["var"])
+    scaler.scale_ = np.array(params["scale"])
+    scaler.n_samples_seen_ = params["n_samples_seen"]
+    scaler.n_features_in_ = len(params["columns"])
+    scaler.feature_names_in_ = np.array(params["columns"], dtype=object)
+    return scaler
+
+
+def encode(chunk: pd.DataFrame, meta: dict, scaler) -> np.ndarray:
+    """Encode prepared rows into the float32 feature layout described by `meta`."""
+    interaction = pd.Categorical(chunk["interaction"], categories=meta["interaction_categories"])
+    event_type = pd.Categorical(chunk["event_type"], categories=meta["event_types"])
+
+    parts = {
+        "interaction_code": interaction.codes,
+        "region_code": chunk["region"].astype(object).map(meta["region_order"]).to_numpy(dtype=float),
+        "source_scale_code": chunk["source_scale"].astype(object).map(meta["source_scale_order"]).to_numpy(dtype=float),
+        # one-hot encoding of the event type, one column per category
+        **{name: event_type.codes == code for code, name in enumerate(meta["event_types"])},
+    }
+
+    out = np.empty((len(chunk), len(meta["columns"])), dtype=np.float32)
+    for i, column in enumerate(meta["columns"][:len(parts)]):
+        out[:, i] = parts[column]
+    out[:, len(parts):] = scaler.transform(chunk[NUMERIC_COLUMNS])
+    return out
+
+
+# ---------------- Build and load ----------------
+
+def build_features(clean_path: Path = CLEAN_CSV, out_path: Path = FEATURES_DIR,
+                   chunksize: int = CHUNK_SIZE) -> Path:
+    """Write the feature matrix of the cleaned export and its sidecars to `out_path`."""
+    from sklearn.preprocessing import StandardScaler
+
+    # first pass: scaler statistics, categories, row count and id width
+    scaler = StandardScaler()
+    interactions, event_types = set(), set()
+    rows, id_width = 0, 1
+    for chunk in read_clean_chunks(clean_path, chunksize):
+        # categories come from every cleaned row, as pd.Categorical did on the full frame
+        interactions.update(chunk["interaction"].dropna().unique())
+        event_types.update(chunk["event_type"].dropna().unique())
+        chunk = prepare(chunk)
+        if len(chunk):
+            scaler.partial_fit(chunk[NUMERIC_COLUMNS])
+            id_width = max(id_width, int(chunk["event_id_cnty"].str.len().max()))
+        rows += len(chunk)
+
+    event_types = sorted(event_types)
+    meta = {
+        "version": FEATURES_VERSION,
+        "rows": rows,
+        "columns": CODE_COLUMNS + event_types + NUMERIC_COLUMNS,
+        "index": "event_id_cnty",
+        "interaction_categories": sorted(interactions),
+        "event_types": event_types,
+        "region_order": REGION_ORDER,
+        "source_scale_order": SOURCE_SCALE_ORDER,
+        "scaler": {
+            "columns": NUMERIC_COLUMNS,
+            "mean": scaler.mean_.tolist(),
+            "var": scaler.var_.tolist(),
+            "scale": scaler.scale_.tolist(),
+            "n_samples_seen": int(np.max(scaler.n_samples_seen_)),
+        },
+    }
+
+    # build next to the target and swap, so readers never see a partial matrix
+    tmp_path = out_path.with_name(out_path.name + ".tmp")
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    tmp_path.mkdir(parents=True)
+    matrix = np.lib.format.open_memmap(tmp_path / _MATRIX, mode="w+", dtype=np.float32,
+                                       shape=(rows, len(meta["columns"])))
+    event_ids = np.lib.format.open_memmap(tmp_path / _IDS, mode="w+", dtype=f"S{id_width}", shape=(rows,))
+
+    # second pass: encode and write the rows in place
+    start = 0
+    for chunk in read_clean_chunks(clean_path, chunksize):
+        chunk = prepare(chunk)
+        stop = start + len(chunk)
+        matrix[start:stop] = encode(chunk, meta, scaler)
+        event_ids[start:stop] = chunk["event_id_cnty"].to_numpy(dtype=f"S{id_width}")
+        start = stop
+    matrix.flush()
+    event_ids.flush()
+    del matrix, event_ids
+
+    (tmp_path / _META).write_text(json.dumps(meta, indent=1))
+
+    shutil.rmtree(out_path, ignore_errors=True)
+    tmp_path.replace(out_path)
+    return out_path
+
+
+def open_features(path: Path = FEATURES_DIR) -> FeatureMatrix:
+    """Open the feature matrix read-only and memory-mapped, without parsing or copying."""
+    meta = json.loads((path / _META).read_text())
+    if meta.get("version") != FEATURES_VERSION:
+        raise ValueError(f"{path} was built with an older feature layout, rebuild it with `python -m acled features`")
+    return FeatureMatrix(
+        matrix=np.load(path / _MATRIX, mmap_mode="r"),
+        event_ids=np.load(path / _IDS, mmap_mode="r"),
+        meta=meta,
+    )
@@ -0,0 +1,156 @@
+"""
+Precomputed filter index for the sidebar selections.
+
+One packed bitmap is built per value of every filterable column, plus a
+date-sorted row order. A filter state then becomes OR/AND operations over the
+bitmaps and the result is an array of row positions into the indexed frame,
+so no intermediate DataFrames are allocated. Actors, too many for a bitmap
+each, have an inverted index instead (see acled/actors.py), which gives the
+row list of the selected actors, or their row mask to AND with the others.
+"""
+
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from acled.actors import ACTOR_COLUMNS, ActorIndex
+from acled.derive import SEVERITY_LEVELS, category_codes
+
+# keys of st.session_state["global_filters"] -> indexed column
+FILTER_COLUMNS = {
+    "event_type": "event_type",
+    "regions": "region",
+    "clusters": "cluster",
+    "fatality_severity": "fatality_severity",
+}
+
+# key of the actor selection in global_filters, matched against actor1 and actor2
+ACTOR_FILTER = "actors"
+
+
+def date_bounds(filters: dict) -> tuple | None:
+    """First and last selected day of filters["date_range"] as datetime64[D], None if it is unset."""
+    if filters.get("date_range") is None:
+        return None
+    first, last = filters["date_range"]
+    return np.datetime64(first, "D"), np.datetime64(last, "D")
+
+
+def filter_options(summary: dict | None = None, df: pd.DataFrame | None = None) -> dict:
+    """
+    Options of the sidebar filters: from the partitioned store's summary when
+    there is one, without reading any partition, else from the loaded `df`.
+    """
+    if summary is not None:
+        cluster_counts = sorted(summary["cluster_counts"].items(), key=lambda item: -item[1])
+        if "dates" in summary:
+            first, last = (datetime.date.fromisoformat(day) for day in summary["dates"])
+        else:
+            first, last = datetime.date(min(summary["years"]), 1, 1), datetime.date(max(summary["years"]), 12, 31)
+        return {
+            "event_types": summary["event_types"],
+            "regions": summary["regions"],
+            "top_15_clusters": [int(cluster) for cluster, _ in cluster_counts[:15]],
+            "date_range": (first, last),
+            "severity_levels": SEVERITY_LEVELS,
+        }
+
+    # compute top 15 clusters
+    cluster_counts = df["cluster"].value_counts().sort_values(ascending=False)
+
+    return {
+        "event_types": sorted(df["event_type"].dropna().unique()),
+        "regions": sorted(df["region"].dropna().unique()),
+        "top_15_clusters": cluster_counts.index[:15].tolist(),
+        "date_range": (df["event_date"].min().date(), df["event_date"].max().date()),
+        "severity_levels": SEVERITY_LEVELS,
+    }
+
+
+def default_filters(options: dict) -> dict:
+    """The global_filters of a new session: every option selected, over the whole date range."""
+    return {
+        "event_type": options["event_types"],
+        "regions": options["regions"],
+        "clusters": options["top_15_clusters"],
+        "fatality_severity": options["severity_levels"],
+        "date_range": options["date_range"],
+        ACTOR_FILTER: [],
+    }
+
+
+class FilterIndex:
+    """Bitmap index over the filterable columns of one loaded dataset."""
+
+    def __init__(self, df: pd.DataFrame, columns: dict = FILTER_COLUMNS):
+        self.n_rows = len(df)
+        self._bitmaps = {key: self._build_bitmaps(df[col]) for key, col in columns.items()}
+        # None if the dataset has no actor columns
+        self.actors = ActorIndex(df) if all(col in df.columns for col in ACTOR_COLUMNS) else None
+
+        days = df["event_date"].to_numpy().astype("datetime64[D]")
+        self._day_order = np.argsort(days, kind="stable").astype(np.int32)
+        self._sorted_days = days[self._day_order]
+
+    @staticmethod
+    def _build_bitmaps(values: pd.Series) -> dict:
+        codes, uniques = category_codes(values)
+        return {value: np.packbits(codes == code) for code, value in enumerate(uniques.tolist())}
+
+    @property
+    def nbytes(self) -> int:
+        bitmaps = sum(bm.nbytes for dim in self._bitmaps.values() for bm in dim.values())
+        actors = self.actors.nbytes if self.actors is not None else 0
+        return bitmaps + actors + self._day_order.nbytes + self._sorted_days.nbytes
+
+    def _dimension_mask(self, key: str, selected) -> np.ndarray:
+        mask = np.zeros((self.n_rows + 7) // 8, dtype=np.uint8)
+        bitmaps = self._bitmaps[key]
+        for value in selected:
+            bitmap = bitmaps.get(value)
+            if bitmap is not None:
+                np.bitwise_or(mask, bitmap, out=mask)
+        return mask
+
+    def _date_mask(self, first, last) -> np.ndarray | None:
+        lo = np.searchsorted(self._sorted_days, first, side="left")
+        hi = np.searchsorted(self._sorted_days, last, side="right")
+        if lo == 0 and hi == self.n_rows:
+            return None
+
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[self._day_order[lo:hi]] = True
+        return np.packbits(mask)
+
+    def select(self, filters: dict) -> np.ndarray:
+        """
+        Row positions matching `filters` (the global_filters dict).
+        An empty selection leaves that dimension unfiltered, as in the sidebar.
+        """
+        mask = None
+        for key in self._bitmaps:
+            selected = filters.get(key)
+            if not selected:
+                continue
+            dim_mask = self._dimension_mask(key, selected)
+            mask = dim_mask if mask is None else np.bitwise_and(mask, dim_mask, out=mask)
+
+        bounds = date_bounds(filters)
+        if bounds is not None:
+            date_mask = self._date_mask(*bounds)
+            if date_mask is not None:
+                mask = date_mask if mask is None else np.bitwise_and(mask, date_mask, out=mask)
+
+        actors = filters.get(ACTOR_FILTER)
+        if actors:
+            if self.actors is None:
+                # no actor columns in this dataset, nothing names the actors
+                return np.zeros(0, dtype=np.int32)
+            if mask is None:
+                return self.actors.rows(actors)
+            np.bitwise_and(mask, self.actors.mask(actors), out=mask)
+
+        if mask is None:
+            return np.arange(self.n_rows, dtype=np.int32)
+        return np.flatnonzero(np.unpackbits(mask, count=self.n_rows)).astype(np.int32)
@@ -0,0 +1,192 @@
+"""
+Multi-resolution grid of event and fatality counts for the spatial density map.
+
+Events are binned on the finest grid of LEVELS (square bins in degrees of
+latitude and longitude) per cube cell, a combination of the cube dimensions
+(cluster, year, region, event_type, fatality_severity); every coarser level
+merges 2x2 bins of the one below. Each level stores its non-empty
+(bin, cell) entries sorted by bin, row by row of the grid, so:
+
+- a map extent covers one contiguous run of entries per grid row, found by
+  two binary searches, and only those entries are read;
+- the filters select cells as on the cube, and the map is the bincount of
+  the selected entries over the visible bins;
+- the level is the finest whose visible bins stay under a budget, so the
+  cost of a map follows the number of bins shown, not the number of events.
+
+Like the cube, the grid resolves date ranges to whole years. As in the time
+index, the finest entry of every row and the entry each entry merges into
+one level up are kept, so restrict() sums the entries again over a subset
+of the rows (the events of the selected actors); entries left without an
+event are skipped by the maps.
+"""
+
+import copy
+
+import numpy as np
+import pandas as pd
+
+from acled.cube import CUBE_DIMENSIONS, cell_mask
+
+# bin sizes in degrees, finest first; each is twice the one before
+LEVELS = [0.25, 0.5, 1.0, 2.0, 4.0]
+
+# visible bins above which a map drops to a coarser level
+MAX_BINS = 20_000
+
+WORLD = (-90.0, 90.0, -180.0, 180.0)
+
+
+def _shape(size: float) -> tuple:
+    """Rows and columns of the world grid with bins of `size` degrees."""
+    return int(round(180 / size)), int(round(360 / size))
+
+
+class GridPyramid:
+    """Event counts and fatality sums per grid bin and cube cell, at every level of LEVELS."""
+
+    def __init__(self, df: pd.DataFrame):
+        grouped = df[CUBE_DIMENSIONS].groupby(CUBE_DIMENSIONS, observed=True, sort=True)
+        self.cells = grouped.size().reset_index()[CUBE_DIMENSIONS]
+        cell = grouped.ngroup().to_numpy().astype(np.int64)
+
+        # events without coordinates are left off the map
+        lat = df["latitude"].to_numpy(dtype=np.float64)
+        lon = df["longitude"].to_numpy(dtype=np.float64)
+        located = np.isfinite(lat) & np.isfinite(lon)
+        n_rows, n_cols = _shape(LEVELS[0])
+        row = np.clip(np.floor((lat[located] + 90) / LEVELS[0]), 0, n_rows - 1).astype(np.int64)
+        col = np.clip(np.floor((lon[located] + 180) / LEVELS[0]), 0, n_cols - 1).astype(np.int64)
+
+        self.levels = []
+        # finest entry of every row (-1 for rows off the map), and the entry
+        # of the next level every entry merges into, for restrict()
+        self._row_entries = np.full(len(df), -1, dtype=np.int32)
+        self._parents = []
+        # rows kept by restrict() (finest entries and fatalities), and their levels built so far
+        self._restriction = None
+        self._restricted = {}
+        bins, cell = row * n_cols + col, cell[located]
+        events = np.ones(len(bins), dtype=np.int64)
+        fatalities = df["fatalities"].to_numpy()[located].astype(np.int64)
+        for size in LEVELS:
+            if self.levels:
+                # the 2x2 bins below merge into one
+                n_cols_below = n_cols
+                n_rows, n_cols = _shape(size)
+                bins = (bins // n_cols_below // 2) * n_cols + bins % n_cols_below // 2
+            level, inverse = self._merge(bins, cell, events, fatalities)
+            if self.levels:
+                self._parents.append(inverse)
+            else:
+                self._row_entries[located] = inverse
+            self.levels.append(level)
+            bins, cell, events, fatalities = level["bins"], level["cells"], level["events"], level["fatalities"]
+
+    def _merge(self, bins, cell, events, fatalities) -> tuple:
+        """Sum the entries sharing a (bin, cell) key; entries sorted by bin, then cell, and the entry of each input."""
+        keys, inverse = np.unique(bins.astype(np.int64) * len(self.cells) + cell, return_inverse=True)
+        return {
+            "bins": (keys // len(self.cells)).astype(np.int32),
+            "cells": (keys % len(self.cells)).astype(np.int32),
+            "events": np.bincount(inverse, weights=events, minlength=len(keys)).astype(np.int32),
+            "fatalities": np.bincount(inverse, weights=fatalities, minlength=len(keys)).astype(np.int32),
+        }, inverse.reshape(-1).astype(np.int32)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = sum(array.nbytes for level in self.levels for array in level.values())
+        arrays += self._row_entries.nbytes + sum(parents.nbytes for parents in self._parents)
+        return arrays + int(self.cells.memory_usage(deep=True).sum())
+
+    def restrict(self, rows: np.ndarray, fatalities: np.ndarray) -> "GridPyramid":
+        """
+        The pyramid of the events at `rows` (positions in the binned frame) only,
+        `fatalities` being theirs: the same entries, with counts summed over
+        these rows (zero for the others), level by level as the maps read them.
+        """
+        entries = self._row_entries[rows]
+        located = entries >= 0
+        restricted = copy.copy(self)
+        restricted._restriction = entries[located], fatalities[located]
+        restricted._restricted = {}
+        return restricted
+
+    def _level(self, level: int) -> dict:
+        """Entries of `level`, with the counts of the rows kept by restrict() if any."""
+        if self._restriction is None:
+            return self.levels[level]
+        if level not in self._restricted:
+            entries, fatalities = self._restriction
+            for parents in self._parents[:level]:
+                entries = parents[entries]
+            n_entries = len(self.levels[level]["bins"])
+            self._restricted[level] = {
+                **self.levels[level],
+                "events": np.bincount(entries, minlength=n_entries).astype(np.int32),
+                "fatalities": np.bincount(entries, weights=fatalities, minlength=n_entries).astype(np.int32),
+            }
+        return self._restricted[level]
+
+    @staticmethod
+    def _window(size: float, extent: tuple) -> tuple:
+        """First and last bin row and column of `extent` (south, north, west, east) at bins of `size`."""
+        n_rows, n_cols = _shape(size)
+        south, north, west, east = extent
+        rows = (np.clip(int(np.floor((south + 90) / size)), 0, n_rows - 1),
+                np.clip(int(np.ceil((north + 90) / size)) - 1, 0, n_rows - 1))
+        cols = (np.clip(int(np.floor((west + 180) / size)), 0, n_cols - 1),
+                np.clip(int(np.ceil((east + 180) / size)) - 1, 0, n_cols - 1))
+        return rows, cols
+
+    def level_for(self, extent: tuple = WORLD, max_bins: int = MAX_BINS) -> int:
+        """Finest level showing `extent` in at most `max_bins` bins (the coarsest if none does)."""
+        for level, size in enumerate(LEVELS):
+            (row0, row1), (col0, col1) = self._window(size, extent)
+            if (row1 - row0 + 1) * (col1 - col0 + 1) <= max_bins:
+                return level
+        return len(LEVELS) - 1
+
+    def _entries(self, level: int, extent: tuple) -> np.ndarray:
+        """Positions of the entries of `level` inside `extent`, one run per grid row."""
+        bins = self.levels[level]["bins"]
+        (row0, row1), (col0, col1) = self._window(LEVELS[level], extent)
+        n_cols = _shape(LEVELS[level])[1]
+        rows = np.arange(row0, row1 + 1, dtype=np.int64) * n_cols
+        starts = np.searchsorted(bins, rows + col0, side="left")
+        lengths = np.searchsorted(bins, rows + col1, side="right") - starts
+        return np.arange(lengths.sum()) + np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+
+    def heatmap(self, filters: dict, extent: tuple = WORLD, max_bins: int = MAX_BINS) -> tuple:
+        """
+        Non-empty bins of `extent` (south, north, west, east) for the events
+        matching `filters`, at the finest level within `max_bins`: a frame of
+        bin centres (latitude, longitude) with their events and fatalities,
+        and the bin size in degrees.
+        """
+        level = self.level_for(extent, max_bins)
+        size, data = LEVELS[level], self._level(level)
+        entries = self._entries(level, extent)
+        entries = entries[cell_mask(self.cells, filters)[data["cells"][entries]] & (data["events"][entries] > 0)]
+
+        bins, inverse = np.unique(data["bins"][entries], return_inverse=True)
+        events = np.bincount(inverse, weights=data["events"][entries], minlength=len(bins))
+        fatalities = np.bincount(inverse, weights=data["fatalities"][entries], minlength=len(bins))
+        n_cols = _shape(size)[1]
+        return pd.DataFrame({
+            "latitude": (bins // n_cols + 0.5) * size - 90,
+            "longitude": (bins % n_cols + 0.5) * size - 180,
+            "events": events.astype(np.int64),
+            "fatalities": fatalities.astype(np.int64),
+        }), size
+
+    def extent(self, filters: dict) -> tuple | None:
+        """Bounds (south, north, west, east) of the coarsest bins holding events matching `filters`, None without."""
+        size, data = LEVELS[-1], self._level(len(LEVELS) - 1)
+        bins = data["bins"][cell_mask(self.cells, filters)[data["cells"]] & (data["events"] > 0)]
+        if not len(bins):
+            return None
+        n_cols = _shape(size)[1]
+        rows, cols = bins // n_cols, bins % n_cols
+        return (rows.min() * size - 90, (rows.max() + 1) * size - 90,
+                cols.min() * size - 180, (cols.max() + 1) * size - 180)
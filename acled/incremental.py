@@ -0,0 +1,73 @@
+"""
+Incremental assignment of newly published ACLED events.
+
+A new batch of the raw export goes through the steps of notebooks 02-04
+with their persisted state instead of a full rerun:
+
+1. cleaning: the same column selection, remapping and Oceania removal, with
+   population_best filled from the saved per-country medians;
+2. features: the same encoding, with the saved StandardScaler parameters,
+   region_order/source_scale_order maps and category lists;
+3. clusters: the saved k-NN model labels the batch;
+4. store: the events are upserted into the partitioned dashboard store by
+   event_id_cnty, which also moves the store summary by the batch's counts.
+
+Every step only touches the batch, so the cost grows with the batch size.
+Categories never seen in the original export (interactions, event types)
+encode as in pd.Categorical, i.e. as missing; events dropped by the
+notebooks (geo_precision == 3, or without a usable feature row) are skipped.
+"""
+
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from acled import cleaning, features, store
+from acled.derive import enrich
+from acled.propagation import KNN_MODEL
+
+
+def read_batch(raw_path: Path) -> pd.DataFrame:
+    """Read a batch of the raw export with the notebook dtypes, keeping event_date and the actors for the dashboard."""
+    columns = cleaning.CLEAN_COLUMNS + ["event_date"] + store.ACTOR_COLUMNS
+    return pd.read_csv(
+        raw_path,
+        usecols=columns,
+        dtype={col: cleaning.DTYPE_MAP[col] for col in cleaning.CLEAN_COLUMNS + store.ACTOR_COLUMNS},
+        parse_dates=["event_date"],
+        low_memory=False,
+    )
+
+
+def assign(events: pd.DataFrame, features_path: Path = features.FEATURES_DIR, model_path: Path = KNN_MODEL,
+           clean_path: Path = cleaning.CLEAN_CSV) -> pd.DataFrame:
+    """Clean, encode and label raw events; returns the labelled events with the dashboard columns."""
+    batch = cleaning.clean_chunk(events)
+    medians = cleaning.read_medians(clean_path)
+    cleaning.fill_population(batch, medians["countries"], medians["overall"])
+    batch = features.prepare(batch)
+
+    feature_matrix = features.open_features(features_path)
+    X = features.encode(batch, feature_matrix.meta, feature_matrix.scaler())
+    usable = np.isfinite(X).all(axis=1)
+    batch, X = batch[usable], X[usable]
+
+    knn = joblib.load(model_path, mmap_mode="r")
+    batch["cluster"] = knn.predict(X) if len(X) else np.zeros(0, dtype=int)
+    batch["event_date"] = events.loc[batch.index, "event_date"]
+    batch[store.ACTOR_COLUMNS] = events.loc[batch.index, store.ACTOR_COLUMNS]
+    return batch[[store.ID_COLUMN] + store.DEPLOY_COLUMNS + store.OPTIONAL_COLUMNS]
+
+
+def assign_batch(raw_path: Path, store_path: Path = store.PARTITIONED_STORE,
+                 features_path: Path = features.FEATURES_DIR, model_path: Path = KNN_MODEL,
+                 clean_path: Path = cleaning.CLEAN_CSV) -> dict:
+    """Label a batch of the raw export and upsert it into the dashboard store."""
+    events = read_batch(raw_path)
+    batch = assign(events, features_path, model_path, clean_path)
+
+    df = batch.astype({col: dtype for col, dtype in store.DTYPES.items()})
+    counts = store.upsert_events(enrich(df), store_path)
+    return {"events": len(events), "skipped": len(events) - len(batch), **counts}
@@ -0,0 +1,166 @@
+"""
+k-distance curves for choosing the DBSCAN eps (notebooks/03_modelling.ipynb).
+
+The notebook queries NearestNeighbors(n_neighbors=8) with every row of the
+feature matrix to draw one sorted k-distance curve, and reads eps off its
+elbow. The sorted curve is the quantile function of the rows' k-distances,
+so a sample of query rows estimates it:
+
+1. query rows are drawn systematically from the rows ordered by stratum
+   (region and event type by default), so every stratum gets its share;
+2. the query rows are searched against a KD-tree over all rows, in parallel
+   threads, once for the largest k: every smaller min_samples of a sweep
+   reads its column of the same result;
+3. by the Dvoretzky-Kiefer-Wolfowitz inequality the exact curve lies within
+   `tolerance` (a share of the rows) left or right of the estimate with the
+   given confidence, which gives the distance band;
+4. the knee is the point of the curve farthest below the chord from its
+   start to the `max_position` quantile (Kneedle), with a bootstrap band.
+
+As in the notebook, each query row is its own first neighbor.
+"""
+
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from acled.features import FEATURES_DIR, open_features
+
+# ---------------- Parameters ----------------
+# notebook 03: start with 8, then try 6, 10, 4, 12
+SWEEP = [4, 6, 8, 10, 12]
+SAMPLE_SIZE = 20_000
+CONFIDENCE = 0.95
+N_BOOTSTRAP = 200
+# the last rows of the curve are isolated events, left out of the knee search
+MAX_POSITION = 0.99
+
+# share of the rows between two points of the returned curves
+POSITIONS = np.linspace(0, 1, 1001)
+
+
+@dataclass(frozen=True)
+class KDistanceCurve:
+    """Estimated sorted k-distance curve of one min_samples, on POSITIONS."""
+    min_samples: int
+    distances: np.ndarray
+    lower: np.ndarray
+    upper: np.ndarray
+    # largest horizontal gap to the exact curve, as a share of the rows, at `confidence`
+    tolerance: float
+    confidence: float
+    knee: float
+    knee_lower: float
+    knee_upper: float
+    sample_size: int
+
+
+def stratified_sample(strata: np.ndarray, size: int, seed: int = 42) -> np.ndarray:
+    """
+    Row positions of a systematic sample of the rows ordered by stratum (random
+    order within each), so each stratum is sampled in proportion to its size.
+    """
+    rng = np.random.default_rng(seed)
+    n_rows = len(strata)
+    size = min(size, n_rows)
+    order = np.lexsort((rng.random(n_rows), strata))
+    step = n_rows / size
+    return np.sort(order[(rng.random() * step + np.arange(size) * step).astype(np.intp)])
+
+
+def feature_strata(features) -> np.ndarray:
+    """Stratum of every row of a FeatureMatrix: its region code and event type."""
+    columns = features.columns
+    keys = [columns.index("region_code")] + [columns.index(event_type) for event_type in features.meta["event_types"]]
+    _, strata = np.unique(np.asarray(features.matrix[:, keys]), axis=0, return_inverse=True)
+    return strata.reshape(-1)
+
+
+def find_knee(positions: np.ndarray, distances: np.ndarray, max_position: float = MAX_POSITION) -> float:
+    """Distance at the knee of increasing, convex curves (rows of `distances`), by Kneedle."""
+    distances = np.atleast_2d(distances)
+    keep = positions <= max_position
+    x, y = positions[keep], distances[:, keep]
+    x = (x - x[0]) / (x[-1] - x[0])
+    span = y[:, -1:] - y[:, :1]
+    y = (y - y[:, :1]) / np.where(span > 0, span, 1)
+    knee = np.argmax(x - y, axis=1)
+    return distances[np.arange(len(distances)), knee]
+
+
+def _quantiles(sorted_distances: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    """Sorted-curve values at `positions` (shares of the rows), as in np.quantile(method='inverted_cdf')."""
+    n = sorted_distances.shape[-1]
+    ranks = np.clip(np.ceil(positions * n).astype(np.intp) - 1, 0, n - 1)
+    return sorted_distances[..., ranks]
+
+
+def estimate_curves(X: np.ndarray, min_samples=SWEEP, strata: np.ndarray = None, sample_size: int = SAMPLE_SIZE,
+                    confidence: float = CONFIDENCE, n_bootstrap: int = N_BOOTSTRAP,
+                    max_position: float = MAX_POSITION, n_jobs: int = None, seed: int = 42) -> dict:
+    """Estimated k-distance curve of `X` for each of `min_samples`, keyed by min_samples."""
+    from sklearn.neighbors import NearestNeighbors
+
+    min_samples = sorted({int(k) for k in np.atleast_1d(min_samples)})
+    if strata is None:
+        strata = np.zeros(len(X), dtype=np.intp)
+    queries = stratified_sample(strata, sample_size, seed)
+    n = len(queries)
+
+    index = NearestNeighbors(n_neighbors=max(min_samples), algorithm="kd_tree", n_jobs=n_jobs).fit(X)
+    distances, _ = index.kneighbors(np.asarray(X[queries]))
+
+    tolerance = float(np.sqrt(np.log(2 / (1 - confidence)) / (2 * n)))
+    rng = np.random.default_rng(seed)
+    resamples = rng.integers(0, n, size=(n_bootstrap, n))
+    tail = (1 - confidence) / 2 * 100
+
+    curves = {}
+    for k in min_samples:
+        k_distances = np.sort(distances[:, k - 1])
+        estimate = _quantiles(k_distances, POSITIONS)
+        boot_knees = find_knee(POSITIONS, _quantiles(np.sort(k_distances[resamples], axis=1), POSITIONS),
+                               max_position)
+        curves[k] = KDistanceCurve(
+            min_samples=k,
+            distances=estimate,
+            lower=_quantiles(k_distances, np.clip(POSITIONS - tolerance, 0, 1)),
+            upper=_quantiles(k_distances, np.clip(POSITIONS + tolerance, 0, 1)),
+            tolerance=tolerance,
+            confidence=confidence,
+            knee=float(find_knee(POSITIONS, estimate, max_position)[0]),
+            knee_lower=float(np.percentile(boot_knees, tail)),
+            knee_upper=float(np.percentile(boot_knees, 100 - tail)),
+            sample_size=n,
+        )
+    return curves
+
+
+def feature_curves(features_path: Path = FEATURES_DIR, min_samples=SWEEP, sample_size: int = SAMPLE_SIZE,
+                   n_jobs: int = None, **kwargs) -> dict:
+    """k-distance curves of the saved feature matrix, stratified by region and event type."""
+    features = open_features(features_path)
+    return estimate_curves(features.matrix, min_samples, feature_strata(features), sample_size,
+                           n_jobs=n_jobs, **kwargs)
+
+
+def plot_curves(curves: dict, path: Path) -> Path:
+    """Save the curves with their bands and knees, as the notebook's k-distance plot."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(10, 5))
+    for k, curve in curves.items():
+        line, = ax.plot(POSITIONS, curve.distances, label=f"min_samples = {k}: eps ≈ {curve.knee:.2f}")
+        ax.fill_between(POSITIONS, curve.lower, curve.upper, color=line.get_color(), alpha=0.2)
+        ax.axhline(curve.knee, color=line.get_color(), linestyle=":", linewidth=1)
+    ax.set_title("K-distance Plot")
+    ax.set_xlabel("Share of points sorted by distance")
+    ax.set_ylabel("k-NN distance")
+    ax.grid(True)
+    ax.legend()
+    fig.savefig(path, dpi=120, bbox_inches="tight")
+    plt.close(fig)
+    return path
@@ -0,0 +1,257 @@
+"""
+Cluster profiles for the Cluster Profile tab of the Cluster Insights page.
+
+The tab used to take the mode of five categorical columns, the mean and
+median fatalities, the median population and the date range of the selected
+cluster from its filtered rows, on every selection. They are aggregated once
+instead, into cells keyed by the cube dimensions (cluster, year, region,
+event_type, fatality_severity), each holding:
+
+- the event count, the fatality sum and the first and last event date;
+- a frequency table of every profiled categorical column;
+- a histogram of the fatalities (exact, they are integers) and a quantile
+  sketch of population_best: log-spaced buckets whose value is within
+  RELATIVE_ACCURACY of every value in the bucket, as in DDSketch.
+
+All of them merge by addition (the dates by min and max), so the profile of a
+cluster under the sidebar filters merges its cells matching the filters.
+Cells are sorted by cluster: a profile reads one contiguous block, whose size
+depends on how the cluster spreads over the partitions, not on its events.
+
+`python -m acled profiles` saves the cells of the whole dataset to
+models/cluster_profiles.npz, read by the dashboard instead of building them
+from the loaded frame.
+
+The cells have no actor dimension. For the events of the selected actors,
+RowProfiles summarizes the rows of the cluster among them instead, at a cost
+following those rows only.
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from acled.cube import CUBE_DIMENSIONS, cell_mask
+from acled.derive import category_codes
+from acled.store import ROOT
+
+# ---------------- Paths ----------------
+PROFILES = ROOT / "models" / "cluster_profiles.npz"
+
+# categorical columns whose dominant value the tab shows
+MODE_COLUMNS = ["event_type", "sub_event_type", "interaction", "region", "country"]
+# numeric columns whose median the tab shows; population_best is sketched
+MEDIAN_COLUMNS = ["fatalities", "population_best"]
+# largest relative error of a sketched value
+RELATIVE_ACCURACY = 0.005
+
+
+def sketch_values(values: np.ndarray, relative_accuracy: float = RELATIVE_ACCURACY) -> np.ndarray:
+    """Value of the log-spaced bucket of every positive value; other values are kept."""
+    gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        keys = np.ceil(np.log(values) / np.log(gamma))
+        return np.where(values > 0, 2 * gamma ** keys / (gamma + 1), values)
+
+
+def _codes(values: pd.Series) -> tuple:
+    """Codes (-1 for missing) and sorted labels of a categorical column."""
+    codes, labels = category_codes(values, sort=True)
+    return codes, np.asarray(labels)
+
+
+def _value_codes(values: np.ndarray) -> tuple:
+    """Codes (-1 for NaN) and sorted distinct values of a numeric column."""
+    present = ~np.isnan(values)
+    codes = np.full(len(values), -1, dtype=np.int64)
+    labels, codes[present] = np.unique(values[present], return_inverse=True)
+    return codes, labels
+
+
+def _table(cell: np.ndarray, n_cells: int, codes: np.ndarray, n_codes: int) -> sparse.csr_matrix:
+    """Counts of every code in every cell, as a sparse (cells x codes) matrix."""
+    present = (cell >= 0) & (codes >= 0)
+    ones = np.ones(present.sum(), dtype=np.int64)
+    return sparse.csr_matrix((ones, (cell[present], codes[present])), shape=(n_cells, n_codes))
+
+
+def _mode(labels: np.ndarray, counts: np.ndarray):
+    """Most frequent label, the first in label order on ties (as Series.mode()[0])."""
+    return labels[np.argmax(counts)] if counts.any() else None
+
+
+def _median(values: np.ndarray, counts: np.ndarray) -> float:
+    """Median of sorted `values` repeated `counts` times, averaging the middle pair (as Series.median())."""
+    n = counts.sum()
+    if not n:
+        return float("nan")
+    cumulative = np.cumsum(counts)
+    lower, upper = np.searchsorted(cumulative, [(n - 1) // 2, n // 2], side="right")
+    return float((values[lower] + values[upper]) / 2)
+
+
+class ClusterProfiles:
+    """Mergeable profile cells of one dataset, sorted by cluster."""
+
+    def __init__(self, cells: pd.DataFrame, tables: dict, labels: dict, source: dict):
+        self.cells = cells
+        # column -> sparse (cells x labels) counts, and the label of every count column
+        self.tables = tables
+        self.labels = labels
+        # rows, store generation and source CSV (size, mtime) of the data the cells were built from
+        self.source = source
+        self._clusters = cells["cluster"].to_numpy()
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, generation: int | None = None,
+                   source_file: dict | None = None) -> "ClusterProfiles":
+        grouped = (
+            df[CUBE_DIMENSIONS + ["event_date"]]
+            .assign(fatalities=df["fatalities"].astype("int64"))
+            .groupby(CUBE_DIMENSIONS, observed=True, sort=True)
+        )
+        cells = grouped.agg(
+            events=("fatalities", "size"),
+            fatalities=("fatalities", "sum"),
+            first_date=("event_date", "min"),
+            last_date=("event_date", "max"),
+        ).reset_index()
+        # cell of every row, -1 for rows with a missing dimension (left out, as in the cube)
+        cell = np.nan_to_num(grouped.ngroup().to_numpy(dtype=np.float64), nan=-1).astype(np.int64)
+
+        tables, labels = {}, {}
+        for col in MODE_COLUMNS:
+            codes, labels[col] = _codes(df[col])
+            tables[col] = _table(cell, len(cells), codes, len(labels[col]))
+        for col in MEDIAN_COLUMNS:
+            values = df[col].to_numpy(dtype=np.float64)
+            if col == "population_best":
+                values = sketch_values(values)
+            codes, labels[col] = _value_codes(values)
+            tables[col] = _table(cell, len(cells), codes, len(labels[col]))
+        return cls(cells, tables, labels, {"rows": len(df), "generation": generation, "source_file": source_file})
+
+    @property
+    def nbytes(self) -> int:
+        tables = sum(t.data.nbytes + t.indices.nbytes + t.indptr.nbytes for t in self.tables.values())
+        return int(self.cells.memory_usage(deep=True).sum()) + tables
+
+    def profile(self, cluster, filters: dict | None = None) -> dict | None:
+        """Summary of `cluster` over its cells matching `filters`; None if no event matches."""
+        start = np.searchsorted(self._clusters, cluster, side="left")
+        stop = np.searchsorted(self._clusters, cluster, side="right")
+        block = self.cells.iloc[start:stop]
+        keep = cell_mask(block, filters) if filters else np.ones(len(block), dtype=bool)
+        if not keep.any():
+            return None
+
+        weights = keep.astype(np.int64)
+        counts = {col: table[start:stop].T @ weights for col, table in self.tables.items()}
+        events = int(block["events"].to_numpy()[keep].sum())
+        fatalities = int(block["fatalities"].to_numpy()[keep].sum())
+        return {
+            "cluster": cluster,
+            "events": events,
+            "fatalities": fatalities,
+            "mean_fatalities": fatalities / events,
+            **{col: _mode(self.labels[col], counts[col]) for col in MODE_COLUMNS},
+            **{f"median_{col}": _median(self.labels[col], counts[col]) for col in MEDIAN_COLUMNS},
+            "first_date": pd.Timestamp(block["first_date"].to_numpy()[keep].min()),
+            "last_date": pd.Timestamp(block["last_date"].to_numpy()[keep].max()),
+        }
+
+    def save(self, path: Path = PROFILES) -> Path:
+        """Write the cells, tables and labels as one uncompressed .npz file."""
+        arrays = {"source": np.array(json.dumps(self.source))}
+        for col in self.cells.columns:
+            values = self.cells[col]
+            if values.dtype == object or isinstance(values.dtype, pd.CategoricalDtype):
+                arrays[f"cells.{col}"] = values.to_numpy(dtype=str)
+            else:
+                arrays[f"cells.{col}"] = values.to_numpy()
+        for col, table in self.tables.items():
+            arrays[f"{col}.data"] = table.data
+            arrays[f"{col}.indices"] = table.indices
+            arrays[f"{col}.indptr"] = table.indptr
+            labels = self.labels[col]
+            arrays[f"{col}.labels"] = labels if labels.dtype.kind == "f" else labels.astype(str)
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+        tmp_path.replace(path)
+        return path
+
+
+class RowProfiles:
+    """
+    Profiles over a subset of the rows of a frame, summarized from the rows of
+    the cluster in the subset with the same counts and helpers as the cells.
+    """
+
+    def __init__(self, df: pd.DataFrame, rows: np.ndarray):
+        self._df = df
+        self._rows, self._clusters = rows, df["cluster"].to_numpy()[rows]
+
+    def profile(self, cluster, filters: dict | None = None) -> dict | None:
+        """Summary of `cluster` over its rows in the subset matching `filters` (whole years); None if none does."""
+        rows = self._rows[self._clusters == cluster]
+        dimensions = self._df[CUBE_DIMENSIONS].take(rows)
+        # rows with a missing dimension have no cell
+        keep = dimensions.notna().all(axis=1).to_numpy()
+        if filters:
+            keep = keep & cell_mask(dimensions, filters)
+        rows = rows[keep]
+        if not len(rows):
+            return None
+
+        counts = {}
+        for col in MODE_COLUMNS:
+            codes, labels = _codes(self._df[col].take(rows))
+            counts[col] = labels, np.bincount(codes[codes >= 0], minlength=len(labels))
+        for col in MEDIAN_COLUMNS:
+            values = self._df[col].to_numpy()[rows].astype(np.float64)
+            if col == "population_best":
+                values = sketch_values(values)
+            codes, labels = _value_codes(values)
+            counts[col] = labels, np.bincount(codes[codes >= 0], minlength=len(labels))
+        fatalities = int(self._df["fatalities"].to_numpy()[rows].sum())
+        dates = self._df["event_date"].to_numpy()[rows]
+        return {
+            "cluster": cluster,
+            "events": len(rows),
+            "fatalities": fatalities,
+            "mean_fatalities": fatalities / len(rows),
+            **{col: _mode(*counts[col]) for col in MODE_COLUMNS},
+            **{f"median_{col}": _median(*counts[col]) for col in MEDIAN_COLUMNS},
+            "first_date": pd.Timestamp(dates.min()),
+            "last_date": pd.Timestamp(dates.max()),
+        }
+
+
+def build_profiles(df: pd.DataFrame, out_path: Path = PROFILES, generation: int | None = None,
+                   source_file: dict | None = None) -> Path:
+    """Aggregate the profile cells of `df` and save them to `out_path`."""
+    return ClusterProfiles.from_frame(df, generation, source_file).save(out_path)
+
+
+def read_profiles(path: Path = PROFILES) -> ClusterProfiles:
+    """The saved profile cells."""
+    with np.load(path) as saved:
+        columns = [key.split(".", 1)[1] for key in saved.files if key.startswith("cells.")]
+        cells = pd.DataFrame({col: saved[f"cells.{col}"] for col in columns})
+
+        tables, labels = {}, {}
+        for col in MODE_COLUMNS + MEDIAN_COLUMNS:
+            labels[col] = saved[f"{col}.labels"]
+            if labels[col].dtype.kind == "U":
+                labels[col] = labels[col].astype(object)
+            tables[col] = sparse.csr_matrix(
+                (saved[f"{col}.data"], saved[f"{col}.indices"], saved[f"{col}.indptr"]),
+                shape=(len(cells), len(labels[col])),
+            )
+        return ClusterProfiles(cells, tables, labels, json.loads(saved["source"].item()))
@@ -0,0 +1,156 @@
+"""
+k-NN label propagation to the full event set (notebooks/03_modelling.ipynb).
+
+The notebook fits KNeighborsClassifier(n_neighbors=20, weights='distance') on
+the DBSCAN-labelled sample and predicts the whole feature matrix in one call,
+holding every neighbor distance and index array at once. Here the fitted
+model is saved once with joblib, and a process pool predicts the matrix in
+fixed-size batches:
+
+- every worker memory-maps the saved model and the feature matrix, so the
+  neighbor index and the rows are shared rather than copied;
+- each finished batch is written to a memory-mapped label file and then
+  marked done, so an interrupted run resumes with the batches still missing.
+
+Predictions are row-independent, so the labels equal the single-call ones.
+"""
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+from acled.clustering import CLUSTERS
+from acled.features import FEATURES_DIR, open_features
+from acled.store import ROOT
+
+# ---------------- Paths ----------------
+KNN_MODEL = ROOT / "models" / "knn.joblib"
+FULL_LABELS = ROOT / "models" / "full_clusters"
+
+_LABELS = "labels.npy"
+_DONE = "done.npy"
+_PROGRESS = "progress.json"
+
+# ---------------- Parameters (notebook 03) ----------------
+N_NEIGHBORS = 20
+BATCH_SIZE = 50_000
+
+
+def _stamp(path: Path) -> list:
+    stat = path.stat()
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def train_knn(features_path: Path = FEATURES_DIR, clusters_path: Path = CLUSTERS,
+              model_path: Path = KNN_MODEL) -> Path:
+    """Fit the k-NN classifier on the DBSCAN-labelled rows and save it for the workers."""
+    from sklearn.neighbors import KNeighborsClassifier
+
+    clusters = np.load(clusters_path)
+    X_sample = open_features(features_path).matrix[clusters["rows"]]
+    y_sample = clusters["labels"].astype(int)
+
+    knn = KNeighborsClassifier(n_neighbors=N_NEIGHBORS, weights="distance", n_jobs=-1)
+    knn.fit(X_sample, y_sample)
+
+    model_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = model_path.with_name(model_path.name + ".tmp")
+    joblib.dump(knn, tmp_path)
+    tmp_path.replace(model_path)
+    return model_path
+
+
+# ---------------- Workers ----------------
+
+# model and feature matrix of the running propagation, opened once per worker
+_shared = {}
+
+
+def _init(features_path: Path, model_path: Path) -> None:
+    knn = joblib.load(model_path, mmap_mode="r")
+    # parallelism comes from the pool, one thread per worker
+    knn.n_jobs = 1
+    _shared["knn"] = knn
+    _shared["matrix"] = open_features(features_path).matrix
+
+
+def _predict(batch: int, start: int, stop: int) -> tuple:
+    return batch, _shared["knn"].predict(_shared["matrix"][start:stop]).astype(np.int32)
+
+
+# ---------------- Propagation ----------------
+
+def _open_run(out_path: Path, progress: dict) -> tuple:
+    """Label and done-flag files of a run with these settings, created if missing or stale."""
+    progress_path = out_path / _PROGRESS
+    if progress_path.exists() and json.loads(progress_path.read_text()) == progress:
+        return (np.load(out_path / _LABELS, mmap_mode="r+"),
+                np.load(out_path / _DONE, mmap_mode="r+"))
+
+    out_path.mkdir(parents=True, exist_ok=True)
+    progress_path.unlink(missing_ok=True)
+    labels = np.lib.format.open_memmap(out_path / _LABELS, mode="w+", dtype=np.int32, shape=(progress["rows"],))
+    done = np.lib.format.open_memmap(out_path / _DONE, mode="w+", dtype=bool, shape=(progress["batches"],))
+    labels[:] = -1
+    labels.flush()
+    done.flush()
+    # written last, so a run interrupted while creating the files starts over
+    progress_path.write_text(json.dumps(progress, indent=1))
+    return labels, done
+
+
+def propagate(features_path: Path = FEATURES_DIR, model_path: Path = KNN_MODEL, out_path: Path = FULL_LABELS,
+              batch_size: int = BATCH_SIZE, n_jobs: int = None, progress=None) -> Path:
+    """
+    Predict the cluster of every row of the feature matrix, batch by batch.
+    `progress(done, total)` is called after each written batch.
+    """
+    n_jobs = os.cpu_count() if n_jobs == -1 else n_jobs or 1
+    rows = open_features(features_path).matrix.shape[0]
+    settings = {
+        "rows": rows,
+        "batch_size": batch_size,
+        "batches": -(-rows // batch_size),
+        "features": _stamp(features_path / "matrix.npy"),
+        "model": _stamp(model_path),
+    }
+    labels, done = _open_run(out_path, settings)
+    todo = [(batch, batch * batch_size, min((batch + 1) * batch_size, rows))
+            for batch in np.flatnonzero(~done)]
+
+    def write(batch: int, predicted: np.ndarray) -> None:
+        start = batch * batch_size
+        labels[start:start + len(predicted)] = predicted
+        labels.flush()
+        # the flag is flushed only after the labels it vouches for
+        done[batch] = True
+        done.flush()
+        if progress is not None:
+            progress(int(done.sum()), len(done))
+
+    if n_jobs == 1:
+        _init(features_path, model_path)
+        try:
+            for task in todo:
+                write(*_predict(*task))
+        finally:
+            _shared.clear()
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init,
+                                 initargs=(features_path, model_path)) as pool:
+            for future in as_completed([pool.submit(_predict, *task) for task in todo]):
+                write(*future.result())
+    return out_path
+
+
+def open_labels(out_path: Path = FULL_LABELS) -> np.ndarray:
+    """The propagated labels, memory-mapped read-only; raises if the run is incomplete."""
+    done = np.load(out_path / _DONE)
+    if not done.all():
+        raise RuntimeError(f"{out_path} is incomplete ({done.sum()} of {len(done)} batches), "
+                           "resume it with `python -m acled propagate`")
+    return np.load(out_path / _LABELS, mmap_mode="r")
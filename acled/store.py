@@ -0,0 +1,385 @@
+"""
+On-disk storage of the dashboard dataset.
+
+The deployment CSV (notebooks/df_deploy.csv) is converted once into a typed,
+columnar Arrow snapshot. Loading the snapshot memory-maps the file instead of
+re-parsing text and re-inferring dtypes on every cold start.
+
+The full-resolution dataset (models/df_full_with_clusters.csv, before the 50%
+deployment sample) is kept as a compressed Parquet store partitioned by year
+and region. Year range and region selections are pushed down to the
+partitions, so only the matching files are read and decoded. Newly published
+events are added to (or replace their earlier version in) this store without a
+rebuild, see upsert_events().
+"""
+
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+from acled.actors import ACTOR_COLUMNS
+from acled.derive import enrich
+
+# ---------------- Paths ----------------
+ROOT = Path(__file__).resolve().parent.parent
+# the dashboard's data can be relocated through the environment (e.g. to
+# benchmark it on synthetic data, see benchmarks/app_reruns.py)
+DEPLOY_CSV = Path(os.environ.get("ACLED_DEPLOY_CSV", ROOT / "notebooks" / "df_deploy.csv"))
+SNAPSHOT = DEPLOY_CSV.with_suffix(".arrow")
+FULL_CSV = ROOT / "models" / "df_full_with_clusters.csv"
+PARTITIONED_STORE = Path(os.environ.get("ACLED_STORE", ROOT / "data" / "deploy"))
+
+# ---------------- Schema ----------------
+DEPLOY_COLUMNS = [
+    "event_date", "event_type", "sub_event_type", "interaction", "region",
+    "country", "fatalities", "population_best", "cluster",
+]
+
+# carried along when the source has them (the full-resolution export does), for the spatial density map
+COORDINATE_COLUMNS = ["latitude", "longitude"]
+# likewise for the actor filter, dictionary-encoded (category codes into the actor names)
+OPTIONAL_COLUMNS = COORDINATE_COLUMNS + ACTOR_COLUMNS
+
+CATEGORY_COLUMNS = ["event_type", "sub_event_type", "interaction", "region", "country"]
+
+DTYPES = {
+    **{col: "category" for col in CATEGORY_COLUMNS},
+    "fatalities": "int32",
+    "population_best": "float32",
+    "cluster": "int32",
+    "latitude": "float32",
+    "longitude": "float32",
+    **{col: "category" for col in ACTOR_COLUMNS},
+}
+
+# bump when the snapshot layout or the derived columns change
+SNAPSHOT_VERSION = b"4"
+
+# schema metadata keys used to detect a stale snapshot
+_SOURCE_SIZE = b"source_size"
+_SOURCE_MTIME = b"source_mtime_ns"
+_VERSION = b"snapshot_version"
+
+
+def read_csv(path: Path = DEPLOY_CSV, columns: list = DEPLOY_COLUMNS) -> pd.DataFrame:
+    """Parse the deployment CSV into the dashboard dtypes and add the derived columns."""
+    df = pd.read_csv(path, index_col=0, parse_dates=["event_date"])
+    # the full-resolution export carries the other cleaned columns too
+    df = df[columns + [col for col in OPTIONAL_COLUMNS if col in df.columns and col not in columns]]
+    # cluster is stored as float after the merge in notebook 04, cast explicitly
+    return enrich(df.astype({col: dtype for col, dtype in DTYPES.items() if col in df.columns}))
+
+
+def _source_stamp(path: Path) -> dict:
+    stat = path.stat()
+    return {
+        _SOURCE_SIZE: str(stat.st_size).encode(),
+        _SOURCE_MTIME: str(stat.st_mtime_ns).encode(),
+        _VERSION: SNAPSHOT_VERSION,
+    }
+
+
+def build_snapshot(csv_path: Path = DEPLOY_CSV, snapshot_path: Path = SNAPSHOT) -> Path:
+    """Write the typed Arrow snapshot of `csv_path` and return its path."""
+    table = pa.Table.from_pandas(read_csv(csv_path), preserve_index=True)
+    table = table.replace_schema_metadata({**table.schema.metadata, **_source_stamp(csv_path)})
+
+    # write to a temporary file first so readers never see a half-written snapshot
+    tmp_path = snapshot_path.with_suffix(".arrow.tmp")
+    feather.write_feather(table, tmp_path, compression="uncompressed")
+    tmp_path.replace(snapshot_path)
+    return snapshot_path
+
+
+def snapshot_is_fresh(csv_path: Path = DEPLOY_CSV, snapshot_path: Path = SNAPSHOT) -> bool:
+    """True if the snapshot exists and was built from the current CSV."""
+    if not snapshot_path.exists():
+        return False
+
+    with pa.memory_map(str(snapshot_path)) as source:
+        metadata = pa.ipc.open_file(source).schema.metadata or {}
+    if metadata.get(_VERSION) != SNAPSHOT_VERSION:
+        return False
+    if not csv_path.exists():
+        # nothing to compare against, the snapshot is the only source
+        return True
+
+    stamp = _source_stamp(csv_path)
+    return all(metadata.get(key) == value for key, value in stamp.items())
+
+
+def source_file(csv_path: Path = DEPLOY_CSV, snapshot_path: Path = SNAPSHOT) -> dict | None:
+    """
+    Size and mtime of the CSV load_frame() serves (as stamped in the snapshot
+    when only the snapshot is left), for aggregates saved from it to tell
+    whether they are stale.
+    """
+    if csv_path.exists():
+        stat = csv_path.stat()
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if not snapshot_path.exists():
+        return None
+    with pa.memory_map(str(snapshot_path)) as source:
+        metadata = pa.ipc.open_file(source).schema.metadata or {}
+    if _SOURCE_SIZE not in metadata:
+        return None
+    return {"size": int(metadata[_SOURCE_SIZE]), "mtime_ns": int(metadata[_SOURCE_MTIME])}
+
+
+def read_snapshot(snapshot_path: Path = SNAPSHOT) -> pd.DataFrame:
+    """Memory-map the snapshot and convert it without consolidating column blocks."""
+    table = feather.read_table(snapshot_path, memory_map=True)
+    return table.to_pandas(split_blocks=True)
+
+
+def load_frame(csv_path: Path = DEPLOY_CSV, snapshot_path: Path = SNAPSHOT) -> pd.DataFrame:
+    """Load the dashboard dataset, preferring the snapshot over the CSV."""
+    if snapshot_is_fresh(csv_path, snapshot_path):
+        return read_snapshot(snapshot_path)
+
+    df = read_csv(csv_path)
+    try:
+        # refresh the snapshot so the next cold start can use it
+        build_snapshot(csv_path, snapshot_path)
+    except OSError:
+        # read-only deployments keep working from the CSV
+        pass
+    return df
+
+
+# ---------------- Partitioned store ----------------
+PARTITION_SCHEMA = pa.schema([("year", pa.int16()), ("region", pa.string())])
+ID_COLUMN = "event_id_cnty"
+
+# files starting with "_" are skipped by dataset discovery
+_SUMMARY = "_summary.json"
+_IDS = "_ids"
+
+# caps the rewrite needed when one event of a file is updated
+MAX_ROWS_PER_FILE = 64_000
+
+
+def _partitioning() -> ds.Partitioning:
+    return ds.partitioning(PARTITION_SCHEMA, flavor="hive")
+
+
+def _to_table(df: pd.DataFrame) -> pa.Table:
+    """Arrow table of `df` with int32 dictionary indices, so every write shares one schema."""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    fields = [
+        field.with_type(pa.dictionary(pa.int32(), field.type.value_type, field.type.ordered))
+        if pa.types.is_dictionary(field.type) else field
+        for field in table.schema
+    ]
+    return table.cast(pa.schema(fields, metadata=table.schema.metadata))
+
+
+def _write_files(df: pd.DataFrame, store_path: Path, generation: int) -> list:
+    """Write `df` as new files of the store and return their paths relative to `store_path`."""
+    written = []
+    ds.write_dataset(
+        _to_table(df),
+        store_path,
+        format="parquet",
+        partitioning=_partitioning(),
+        basename_template=f"part-{generation}-{{i}}.parquet",
+        file_options=ds.ParquetFileFormat().make_write_options(compression="zstd"),
+        max_rows_per_file=MAX_ROWS_PER_FILE,
+        max_rows_per_group=MAX_ROWS_PER_FILE,
+        existing_data_behavior="overwrite_or_ignore",
+        file_visitor=lambda file: written.append(Path(file.path).relative_to(store_path).as_posix()),
+    )
+    return written
+
+
+def _write_id_index(store_path: Path, generation: int, files: list) -> None:
+    """
+    Write the event id -> file index of the files of one write, sorted by id.
+    The segments are memory-mapped and binary-searched, so finding the file of
+    an event never scans the store.
+    """
+    ids, codes = [np.zeros(0, dtype="S1")], [np.zeros(0, dtype=np.int32)]
+    for code, file in enumerate(files):
+        column = pq.read_table(store_path / file, columns=[ID_COLUMN]).column(0)
+        ids.append(column.to_numpy(zero_copy_only=False).astype(bytes))
+        codes.append(np.full(len(column), code, dtype=np.int32))
+    ids = np.concatenate(ids)
+
+    segment = np.empty(len(ids), dtype=[("id", ids.dtype), ("file", np.int32)])
+    segment["id"] = ids
+    segment["file"] = np.concatenate(codes)
+    segment.sort(order="id")
+
+    index_path = store_path / _IDS
+    index_path.mkdir(exist_ok=True)
+    np.save(index_path / f"{generation:06d}.npy", segment)
+    (index_path / f"{generation:06d}.json").write_text(json.dumps(files))
+
+
+def _locate(store_path: Path, ids: np.ndarray) -> dict:
+    """Files holding any of `ids`, each with the ids it holds, from the newest index segment listing them."""
+    remaining = np.unique(np.asarray(ids).astype(bytes))
+    located = {}
+    for segment_path in sorted((store_path / _IDS).glob("*.npy"), reverse=True):
+        if not len(remaining):
+            break
+        segment = np.load(segment_path, mmap_mode="r")
+        if not len(segment):
+            continue
+        width = segment.dtype["id"].itemsize
+        # ids longer than the segment's width cannot be in it
+        candidates = remaining[np.char.str_len(remaining) <= width]
+        positions = np.searchsorted(segment["id"], candidates.astype(segment.dtype["id"]))
+        positions = np.minimum(positions, len(segment) - 1)
+        hit = segment["id"][positions] == candidates
+        if not hit.any():
+            continue
+
+        files = json.loads(segment_path.with_suffix(".json").read_text())
+        for file, event_id in zip(segment["file"][positions[hit]], candidates[hit]):
+            located.setdefault(files[file], []).append(event_id.decode())
+        remaining = np.setdiff1d(remaining, candidates[hit])
+    return located
+
+
+def _summarize(df: pd.DataFrame) -> dict:
+    return {
+        "rows": len(df),
+        "columns": [col for col in df.columns if col != ID_COLUMN],
+        "years": sorted(int(year) for year in df["year"].unique()),
+        "dates": [str(df["event_date"].min().date()), str(df["event_date"].max().date())],
+        "regions": sorted(df["region"].dropna().unique().tolist()),
+        "event_types": sorted(df["event_type"].dropna().unique().tolist()),
+        "cluster_counts": {int(cluster): int(count) for cluster, count in df["cluster"].value_counts().items()},
+    }
+
+
+def build_partitioned_store(csv_path: Path = FULL_CSV, store_path: Path = PARTITIONED_STORE) -> Path:
+    """Write the zstd-compressed Parquet store of `csv_path`, partitioned by year and region."""
+    df = read_csv(csv_path, [ID_COLUMN] + DEPLOY_COLUMNS)
+
+    # build next to the target and swap, so readers never see a partial store
+    tmp_path = store_path.with_name(store_path.name + ".tmp")
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    files = _write_files(df, tmp_path, generation=0)
+    _write_id_index(tmp_path, 0, files)
+
+    # small summary used for the sidebar options without touching the data files
+    summary = {**_summarize(df), "generation": 0}
+    (tmp_path / _SUMMARY).write_text(json.dumps(summary, indent=1))
+
+    shutil.rmtree(store_path, ignore_errors=True)
+    tmp_path.replace(store_path)
+    return store_path
+
+
+def upsert_events(df: pd.DataFrame, store_path: Path = PARTITIONED_STORE) -> dict:
+    """
+    Add events to the partitioned store, replacing the stored events with the
+    same event_id_cnty, and update the summary. The work is proportional to the
+    batch: new rows go to new files, and only the (size-capped) files holding
+    replaced events are rewritten. Returns the counts of added and replaced events.
+    """
+    summary = read_summary(store_path)
+    if "generation" not in summary:
+        raise ValueError(f"{store_path} has no event id index, rebuild it with `python -m acled partitions`")
+    generation = summary["generation"] + 1
+    # every file of the store has the same columns (a store built without coordinates or actors stays without)
+    df = df.drop_duplicates(ID_COLUMN, keep="last")[[ID_COLUMN] + summary["columns"]]
+    located = _locate(store_path, df[ID_COLUMN].to_numpy())
+
+    # new rows first, so readers never miss an event (at worst they briefly see both copies)
+    files = _write_files(df, store_path, generation)
+    _write_id_index(store_path, generation, files)
+
+    replaced = []
+    for file, ids in located.items():
+        path = store_path / file
+        table = pq.read_table(path)
+        stale = pc.is_in(table[ID_COLUMN], value_set=pa.array(ids))
+        replaced.append(table.filter(stale).column("cluster").to_numpy())
+        kept = table.filter(pc.invert(stale))
+        if kept.num_rows:
+            tmp_path = path.with_name(path.name + ".tmp")
+            pq.write_table(kept, tmp_path, compression="zstd")
+            tmp_path.replace(path)
+        else:
+            path.unlink()
+
+    # the pre-aggregated summary moves by the batch's counts
+    added = _summarize(df)
+    replaced = np.concatenate(replaced) if replaced else np.zeros(0, dtype=np.int32)
+    cluster_counts = {int(cluster): count for cluster, count in summary["cluster_counts"].items()}
+    for cluster, count in added["cluster_counts"].items():
+        cluster_counts[cluster] = cluster_counts.get(cluster, 0) + count
+    for cluster, count in zip(*np.unique(replaced, return_counts=True)):
+        cluster_counts[int(cluster)] -= int(count)
+    summary.update({
+        "rows": summary["rows"] + len(df) - len(replaced),
+        "years": sorted(set(summary["years"]) | set(added["years"])),
+        "regions": sorted(set(summary["regions"]) | set(added["regions"])),
+        "event_types": sorted(set(summary["event_types"]) | set(added["event_types"])),
+        "cluster_counts": {cluster: count for cluster, count in sorted(cluster_counts.items()) if count},
+        "generation": generation,
+    })
+    if "dates" in summary:
+        # stores summarized before dates were recorded fall back to their years
+        summary["dates"] = [min(summary["dates"][0], added["dates"][0]), max(summary["dates"][1], added["dates"][1])]
+    tmp_path = store_path / (_SUMMARY + ".tmp")
+    tmp_path.write_text(json.dumps(summary, indent=1))
+    tmp_path.replace(store_path / _SUMMARY)
+    return {"added": len(df) - len(replaced), "replaced": len(replaced)}
+
+
+def summary_version(store_path: Path = PARTITIONED_STORE):
+    """Changes whenever the store is rebuilt or updated; None without a store."""
+    try:
+        return (store_path / _SUMMARY).stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def partition_key(version, filters: dict):
+    """Store version, years of the date range and regions of `filters` to read from the store (None without one)."""
+    if version is None:
+        return None
+    year_range = tuple(day.year for day in filters["date_range"])
+    return version, year_range, tuple(sorted(filters["regions"]))
+
+
+def read_summary(store_path: Path = PARTITIONED_STORE) -> dict:
+    """Row count, column order and filter options of the partitioned store."""
+    return json.loads((store_path / _SUMMARY).read_text())
+
+
+def read_partitions(year_range=None, regions=None, store_path: Path = PARTITIONED_STORE) -> pd.DataFrame:
+    """
+    Read the events of the selected years and regions from the partitioned store.
+    An empty region selection reads every region, as in the sidebar.
+    """
+    summary = read_summary(store_path)
+    dataset = ds.dataset(store_path, format="parquet", partitioning=_partitioning())
+
+    predicate = None
+    if year_range is not None:
+        predicate = (ds.field("year") >= int(year_range[0])) & (ds.field("year") <= int(year_range[1]))
+    if regions:
+        in_regions = ds.field("region").isin(list(regions))
+        predicate = in_regions if predicate is None else predicate & in_regions
+
+    # event ids are only needed for updates, the dashboard never reads them
+    table = dataset.to_table(columns=summary["columns"], filter=predicate)
+    df = table.to_pandas(split_blocks=True, self_destruct=True)
+
+    # partition columns come back as plain values
+    df["region"] = pd.Categorical(df["region"], categories=summary["regions"])
+    return df[summary["columns"]]
@@ -0,0 +1,397 @@
+"""
+Power-law fits of the fatality tail (notebooks/04_clusterInsights_paretoFitting.ipynb).
+
+The notebook fits powerlaw.Fit(fatalities, discrete=True) on the events with
+at least one fatality and compares the power law with the lognormal and the
+exponential. fit_power_law() does the same fit on the distinct values and
+their counts, so its cost follows the number of distinct fatality counts
+rather than the number of events:
+
+1. every distinct value is an xmin candidate (but the largest); the tail
+   sizes and log sums of all candidates are suffix sums over the sorted
+   values, which gives every candidate's alpha at once. As in powerlaw 2,
+   candidates from 10 up use the estimate 1 + n / sum(log(x / (xmin - 0.5)))
+   and smaller ones the exact maximum-likelihood alpha, found for all of
+   them together by golden-section search;
+2. the KS distance of every candidate is taken between the empirical and the
+   zeta CDF of its tail, for all candidates in a few array operations, and
+   xmin is the candidate with the smallest distance;
+3. the lognormal (rounded to integers) and the exponential (geometric) are
+   fitted to the same tail by maximum likelihood, and compared with the power
+   law through the log-likelihood ratio R and its p-value (Vuong's test).
+
+build_tail_table() fits every cluster and region on a process pool, with
+bootstrap intervals for alpha and xmin and a goodness-of-fit p-value, and
+saves one row per group for the Cluster Insights page. Bootstrap samples are
+count vectors over the same distinct values (multinomial draws), so all of
+them go through one batched xmin scan.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy import optimize, special, stats
+
+from acled.store import ROOT
+
+# ---------------- Paths ----------------
+TAIL_FITS = ROOT / "models" / "tail_fits.parquet"
+
+# elements of the (samples x candidates x distinct values) arrays of one KS scan block
+SCAN_BLOCK = 2_000_000
+# smallest xmin for which alpha is estimated rather than maximized (Clauset et al. 2009, eq. 3.7)
+ESTIMATE_FROM = 10
+# search interval of the exact alpha
+ALPHA_BOUNDS = (1.0 + 1e-6, 50.0)
+# Euler-Maclaurin zeta within ~1e-9 relative error from this q up, up to this s
+EM_MIN_Q = 20
+EM_MAX_S = 8
+
+# resamples of the tail table's intervals and goodness-of-fit test
+N_BOOTSTRAP = 200
+CONFIDENCE = 0.95
+# elements of one block of synthetic tails in the goodness-of-fit test
+SYNTHETIC_BLOCK = 2_000_000
+
+
+@dataclass(frozen=True)
+class TailFit:
+    """Discrete power-law fit of one sample, with its likelihood comparisons."""
+
+    n: int
+    n_tail: int
+    xmin: float
+    alpha: float
+    D: float
+    R_lognormal: float
+    p_lognormal: float
+    R_exponential: float
+    p_exponential: float
+    # distinct tail values and the empirical P(X >= x) of the tail at each
+    ccdf_x: np.ndarray
+    ccdf_y: np.ndarray
+
+    @property
+    def nbytes(self) -> int:
+        return self.ccdf_x.nbytes + self.ccdf_y.nbytes
+
+    def power_law_ccdf(self, x: np.ndarray) -> np.ndarray:
+        """P(X >= x) of the fitted power law, for x >= xmin."""
+        return special.zeta(self.alpha, x) / special.zeta(self.alpha, self.xmin)
+
+
+def distinct_counts(values) -> tuple:
+    """Sorted distinct positive values and their counts (zero-fatality events are left out, as in the notebook)."""
+    values = np.asarray(values, dtype=np.float64)
+    return np.unique(values[values > 0], return_counts=True)
+
+
+def hurwitz_zeta(s, q) -> np.ndarray:
+    """
+    Hurwitz zeta(s, q) for s > 1, broadcast over arrays: Euler-Maclaurin
+    summation with three correction terms where it is accurate, scipy's zeta
+    for small q or large s. Several times faster than scipy on the scans.
+    """
+    s, q = np.broadcast_arrays(np.asarray(s, dtype=np.float64), np.asarray(q, dtype=np.float64))
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore", under="ignore"):
+        inverse = 1 / q
+        inverse2 = inverse * inverse
+        term1 = s * inverse / 12
+        term2 = term1 * (s + 1) * (s + 2) * inverse2 / 60
+        term3 = term2 * (s + 3) * (s + 4) * inverse2 / 42
+        values = np.exp(-s * np.log(q)) * (q / (s - 1) + 0.5 + term1 - term2 + term3)
+    exact = (q < EM_MIN_Q) | (s > EM_MAX_S)
+    if exact.any():
+        values[exact] = special.zeta(s[exact], q[exact])
+    return values
+
+
+def _exact_alphas(xmins: np.ndarray, mean_log: np.ndarray, iterations: int = 64) -> np.ndarray:
+    """Alphas maximizing the discrete power-law log-likelihood, per xmin and mean log value of its tail."""
+    def loglikelihood(alpha):
+        return -alpha * mean_log - np.log(hurwitz_zeta(alpha, xmins))
+
+    ratio = (np.sqrt(5) - 1) / 2
+    lo, hi = np.full(len(xmins), ALPHA_BOUNDS[0]), np.full(len(xmins), ALPHA_BOUNDS[1])
+    left, right = hi - ratio * (hi - lo), lo + ratio * (hi - lo)
+    f_left, f_right = loglikelihood(left), loglikelihood(right)
+    for _ in range(iterations):
+        # the log-likelihood is concave in alpha, keep the side of the larger value
+        move_right = f_left < f_right
+        lo = np.where(move_right, left, lo)
+        hi = np.where(move_right, hi, right)
+        left, right = hi - ratio * (hi - lo), lo + ratio * (hi - lo)
+        f_left, f_right = loglikelihood(left), loglikelihood(right)
+    return (lo + hi) / 2
+
+
+def scan_xmin(x: np.ndarray, counts: np.ndarray) -> tuple:
+    """
+    alpha and KS distance of every xmin candidate x[:-1], from the distinct
+    values and their counts. `counts` may hold one row per sample over the same
+    values (bootstrap resamples); candidates a sample does not hold, with a
+    single value in their tail or with alpha <= 1 get an infinite distance.
+    """
+    counts = np.asarray(counts)
+    single = counts.ndim == 1
+    counts = np.atleast_2d(counts)
+    samples, candidates = len(counts), len(x) - 1
+
+    # tail size and sum of log values of each candidate, as suffix sums
+    tail_n = np.cumsum(counts[:, ::-1], axis=1)[:, ::-1].astype(np.float64)
+    tail_log = np.cumsum((counts * np.log(x))[:, ::-1], axis=1)[:, ::-1]
+    n, log_sum = tail_n[:, :candidates], tail_log[:, :candidates]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        alphas = 1 + n / (log_sum - n * np.log(x[:candidates] - 0.5))
+        exact = x[:candidates] < ESTIMATE_FROM
+        if exact.any():
+            alphas[:, exact] = _exact_alphas(x[:candidates][exact], log_sum[:, exact] / n[:, exact])
+    valid = (counts[:, :candidates] > 0) & (n > counts[:, :candidates]) & (alphas > 1)
+
+    # events below each value, i.e. the empirical CDF numerator P(X < x) of the whole sample
+    below = np.cumsum(counts, axis=1) - counts
+    present = counts > 0
+    distances = np.full((samples, candidates), np.inf)
+    start = 0
+    while start < candidates:
+        # a tail only spans the values from its xmin up
+        values = x[start:]
+        stop = min(candidates, start + max(1, SCAN_BLOCK // (samples * len(values))))
+        rows = np.arange(start, stop)
+        alpha = np.where(valid[:, rows], alphas[:, rows], 2.0)[:, :, None]
+        in_tail = (np.arange(start, len(x))[None, :] >= rows[:, None])[None] & present[:, None, start:]
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            # entries outside a sample's tail are masked below
+            empirical = (below[:, None, start:] - below[:, rows, None]) / n[:, rows, None]
+            theoretical = 1 - hurwitz_zeta(alpha, values) / hurwitz_zeta(alpha, x[rows][None, :, None])
+        block_distances = np.where(in_tail, np.abs(theoretical - empirical), 0).max(axis=2)
+        distances[:, rows] = np.where(valid[:, rows], block_distances, np.inf)
+        start = stop
+    return (alphas[0], distances[0]) if single else (alphas, distances)
+
+
+def _power_law_loglikelihoods(x: np.ndarray, alpha: float, xmin: float) -> np.ndarray:
+    return -alpha * np.log(x) - np.log(special.zeta(alpha, xmin))
+
+
+def _lognormal_loglikelihoods(x: np.ndarray, mu: float, sigma: float, xmin: float) -> np.ndarray:
+    """Lognormal mass on [x - 0.5, x + 0.5), renormalized to x >= xmin."""
+    upper = stats.norm.logsf((np.log(x - 0.5) - mu) / sigma)
+    lower = stats.norm.logsf((np.log(x + 0.5) - mu) / sigma)
+    norm = stats.norm.logsf((np.log(xmin - 0.5) - mu) / sigma)
+    # log(sf(x - 0.5) - sf(x + 0.5)) without cancelling in the far tail
+    return upper + np.log1p(-np.exp(np.minimum(lower - upper, 0))) - norm
+
+
+def fit_lognormal(x: np.ndarray, counts: np.ndarray, xmin: float) -> tuple:
+    """Maximum-likelihood (mu, sigma) of the discretized lognormal on the tail."""
+    log_x = np.log(x)
+    mean = np.average(log_x, weights=counts)
+    start = [mean, np.sqrt(np.average((log_x - mean) ** 2, weights=counts)) or 1.0]
+
+    def negative_loglikelihood(params):
+        mu, log_sigma = params
+        values = _lognormal_loglikelihoods(x, mu, np.exp(log_sigma), xmin)
+        total = np.dot(counts, values)
+        return -total if np.isfinite(total) else np.inf
+
+    result = optimize.minimize(negative_loglikelihood, [start[0], np.log(start[1])], method="Nelder-Mead",
+                               options={"xatol": 1e-4, "fatol": 1e-3, "maxiter": 400})
+    return result.x[0], float(np.exp(result.x[1]))
+
+
+def fit_exponential(x: np.ndarray, counts: np.ndarray, xmin: float) -> float:
+    """Maximum-likelihood rate of the discrete exponential (geometric) on the tail."""
+    excess = np.average(x - xmin, weights=counts)
+    return float(np.log1p(1 / excess)) if excess > 0 else np.inf
+
+
+def _exponential_loglikelihoods(x: np.ndarray, rate: float, xmin: float) -> np.ndarray:
+    return np.log(-np.expm1(-rate)) - rate * (x - xmin)
+
+
+def loglikelihood_ratio(first: np.ndarray, second: np.ndarray, counts: np.ndarray) -> tuple:
+    """R = sum of log-likelihood differences and its two-sided p-value (non-nested, as powerlaw)."""
+    n = counts.sum()
+    differences = first - second
+    R = float(np.dot(counts, differences))
+    sigma = np.sqrt(np.dot(counts, (differences - R / n) ** 2) / n)
+    p = float(special.erfc(abs(R) / (np.sqrt(2 * n) * sigma))) if sigma > 0 else 1.0
+    return R, p
+
+
+def fit_power_law(values) -> TailFit:
+    """Discrete power-law fit of the positive `values`, as powerlaw.Fit(values, discrete=True)."""
+    return fit_counts(*distinct_counts(values))
+
+
+def fit_counts(x: np.ndarray, counts: np.ndarray) -> TailFit:
+    """Discrete power-law fit of the sorted distinct positive values `x` with their `counts`."""
+    n = int(counts.sum())
+    if len(x) < 2:
+        raise ValueError("a power-law fit needs at least two distinct positive values")
+
+    alphas, distances = scan_xmin(x, counts)
+    # powerlaw only keeps candidates with alpha > 1
+    if not np.isfinite(distances).any():
+        raise ValueError("no xmin candidate gives a power law with alpha > 1")
+    best = int(np.argmin(distances))
+    xmin, alpha = float(x[best]), float(alphas[best])
+
+    tail_x, tail_counts = x[best:], counts[best:]
+    power_law = _power_law_loglikelihoods(tail_x, alpha, xmin)
+    mu, sigma = fit_lognormal(tail_x, tail_counts, xmin)
+    R_lognormal, p_lognormal = loglikelihood_ratio(
+        power_law, _lognormal_loglikelihoods(tail_x, mu, sigma, xmin), tail_counts)
+    rate = fit_exponential(tail_x, tail_counts, xmin)
+    R_exponential, p_exponential = loglikelihood_ratio(
+        power_law, _exponential_loglikelihoods(tail_x, rate, xmin), tail_counts)
+
+    n_tail = int(tail_counts.sum())
+    return TailFit(
+        n=n,
+        n_tail=n_tail,
+        xmin=xmin,
+        alpha=alpha,
+        D=float(distances[best]),
+        R_lognormal=R_lognormal,
+        p_lognormal=p_lognormal,
+        R_exponential=R_exponential,
+        p_exponential=p_exponential,
+        ccdf_x=tail_x,
+        ccdf_y=np.cumsum(tail_counts[::-1])[::-1] / n_tail,
+    )
+
+
+# ---------------- Uncertainty and goodness of fit ----------------
+
+def bootstrap_fits(x: np.ndarray, counts: np.ndarray, n_bootstrap: int = N_BOOTSTRAP,
+                   rng: np.random.Generator = None) -> tuple:
+    """alpha and xmin refitted on `n_bootstrap` resamples of the events, drawn as count vectors."""
+    rng = rng or np.random.default_rng()
+    n = int(counts.sum())
+    alphas, xmins = np.empty(n_bootstrap), np.empty(n_bootstrap)
+    per_block = max(1, SCAN_BLOCK // (len(x) * len(x)))
+    for start in range(0, n_bootstrap, per_block):
+        stop = min(start + per_block, n_bootstrap)
+        resamples = rng.multinomial(n, counts / n, size=stop - start)
+        block_alphas, distances = scan_xmin(x, resamples)
+        best = np.argmin(distances, axis=1)
+        alphas[start:stop] = block_alphas[np.arange(stop - start), best]
+        xmins[start:stop] = x[best]
+    return alphas, xmins
+
+
+def goodness_of_fit(fit: TailFit, n_bootstrap: int = N_BOOTSTRAP, rng: np.random.Generator = None) -> float:
+    """
+    Share of synthetic power-law tails (same size, xmin and alpha) fitting
+    their own power law worse than the data fits its one, i.e. the p-value of
+    the KS distance. Unlike Clauset et al. (2009), xmin is held at the fitted
+    value, so the synthetic samples only need a tail.
+    """
+    rng = rng or np.random.default_rng()
+    n, xmin = fit.n_tail, fit.xmin
+    worse = 0
+    per_block = max(1, SYNTHETIC_BLOCK // n)
+    for start in range(0, n_bootstrap, per_block):
+        size = min(per_block, n_bootstrap - start)
+        # discrete power-law draws (Clauset et al. 2009, eq. D.6)
+        draws = np.floor((xmin - 0.5) * (1 - rng.random((size, n))) ** (-1 / (fit.alpha - 1)) + 0.5)
+        draws.sort(axis=1)
+        mean_log = np.log(draws).mean(axis=1)
+        if xmin < ESTIMATE_FROM:
+            alphas = _exact_alphas(np.full(size, xmin), mean_log)
+        else:
+            alphas = 1 + 1 / (mean_log - np.log(xmin - 0.5))
+
+        # empirical P(X < x) at each draw: position of the first equal draw
+        positions = np.arange(n)
+        first = np.maximum.accumulate(
+            np.where(np.diff(draws, axis=1, prepend=-np.inf) > 0, positions, 0), axis=1)
+        theoretical = 1 - hurwitz_zeta(alphas[:, None], draws) / hurwitz_zeta(alphas, xmin)[:, None]
+        distances = np.abs(theoretical - first / n).max(axis=1)
+        worse += int((distances >= fit.D).sum())
+    return worse / n_bootstrap
+
+
+# ---------------- Tail table ----------------
+
+def _fit_group(task: tuple) -> dict:
+    """Row of the tail table for one group, or None if it can't be fitted."""
+    group_by, group, x, counts, n_bootstrap, seed = task
+    try:
+        fit = fit_counts(x, counts)
+    except ValueError:
+        return None
+    rng = np.random.default_rng(seed)
+    alphas, xmins = bootstrap_fits(x, counts, n_bootstrap, rng)
+    tail = (1 - CONFIDENCE) / 2 * 100
+    return {
+        "group_by": group_by,
+        "group": group,
+        "events": fit.n,
+        "tail_events": fit.n_tail,
+        "xmin": fit.xmin,
+        "alpha": fit.alpha,
+        "D": fit.D,
+        "gof_p": goodness_of_fit(fit, n_bootstrap, rng),
+        "alpha_lower": np.percentile(alphas, tail),
+        "alpha_upper": np.percentile(alphas, 100 - tail),
+        "xmin_lower": np.percentile(xmins, tail),
+        "xmin_upper": np.percentile(xmins, 100 - tail),
+        "R_lognormal": fit.R_lognormal,
+        "p_lognormal": fit.p_lognormal,
+        "R_exponential": fit.R_exponential,
+        "p_exponential": fit.p_exponential,
+    }
+
+
+def group_tasks(df: pd.DataFrame, top: int = None, n_bootstrap: int = N_BOOTSTRAP, seed: int = 42) -> list:
+    """
+    One fit task per group: all events, the `top` largest clusters (all clusters
+    if None) and every region. Tasks carry the distinct values and counts only.
+    """
+    clusters = df["cluster"].value_counts().index
+    clusters = clusters if top is None else clusters[:top]
+    groups = [("all", "all", np.ones(len(df), dtype=bool))]
+    groups += [("cluster", str(cluster), (df["cluster"] == cluster).to_numpy()) for cluster in clusters]
+    groups += [("region", str(region), (df["region"] == region).to_numpy())
+               for region in sorted(df["region"].dropna().unique())]
+
+    fatalities = df["fatalities"].to_numpy()
+    return [(group_by, group, *distinct_counts(fatalities[mask]), n_bootstrap, seed + i)
+            for i, (group_by, group, mask) in enumerate(groups)]
+
+
+def build_tail_table(df: pd.DataFrame, out_path: Path = TAIL_FITS, top: int = None,
+                     n_bootstrap: int = N_BOOTSTRAP, n_jobs: int = None, seed: int = 42) -> Path:
+    """Fit every group of `df` (see group_tasks) on a process pool and save the table."""
+    n_jobs = os.cpu_count() if n_jobs == -1 else n_jobs or 1
+    tasks = group_tasks(df, top, n_bootstrap, seed)
+    # groups with the most distinct values (the costliest scans) first
+    order = sorted(range(len(tasks)), key=lambda i: -len(tasks[i][2]))
+    if n_jobs == 1:
+        fitted = list(map(_fit_group, [tasks[i] for i in order]))
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            fitted = list(pool.map(_fit_group, [tasks[i] for i in order]))
+
+    rows = [None] * len(tasks)
+    for i, row in zip(order, fitted):
+        rows[i] = row
+    table = pd.DataFrame([row for row in rows if row is not None])
+
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = out_path.with_name(out_path.name + ".tmp")
+    table.to_parquet(tmp_path, index=False)
+    tmp_path.replace(out_path)
+    return out_path
+
+
+def read_tail_table(path: Path = TAIL_FITS) -> pd.DataFrame:
+    """The saved tail table, indexed by (group_by, group)."""
+    return pd.read_parquet(path).set_index(["group_by", "group"])
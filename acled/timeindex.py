@@ -0,0 +1,163 @@
+"""
+Day-level time index for date-range KPIs and time-series charts.
+
+The cube groups events by whole years, so it cannot answer an arbitrary date
+window or a weekly trend. Here events are counted per series, a combination
+of the filter dimensions other than time (cluster, region, event_type,
+fatality_severity), and per day. The (series, day) entries are sorted by
+series then day and stored with running sums of events and fatalities:
+
+- the totals of every series over a date window are two binary searches and
+  an array difference, so slice() returns cube-like cells for any window
+  and the cube's KPIs and groupings work on them unchanged;
+- a time series sums the daily counts of the selected series once, takes
+  their prefix sums, and reads every bucket (day, week, month, year) and
+  rolling window as a difference of that prefix, without touching the rows.
+
+The entry of every row is kept too: restrict() sums the counts of the
+entries again over a subset of the rows (the events of the selected actors,
+which have no dimension here), a bincount and two cumulative sums over the
+existing entries instead of a new index.
+"""
+
+import copy
+
+import numpy as np
+import pandas as pd
+
+from acled.cube import Cube, cell_mask
+from acled.filters import date_bounds
+
+SERIES_DIMENSIONS = ["cluster", "region", "event_type", "fatality_severity"]
+
+# time-series granularities: numpy unit of the buckets (weeks start on Mondays)
+GRANULARITIES = {"Day": "D", "Week": "W", "Month": "M", "Year": "Y"}
+
+
+class TimeIndex(Cube):
+    """Running event and fatality counts per series and day, answering the cube's slices for any date window."""
+
+    def __init__(self, df: pd.DataFrame):
+        days = df["event_date"].to_numpy().astype("datetime64[D]")
+        self.first_day, self.last_day = days.min(), days.max()
+        self.n_days = int((self.last_day - self.first_day).astype(np.int64)) + 1
+
+        grouped = df[SERIES_DIMENSIONS].groupby(SERIES_DIMENSIONS, observed=True, sort=True)
+        self.series = grouped.size().reset_index()[SERIES_DIMENSIONS]
+        series = grouped.ngroup().to_numpy()
+
+        # one entry per (series, day) holding events, sorted by series then day
+        keys = series.astype(np.int64) * self.n_days + (days - self.first_day).astype(np.int64)
+        self._keys, inverse = np.unique(keys, return_inverse=True)
+        events = np.bincount(inverse, minlength=len(self._keys))
+        fatalities = np.bincount(inverse, weights=df["fatalities"].to_numpy(), minlength=len(self._keys))
+        # running sums over the entries, with a leading zero
+        self._events = np.concatenate([[0], np.cumsum(events)]).astype(np.int64)
+        self._fatalities = np.concatenate([[0], np.cumsum(fatalities)]).astype(np.int64)
+        # day and event count of every entry, and where the entries of every series start
+        self._days = (self._keys % self.n_days).astype(np.int32)
+        self._counts = events.astype(np.int32)
+        self._offsets = np.searchsorted(self._keys, np.arange(len(self.series) + 1) * self.n_days)
+        # entry of every row, for restrict()
+        self._row_entries = inverse.reshape(-1).astype(np.int32)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = sum(a.nbytes for a in [self._keys, self._events, self._fatalities, self._days, self._counts,
+                                         self._offsets, self._row_entries])
+        return arrays + int(self.series.memory_usage(deep=True).sum())
+
+    def restrict(self, rows: np.ndarray, fatalities: np.ndarray) -> "TimeIndex":
+        """
+        The index of the events at `rows` (positions in the indexed frame) only,
+        `fatalities` being theirs: the same series and days, with counts summed
+        over these rows. Its slices and series are those of an index built from
+        the rows, with the whole index's first and last day.
+        """
+        entries = self._row_entries[rows]
+        events = np.bincount(entries, minlength=len(self._keys))
+        fatalities = np.bincount(entries, weights=fatalities, minlength=len(self._keys))
+        restricted = copy.copy(self)
+        restricted._events = np.concatenate([[0], np.cumsum(events)]).astype(np.int64)
+        restricted._fatalities = np.concatenate([[0], np.cumsum(fatalities)]).astype(np.int64)
+        restricted._counts = events.astype(np.int32)
+        return restricted
+
+    def _day_range(self, filters: dict) -> tuple:
+        """First and last selected day, as offsets from the first indexed day, clipped to the index."""
+        bounds = date_bounds(filters)
+        first, last = (self.first_day, self.last_day) if bounds is None else bounds
+        first = max(int((first - self.first_day).astype(np.int64)), 0)
+        last = min(int((last - self.first_day).astype(np.int64)), self.n_days - 1)
+        return first, last
+
+    def slice(self, filters: dict) -> pd.DataFrame:
+        """Series with events in the date window of `filters`, with their event counts and fatality sums."""
+        first, last = self._day_range(filters)
+        series = np.flatnonzero(cell_mask(self.series, filters))
+        lo = np.searchsorted(self._keys, series * self.n_days + first, side="left")
+        hi = np.searchsorted(self._keys, series * self.n_days + last, side="right")
+        cells = self.series.iloc[series].assign(
+            events=self._events[hi] - self._events[lo],
+            fatalities=self._fatalities[hi] - self._fatalities[lo],
+        )
+        return cells[cells["events"].to_numpy() > 0]
+
+    def date_span(self, filters: dict) -> tuple | None:
+        """First and last day with an event matching `filters` in its date window, None without one."""
+        first, last = self._day_range(filters)
+        _, daily = self._daily(filters)
+        days = first + np.flatnonzero(daily[0, first:last + 1])
+        if not len(days):
+            return None
+        return pd.Timestamp(self.first_day + days[0]), pd.Timestamp(self.first_day + days[-1])
+
+    def _daily(self, filters: dict, by: str | None = None) -> tuple:
+        """Daily event counts of the series matching `filters`, one row per value of `by` (one row without)."""
+        # the entries of the selected series with events (all of them unless restricted), gathered range by range
+        series = np.flatnonzero(cell_mask(self.series, filters) & (np.diff(self._events[self._offsets]) > 0))
+        starts, lengths = self._offsets[series], np.diff(self._offsets)[series]
+        entries = np.arange(lengths.sum()) + np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        days, events = self._days[entries], self._counts[entries]
+
+        if by is None:
+            return None, np.bincount(days, weights=events, minlength=self.n_days)[None, :]
+        groups, codes = np.unique(self.series[by].to_numpy()[np.repeat(series, lengths)], return_inverse=True)
+        daily = np.bincount(codes * self.n_days + days, weights=events, minlength=len(groups) * self.n_days)
+        return groups, daily.reshape(len(groups), self.n_days)
+
+    def timeline(self, filters: dict, granularity: str = "Month", window: int = 1, by: str | None = None):
+        """
+        Events per bucket of `granularity` over the date window of `filters`,
+        as a trailing mean over `window` buckets (fewer at the start). Buckets
+        are labelled by their first day; the first and last may be partial.
+        A Series indexed by date, or a long frame with a `by` column.
+        """
+        first, last = self._day_range(filters)
+        # a bucket starts on the window's first day and on every period start after it
+        days = self.first_day + np.arange(first, last + 1)
+        if granularity == "Week":
+            # numpy's weeks start on Thursdays (1970-01-01), count from Mondays instead
+            starts = (days.astype(np.int64) + 3) % 7 == 0
+        else:
+            starts = days.astype(f"datetime64[{GRANULARITIES[granularity]}]").astype("datetime64[D]") == days
+        starts[0] = True
+        edges = np.concatenate([first + np.flatnonzero(starts), [last + 1]])
+
+        groups, daily = self._daily(filters, by)
+        prefix = np.concatenate([np.zeros((len(daily), 1)), np.cumsum(daily, axis=1)], axis=1)[:, edges]
+        # trailing window of `window` buckets ending at every bucket
+        ends = np.arange(1, len(edges))
+        window_starts = np.maximum(ends - window, 0)
+        buckets = (prefix[:, ends] - prefix[:, window_starts]) / (ends - window_starts)
+        if window == 1:
+            buckets = np.rint(buckets).astype(np.int64)
+
+        dates = pd.DatetimeIndex(self.first_day + edges[:-1], name="date")
+        if groups is None:
+            return pd.Series(buckets[0], index=dates, name="events")
+        return pd.DataFrame({
+            by: np.repeat(groups, len(dates)),
+            "date": np.tile(dates, len(groups)),
+            "events": buckets.ravel(),
+        })
@@ -0,0 +1,69 @@
+"""
+Read-only row selections over the shared dashboard frame.
+
+Every session shares one immutable base frame. A session only keeps a
+FrameView, i.e. an int32 array of row positions plus a reference to the base.
+Columns are gathered on access, so pages never hold a full filtered copy, and
+derived columns are attached to the view without touching the base.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class FrameView:
+    """Row positions over a shared base frame, indexed like a DataFrame."""
+
+    def __init__(self, base: pd.DataFrame, rows: np.ndarray, derived: dict | None = None):
+        self._base = base
+        self.rows = np.asarray(rows, dtype=np.int32)
+        self._derived = derived or {}
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @property
+    def columns(self) -> pd.Index:
+        return self._base.columns.append(pd.Index(list(self._derived)))
+
+    @property
+    def shape(self) -> tuple:
+        return len(self.rows), len(self.columns)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by this view on top of the shared base."""
+        return self.rows.nbytes + sum(col.nbytes for col in self._derived.values())
+
+    def __contains__(self, column) -> bool:
+        return column in self._derived or column in self._base.columns
+
+    def __getitem__(self, key):
+        # a boolean mask selects rows, like df[mask]
+        if isinstance(key, (pd.Series, np.ndarray)) and key.dtype == bool:
+            return self._select(np.asarray(key))
+        # a list of columns gathers a frame, like df[["a", "b"]]
+        if isinstance(key, list):
+            base = [column for column in key if column not in self._derived]
+            frame = self._base[base].take(self.rows)
+            derived = {column: self._derived[column] for column in key if column in self._derived}
+            return frame.assign(**derived)[key]
+        if key in self._derived:
+            return self._derived[key]
+        return self._base[key].take(self.rows)
+
+    def _select(self, mask: np.ndarray) -> "FrameView":
+        derived = {name: col[mask] for name, col in self._derived.items()}
+        return FrameView(self._base, self.rows[mask], derived)
+
+    def assign(self, **columns) -> "FrameView":
+        """New view with extra derived columns (values or callables of this view)."""
+        derived = dict(self._derived)
+        for name, value in columns.items():
+            value = value(self) if callable(value) else value
+            derived[name] = pd.Series(np.asarray(value), index=self._base.index.take(self.rows), name=name)
+        return FrameView(self._base, self.rows, derived)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Materialise the selection; only for consumers that need a real DataFrame."""
+        return self._base.take(self.rows).assign(**self._derived)
@@ -0,0 +1,225 @@
+"""
+Background warm-up of the dashboard data at server start.
+
+`python -m acled serve` starts the warm-up thread before Streamlit, so the
+work the first visitor of the default view would wait for is done while no
+one is connected yet, in the order the dashboard needs it: the frame of the
+default partition (with its derived columns), the filter options, the filter
+index, the time index, the default filter result, the spatial grid, the tail
+table, the cluster profiles and the default tail fit, then the chart
+libraries the pages import.
+
+Every step is built once, by whoever gets to it first. The dashboard's
+loaders go through shared(name, key, compute):
+
+- if the warm-up has built or is building step `name` for the same key, the
+  caller waits for it and takes its result;
+- if the warm-up has not reached the step yet, the caller builds it and the
+  warm-up, once there, takes the caller's result instead of building it
+  again, so an early request is never queued behind steps it does not need;
+- for another key (a partition or selection the warm-up does not build),
+  after a failed step, or without a warm-up in the process, the caller
+  computes as before.
+
+A step's result is handed over once and then only kept by the dashboard's
+caches. status() reports the progress.
+"""
+
+import importlib
+import logging
+import os
+import threading
+import time
+
+from acled import store
+from acled.cache import FilterResult, filter_signature
+from acled.filters import FilterIndex, default_filters, filter_options
+from acled.grid import GridPyramid
+from acled.profiles import PROFILES, ClusterProfiles, read_profiles
+from acled.tailfit import TAIL_FITS, fit_power_law, read_tail_table
+from acled.timeindex import TimeIndex
+
+logger = logging.getLogger(__name__)
+
+# steps in the order they run
+STEPS = ["data", "filter_options", "filter_index", "time_index", "filter_result", "grid", "tail_table",
+         "saved_profiles", "profiles", "tail_fit", "chart_libraries"]
+
+# scheduling priority of the warm-up thread, below the server's
+WARMUP_NICENESS = 19
+
+
+class _Step:
+    def __init__(self, name: str):
+        self.name = name
+        self.key = None
+        self.value = None
+        self.error = None
+        self.claimed = False  # someone builds it: the warm-up or a request
+        self.done = threading.Event()  # value or error is set
+
+
+_lock = threading.Lock()
+_steps = {}  # name -> _Step, until its result is handed over
+_status = {"state": "off", "steps": {}}
+
+
+def _claim(step: _Step, key) -> bool:
+    """Claim `step` for `key` if no one builds it yet; True for the new owner."""
+    with _lock:
+        if step.claimed:
+            return False
+        step.claimed, step.key = True, key
+        return True
+
+
+def _build(step: _Step, compute) -> float:
+    """Run `compute` for the claimed `step`, recording its result or error; the seconds it took."""
+    start = time.perf_counter()
+    try:
+        step.value = compute()
+    except Exception as error:
+        step.error = error
+    finally:
+        step.done.set()
+    return time.perf_counter() - start
+
+
+def _forget(step: _Step) -> None:
+    with _lock:
+        if _steps.get(step.name) is step:
+            del _steps[step.name]
+
+
+def shared(name: str, key, compute):
+    """Result of step `name` for `key`: the warm-up's if it builds the same, else compute()."""
+    with _lock:
+        step = _steps.get(name)
+    if step is None:
+        return compute()
+    if _claim(step, key):
+        # ahead of the warm-up: build it here, the warm-up takes it when it gets there
+        _build(step, compute)
+        _forget(step)
+        with _lock:
+            _status["steps"].setdefault(name, "built by a request")
+        if step.error is not None:
+            raise step.error
+        return step.value
+    if step.key != key:
+        return compute()
+    step.done.wait()
+    _forget(step)
+    if step.error is not None:
+        return compute()
+    return step.value
+
+
+def status() -> dict:
+    """State of the warm-up (off, running, ready or failed) and the seconds each step took."""
+    with _lock:
+        return {"state": _status["state"], "steps": dict(_status["steps"])}
+
+
+def ready() -> bool:
+    return status()["state"] in ("off", "ready", "failed")
+
+
+def start() -> threading.Thread | None:
+    """Start the warm-up thread, once per process."""
+    with _lock:
+        if _status["state"] != "off":
+            return None
+        steps = {name: _Step(name) for name in STEPS}
+        _steps.update(steps)
+        _status["state"] = "running"
+    thread = threading.Thread(target=_run, args=(steps,), name="acled-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def _import_chart_libraries() -> None:
+    # imported by the pages on their first run otherwise; the import lock makes
+    # a page importing them meanwhile wait for this import
+    for module in ["altair", "matplotlib.pyplot", "pydeck"]:
+        importlib.import_module(module)
+
+
+def _mtime(path):
+    try:
+        return path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def _run(steps: dict) -> None:
+    def run(name, key, compute):
+        step = steps[name]
+        if not _claim(step, key):
+            # a request got there first
+            step.done.wait()
+            if step.key != key or step.error is not None:
+                # built for another selection: the later steps need the default one
+                return compute()
+            return step.value
+        seconds = _build(step, compute)
+        with _lock:
+            _status["steps"][name] = "failed" if step.error is not None else round(seconds, 3)
+        if step.error is not None:
+            # the later steps built on this one fail in turn
+            logger.warning("warm-up step %s failed: %r", name, step.error)
+        else:
+            logger.info("warm-up step %s took %.2f s", name, seconds)
+        return step.value
+
+    # yield the CPU to the requests served meanwhile (Linux nices single threads)
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), WARMUP_NICENESS)
+    except (AttributeError, OSError):
+        pass
+
+    started = time.perf_counter()
+    state = "failed"
+    try:
+        # the dashboard's default view: every option selected, whole date range
+        version = store.summary_version()
+        summary = None if version is None else store.read_summary()
+        if summary is not None:
+            partition = store.partition_key(version, default_filters(filter_options(summary)))
+            frame = run("data", partition, lambda: store.read_partitions(*partition[1:]))
+        else:
+            partition = None
+            frame = run("data", partition, store.load_frame)
+        options = run("filter_options", version, lambda: filter_options(summary, None if summary else frame))
+        filters = default_filters(options)
+
+        index = run("filter_index", partition, lambda: FilterIndex(frame))
+        cube = run("time_index", partition, lambda: TimeIndex(frame))
+        result = run("filter_result", filter_signature(filters),
+                     lambda: FilterResult(rows=index.select(filters), cells=cube.slice(filters)))
+        if "latitude" in frame.columns:
+            run("grid", partition, lambda: GridPyramid(frame))
+
+        tail_version = _mtime(TAIL_FITS)
+        if tail_version is not None:
+            run("tail_table", tail_version, read_tail_table)
+        profiles_version = _mtime(PROFILES)
+        if profiles_version is not None:
+            run("saved_profiles", profiles_version, read_profiles)
+        else:
+            run("profiles", partition, lambda: ClusterProfiles.from_frame(frame))
+        run("tail_fit", filter_signature(filters), lambda: fit_power_law(frame["fatalities"].to_numpy()[result.rows]))
+        run("chart_libraries", None, _import_chart_libraries)
+        _forget(steps["chart_libraries"])  # no loader asks for it
+        state = "ready"
+    except Exception as error:
+        logger.warning("warm-up stopped: %r", error)
+    finally:
+        # steps the warm-up did not get to are built by their callers from now on,
+        # and failed ones are forgotten
+        with _lock:
+            for step in steps.values():
+                if (not step.claimed or step.error is not None) and _steps.get(step.name) is step:
+                    del _steps[step.name]
+            _status["state"] = state
+        logger.info("warm-up %s after %.2f s", state, time.perf_counter() - started)
@@ -0,0 +1,3 @@
+"""
+Benchmark scripts for the dashboard data layer. Run from the repository root.
+"""
@@ -0,0 +1,152 @@
+"""
+Memory and latency of the actor filter: inverted index vs scanning the actor columns.
+
+For the most prolific actor, a mid-ranked one, the rarest one and the top
+two together, alone and combined with other filter states, the rows are
+selected both ways: comparing actor1 and actor2 to the names on top of the
+chained .isin() filters, and FilterIndex.select() with the inverted actor
+index. Both must select the same rows. The memory of the dictionary-encoded
+actor columns and of the index is reported next to the alternatives: object
+columns of names, plain int32 row lists and one bitmap per actor.
+
+The time index, grid pyramid and cluster profiles have no actor dimension:
+for every selection they are restricted to its events (restrict(),
+RowProfiles), which must answer like the same aggregates built from those
+events, and both ways are timed: restricting, then a world map and the
+profile of the actor's largest cluster, vs building from the rows.
+
+Usage:
+    python -m benchmarks.actors [--rows 1000000 5000000] [--repeat 20]
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from acled.actors import ACTOR_COLUMNS, ActorIndex
+from acled.derive import enrich
+from acled.filters import FilterIndex
+from acled.grid import WORLD, GridPyramid
+from acled.profiles import ClusterProfiles, RowProfiles
+from acled.timeindex import TimeIndex
+from benchmarks.filters import _best_time, chained_isin
+from benchmarks.synthetic import make_events
+
+
+def scan(df: pd.DataFrame, filters: dict) -> np.ndarray:
+    """Rows naming the actors on either side, among the rows of the other filters."""
+    df_out = chained_isin(df, filters) if "date_range" in filters else df
+    actors = filters["actors"]
+    involved = df_out["actor1"].isin(actors) | df_out["actor2"].isin(actors)
+    return df.index.get_indexer(df_out.index[involved.to_numpy()])
+
+
+def restricted(df: pd.DataFrame, aggregates: tuple, rows: np.ndarray, cluster) -> tuple:
+    """The selection's time index, world map and profile of `cluster`, from the aggregates of the whole frame."""
+    time_index, grid = aggregates
+    fatalities = df["fatalities"].to_numpy()[rows]
+    time_index = time_index.restrict(rows, fatalities)
+    heatmap, _ = grid.restrict(rows, fatalities).heatmap({}, WORLD)
+    return time_index, heatmap, RowProfiles(df, rows).profile(cluster)
+
+
+def rebuilt(df: pd.DataFrame, rows: np.ndarray, cluster) -> tuple:
+    """The same, built from the selected rows."""
+    selected = df.take(rows)
+    heatmap, _ = GridPyramid(selected).heatmap({}, WORLD)
+    return TimeIndex(selected), heatmap, ClusterProfiles.from_frame(selected).profile(cluster)
+
+
+def _sorted(bins: pd.DataFrame) -> pd.DataFrame:
+    return bins.sort_values(["latitude", "longitude"]).reset_index(drop=True)
+
+
+def _mb(n_bytes: int) -> str:
+    return f"{n_bytes / 2**20:.1f} MB"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000, 5_000_000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    for n_rows in args.rows:
+        df = enrich(make_events(n_rows))
+        start = time.perf_counter()
+        actors = ActorIndex(df)
+        build = time.perf_counter() - start
+        index = FilterIndex(df)
+        aggregates = TimeIndex(df), GridPyramid(df)
+
+        encoded = sum(int(df[col].memory_usage(deep=True, index=False)) for col in ACTOR_COLUMNS)
+        names = sum(int(df[col].astype(object).memory_usage(deep=True, index=False)) for col in ACTOR_COLUMNS)
+        postings = int(actors.counts.sum())
+        print(f"{n_rows:,} rows, {len(actors.names):,} actors, {postings:,} (actor, event) pairs; "
+              f"index built in {build:.2f} s")
+        print(f"  actor columns: {_mb(encoded)} dictionary-encoded, {_mb(names)} as object names")
+        print(f"  actor index: {_mb(actors.nbytes)} ({len(actors._bitmaps)} bitmap blocks), "
+              f"{_mb(postings * 4)} as int32 row lists, "
+              f"{_mb(len(actors.names) * ((n_rows + 7) // 8))} as one bitmap per actor")
+
+        search = _best_time(lambda: actors.search("militia group 1"), args.repeat)
+        print(f"  prefix search: {search * 1e3:.3f} ms")
+
+        ranked = actors.names[np.argsort(-actors.counts, kind="stable")].tolist()
+        selections = {
+            "top actor": ranked[:1],
+            "top two": ranked[:2],
+            "mid actor": [ranked[len(ranked) // 2]],
+            "rarest actor": ranked[-1:],
+        }
+        everything = {
+            "event_type": sorted(df["event_type"].unique()),
+            "regions": sorted(df["region"].unique()),
+            "clusters": [],
+            "fatality_severity": [],
+            "date_range": (df["event_date"].min().date(), df["event_date"].max().date()),
+        }
+        others = {
+            "alone": {},
+            "one region": {**everything, "regions": ["Africa"]},
+            "narrow": {**everything, "regions": ["Africa"], "event_type": ["Battles"],
+                       "date_range": (pd.Timestamp("2021-01-01").date(), pd.Timestamp("2022-12-31").date())},
+        }
+
+        print(f"  {'selection':>12} {'filters':>10} {'events':>8} {'scan (ms)':>10} {'index (ms)':>11}")
+        for name, selected in selections.items():
+            for other, filters in others.items():
+                filters = {**filters, "actors": selected}
+                expected = scan(df, filters)
+                rows = index.select(filters)
+                assert np.array_equal(np.sort(expected), rows), (name, other)
+
+                scan_ms = _best_time(lambda: scan(df, filters), max(args.repeat // 4, 1)) * 1e3
+                index_ms = _best_time(lambda: index.select(filters), args.repeat) * 1e3
+                print(f"  {name:>12} {other:>10} {len(rows):>8,} {scan_ms:>10.2f} {index_ms:>11.2f}")
+
+        print(f"  {'selection':>12} {'events':>8} {'restrict (ms)':>14} {'rebuild (ms)':>13}")
+        for name, selected in selections.items():
+            rows = actors.rows(selected)
+            cluster = pd.Series(df["cluster"].to_numpy()[rows]).mode()[0]
+            (time_index, heatmap, profile) = restricted(df, aggregates, rows, cluster)
+            (expected_index, expected_heatmap, expected_profile) = rebuilt(df, rows, cluster)
+            # the rebuilt index starts on the selection's first day: compare over its days
+            window = {"date_range": (pd.Timestamp(expected_index.first_day).date(),
+                                     pd.Timestamp(expected_index.last_day).date())}
+            pd.testing.assert_frame_equal(time_index.slice(window).reset_index(drop=True),
+                                          expected_index.slice(window).reset_index(drop=True), check_dtype=False)
+            pd.testing.assert_frame_equal(time_index.timeline(window, "Week", by="cluster"),
+                                          expected_index.timeline(window, "Week", by="cluster"), check_dtype=False)
+            pd.testing.assert_frame_equal(_sorted(heatmap), _sorted(expected_heatmap))
+            assert profile == expected_profile, name
+
+            restrict_ms = _best_time(lambda: restricted(df, aggregates, rows, cluster), args.repeat) * 1e3
+            rebuild_ms = _best_time(lambda: rebuilt(df, rows, cluster), max(args.repeat // 4, 1)) * 1e3
+            print(f"  {name:>12} {len(rows):>8,} {restrict_ms:>14.2f} {rebuild_ms:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
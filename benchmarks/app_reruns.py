@@ -0,0 +1,172 @@
+"""
+Cold start, rerun latency and peak memory of every dashboard page on synthetic data.
+
+For each size a synthetic deployment CSV (benchmarks/synthetic.py, with the
+deployment schema and heavy-tailed fatalities) is written with its Arrow
+snapshot, and the dashboard is pointed at it through ACLED_DEPLOY_CSV. Every
+page is then opened in a fresh interpreter through Streamlit's AppTest (as in
+benchmarks/first_paint.py) and driven by a fixed script of sidebar and page
+widget changes. Each run is timed, and the peak RSS of the interpreter is
+read after the cold start and at the end.
+
+Results are written as JSON, tagged with the commit, so two runs can be
+compared with --compare.
+
+Usage:
+    python -m benchmarks.app_reruns [--rows 100000 1000000 5000000] [--out app_reruns.json] [--compare OLD.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from acled import store
+from benchmarks.first_paint import PAGES
+from benchmarks.synthetic import write_deploy_csv
+
+_RUNNER = """
+import datetime, json, resource, runpy, sys, time
+from streamlit.runtime.scriptrunner import script_runner
+from streamlit.testing.v1 import AppTest
+script_runner._mpa_v1 = lambda path: runpy.run_path(str(path), run_name="__main__")
+
+def peak_rss_mb():
+    # ru_maxrss keeps the parent's peak across exec on Linux, VmHWM does not
+    try:
+        with open("/proc/self/status") as status:
+            return next(int(line.split()[1]) for line in status if line.startswith("VmHWM")) / 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def widget(kind, key=None, label=None):
+    for element in getattr(at, kind):
+        if (key is not None and element.key == key) or (label is not None and element.label == label):
+            return element
+    return None
+
+def shift(days, share):
+    first, last = days
+    return first + datetime.timedelta(days=int((last - first).days * share))
+
+at = AppTest.from_file(sys.argv[1], default_timeout=600)
+start = time.perf_counter()
+at.switch_page(sys.argv[2]).run()
+result = {"cold_start_s": time.perf_counter() - start, "cold_rss_mb": peak_rss_mb(), "reruns": {}}
+assert not at.exception, at.exception
+
+dates = widget("slider", key="filter_dates")
+regions = widget("multiselect", key="filter_regions")
+event_types = widget("multiselect", key="filter_event_type")
+severity = widget("multiselect", key="filter_severity")
+steps = [("rerun", lambda: None)]
+if dates is not None:
+    default_dates, default_regions = dates.value, regions.value
+    default_types, default_severity = event_types.value, severity.value
+    steps += [
+        ("one region", lambda: widget("multiselect", key="filter_regions").set_value(default_regions[:1])),
+        ("date window", lambda: widget("slider", key="filter_dates").set_value(
+            (shift(default_dates, 1 / 3), shift(default_dates, 2 / 3)))),
+        ("one event type", lambda: widget("multiselect", key="filter_event_type").set_value(default_types[:1])),
+        ("high severity", lambda: widget("multiselect", key="filter_severity").set_value(default_severity[2:])),
+        ("reset filters", lambda: [
+            widget("multiselect", key="filter_regions").set_value(default_regions),
+            widget("slider", key="filter_dates").set_value(default_dates),
+            widget("multiselect", key="filter_event_type").set_value(default_types),
+            widget("multiselect", key="filter_severity").set_value(default_severity),
+        ]),
+    ]
+if widget("selectbox", key="overview_granularity") is not None:
+    steps += [
+        ("weekly", lambda: widget("selectbox", key="overview_granularity").set_value("Week")),
+        ("rolling 4", lambda: widget("number_input", key="overview_window").set_value(4)),
+    ]
+if widget("selectbox", key="cluster_granularity") is not None:
+    steps += [
+        ("monthly", lambda: widget("selectbox", key="cluster_granularity").set_value("Month")),
+        ("other cluster", lambda: widget("selectbox", label="Choose a Cluster").set_value(
+            widget("selectbox", label="Choose a Cluster").options[-1])),
+    ]
+
+for name, action in steps:
+    action()
+    start = time.perf_counter()
+    at.run()
+    result["reruns"][name] = time.perf_counter() - start
+    assert not at.exception, (name, at.exception)
+result["peak_rss_mb"] = peak_rss_mb()
+print(json.dumps(result))
+"""
+
+
+def measure(page: str, csv_path: Path, store_path: Path) -> dict:
+    """Cold start, rerun latencies and peak RSS of `page` in a fresh interpreter."""
+    env = {**os.environ, "ACLED_DEPLOY_CSV": str(csv_path), "ACLED_STORE": str(store_path)}
+    out = subprocess.run(
+        [sys.executable, "-c", _RUNNER, str(store.ROOT / "dashboard_app.py"), page],
+        check=True, capture_output=True, text=True, cwd=store.ROOT, env=env,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def commit() -> str:
+    out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=store.ROOT)
+    return out.stdout.strip() or "unknown"
+
+
+def print_results(results: dict, baseline: dict | None = None) -> None:
+    """One line per page and size; with a baseline, the relative change of each figure."""
+    def cell(value, old, fmt):
+        text = format(value, fmt)
+        return f"{text} ({(value - old) / old:+.0%})" if old else text
+
+    print(f"{'rows':>10} {'page':>30} {'cold (s)':>16} {'median rerun (ms)':>20} {'peak RSS (MB)':>18}")
+    for rows, pages in results["runs"].items():
+        for page, run in pages.items():
+            old = (baseline or {}).get("runs", {}).get(rows, {}).get(page)
+            reruns = sorted(run["reruns"].values())
+            median = reruns[len(reruns) // 2] * 1e3
+            old_median = None
+            if old is not None:
+                old_reruns = sorted(old["reruns"].values())
+                old_median = old_reruns[len(old_reruns) // 2] * 1e3
+            print(f"{int(rows):>10,} {page:>30} "
+                  f"{cell(run['cold_start_s'], old and old['cold_start_s'], '.2f'):>16} "
+                  f"{cell(median, old_median, '.0f'):>20} "
+                  f"{cell(run['peak_rss_mb'], old and old['peak_rss_mb'], '.0f'):>18}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000, 5_000_000])
+    parser.add_argument("--pages", nargs="+", default=PAGES)
+    parser.add_argument("--out", type=Path, default=Path("app_reruns.json"))
+    parser.add_argument("--compare", type=Path, default=None, help="earlier results to compare against")
+    args = parser.parse_args()
+
+    results = {
+        "commit": commit(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "runs": {},
+    }
+    for n_rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            # deployed as after `python -m acled snapshot`, without a partitioned store
+            csv_path = write_deploy_csv(n_rows, tmp / "df_deploy.csv")
+            store.build_snapshot(csv_path, csv_path.with_suffix(".arrow"))
+            results["runs"][str(n_rows)] = {page: measure(page, csv_path, tmp / "no_store") for page in args.pages}
+
+    args.out.write_text(json.dumps(results, indent=1))
+    baseline = json.loads(args.compare.read_text()) if args.compare is not None else None
+    print_results(results, baseline)
+    print(f"Results of {results['commit']} written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
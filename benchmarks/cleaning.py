@@ -0,0 +1,97 @@
+"""
+Wall time and peak memory of the chunked cleaning vs notebook 02's in-memory pipeline.
+
+The in-memory variant reproduces the notebook cells: full read with the
+notebook dtypes, column drops, remapping, Oceania removal, the per-country
+groupby().transform() median fill and to_csv(). Both variants write their
+output next to the raw export; every column must be equal except the
+population_best values filled with a median, which must be within
+cleaning.MEDIAN_ERROR of the notebook's (exact) ones.
+
+Each variant runs in a fresh interpreter so its peak RSS is its own.
+
+Usage:
+    python -m benchmarks.cleaning [--rows 1000000] [--chunksize 200000]
+"""
+
+import argparse
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from acled import cleaning
+from benchmarks.synthetic import write_raw_export
+
+
+def peak_rss_bytes() -> int:
+    # VmHWM, unlike ru_maxrss, is not inherited from the parent across fork/exec
+    with open("/proc/self/status") as status:
+        line = next(line for line in status if line.startswith("VmHWM:"))
+    return int(line.split()[1]) * 1024
+
+
+def clean_in_memory(raw_path: Path, out_path: Path) -> Path:
+    df = pd.read_csv(raw_path, usecols=cleaning.TO_KEEP, dtype=cleaning.DTYPE_MAP,
+                     parse_dates=["event_date"], low_memory=False)
+    df.drop(columns=cleaning.DROPPED_COLUMNS, inplace=True)
+    df["source_scale"] = df["source_scale"].map(cleaning.SOURCE_SCALE_MAPPING)
+    df["region"] = df["region"].map(cleaning.REGION_MAPPING)
+    df = df[df["region"] != "Oceania"]
+    df["population_best"] = df.groupby("country")["population_best"].transform(lambda x: x.fillna(x.median()))
+    df.to_csv(out_path, index=False)
+    return out_path
+
+
+def compare(notebook_path: Path, chunked_path: Path) -> float:
+    """Largest relative difference of population_best between the outputs, after checking the rest is equal."""
+    notebook, chunked = pd.read_csv(notebook_path), pd.read_csv(chunked_path)
+    others = notebook.columns.drop("population_best")
+    pd.testing.assert_frame_equal(notebook[others], chunked[others])
+    exact, sketched = notebook["population_best"].to_numpy(), chunked["population_best"].to_numpy()
+    assert np.array_equal(np.isnan(exact), np.isnan(sketched))
+    known = ~np.isnan(exact)
+    return float(np.max(np.abs(sketched[known] - exact[known]) / np.maximum(exact[known], 1), initial=0))
+
+
+VARIANTS = {"notebook": "in-memory (notebook)", "chunked": "chunked"}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--chunksize", type=int, default=cleaning.CHUNK_SIZE)
+    parser.add_argument("--variant", choices=list(VARIANTS))
+    parser.add_argument("--raw", type=Path)
+    args = parser.parse_args()
+
+    if args.variant is None:
+        with tempfile.TemporaryDirectory() as tmp:
+            raw_path = write_raw_export(args.rows, Path(tmp) / "raw.csv")
+            print(f"{args.rows:,} rows, raw export {raw_path.stat().st_size / 1e6:.1f} MB")
+            print(f"{'pipeline':>22} {'time (s)':>9} {'peak RSS (MB)':>14}")
+            for variant in VARIANTS:
+                subprocess.run([sys.executable, "-m", "benchmarks.cleaning", "--raw", str(raw_path),
+                                "--chunksize", str(args.chunksize), "--variant", variant], check=True)
+            error = compare(Path(tmp) / "notebook.csv", Path(tmp) / "chunked.csv")
+            print(f"outputs equal but for the filled medians, largest relative difference {error:.4%} "
+                  f"(bound {cleaning.MEDIAN_ERROR:.2%}); sketch of {cleaning.N_BINS * 8 / 1024:.1f} KB per country")
+        return
+
+    out_path = args.raw.with_name(f"{args.variant}.csv")
+    start = time.perf_counter()
+    if args.variant == "notebook":
+        clean_in_memory(args.raw, out_path)
+    else:
+        cleaning.clean_export(args.raw, out_path, args.chunksize)
+    seconds = time.perf_counter() - start
+    peak_mb = peak_rss_bytes() / 1e6
+    print(f"{VARIANTS[args.variant]:>22} {seconds:>9.2f} {peak_mb:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
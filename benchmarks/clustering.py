@@ -0,0 +1,95 @@
+"""
+Parity, wall time and peak memory of the grid DBSCAN vs sklearn's brute-force DBSCAN.
+
+Labels must equal sklearn's DBSCAN(eps=1.2, min_samples=8, algorithm='brute')
+on random samples of the feature matrix (plus a copy with duplicated rows,
+and one with its integer-valued columns only) before any timing is
+reported. Each timed run is a fresh interpreter so its peak RSS is its own;
+sklearn is only timed up to --sklearn-max rows, since its neighborhoods
+grow quadratically.
+
+Usage:
+    python -m benchmarks.clustering [--rows 250000 500000 1000000] [--jobs 1]
+"""
+
+import argparse
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from sklearn.cluster import DBSCAN
+
+from acled import clustering
+from acled.features import open_features
+from benchmarks.cleaning import peak_rss_bytes
+from benchmarks.synthetic import write_feature_matrix
+
+
+def sklearn_dbscan(X: np.ndarray) -> np.ndarray:
+    """The notebook's clustering call."""
+    db = DBSCAN(eps=clustering.EPS, min_samples=clustering.MIN_SAMPLES, metric="euclidean",
+                algorithm="brute", n_jobs=-1)
+    return db.fit_predict(X)
+
+
+def check_parity(X: np.ndarray, sizes: list, jobs: int) -> None:
+    rng = np.random.default_rng(0)
+    for size in sizes:
+        sample = X[clustering.sample_rows(len(X), size, seed=size)]
+        duplicated = np.concatenate([sample, sample[rng.integers(0, size, size // 2)]])
+        # with the gridded columns only, no KD-tree has a column to search
+        gridded = sample[:, clustering.discrete_columns(sample)]
+        for name, rows in [("sample", sample), ("with duplicates", duplicated[rng.permutation(len(duplicated))]),
+                           ("gridded columns only", gridded)]:
+            expected = sklearn_dbscan(rows)
+            actual = clustering.dbscan(rows, n_jobs=jobs, partition_size=max(size // 8, 1000))
+            assert np.array_equal(expected, actual), f"labels differ on {size:,} rows ({name})"
+            print(f"parity {len(rows):>8,} rows ({name}): {expected.max() + 1} clusters, "
+                  f"{(expected == -1).mean():.1%} noise, labels identical")
+
+
+VARIANTS = {"grid": "grid DBSCAN", "sklearn": "sklearn brute"}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[250_000, 500_000, 1_000_000])
+    parser.add_argument("--parity-rows", type=int, nargs="+", default=[5_000, 20_000, 50_000])
+    parser.add_argument("--sklearn-max", type=int, default=250_000)
+    parser.add_argument("--jobs", type=int, default=1)
+    parser.add_argument("--variant", choices=list(VARIANTS))
+    parser.add_argument("--features", type=Path)
+    args = parser.parse_args()
+
+    if args.variant is None:
+        with tempfile.TemporaryDirectory() as tmp:
+            features_path = write_feature_matrix(max(args.rows), Path(tmp))
+            check_parity(open_features(features_path).matrix, args.parity_rows, args.jobs)
+
+            print(f"{'rows':>10} {'clustering':>14} {'time (s)':>9} {'peak RSS (MB)':>14} {'clusters':>9}")
+            for n_rows in args.rows:
+                for variant in VARIANTS:
+                    if variant == "sklearn" and n_rows > args.sklearn_max:
+                        continue
+                    subprocess.run([sys.executable, "-m", "benchmarks.clustering", "--features", str(features_path),
+                                    "--rows", str(n_rows), "--jobs", str(args.jobs), "--variant", variant],
+                                   check=True)
+        return
+
+    n_rows = args.rows[0]
+    X = np.ascontiguousarray(open_features(args.features).matrix[:n_rows])
+    start = time.perf_counter()
+    if args.variant == "grid":
+        labels = clustering.dbscan(X, n_jobs=args.jobs)
+    else:
+        labels = sklearn_dbscan(X)
+    seconds = time.perf_counter() - start
+    print(f"{n_rows:>10,} {VARIANTS[args.variant]:>14} {seconds:>9.1f} {peak_rss_bytes() / 1e6:>14.1f} "
+          f"{labels.max() + 1:>9}")
+
+
+if __name__ == "__main__":
+    main()
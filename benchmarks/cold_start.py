@@ -0,0 +1,55 @@
+"""
+Cold-start load time of the dashboard dataset: CSV parsing vs Arrow snapshot.
+
+Each measurement runs in a fresh interpreter so nothing is cached in-process.
+
+Usage:
+    python -m benchmarks.cold_start [--rows 500000 1000000] [--repeat 3]
+"""
+
+import argparse
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from acled import store
+from benchmarks.synthetic import write_deploy_csv
+
+_TIMER = """
+import sys, time
+from pathlib import Path
+from acled import store
+start = time.perf_counter()
+df = store.{func}(Path(sys.argv[1]))
+print(time.perf_counter() - start)
+"""
+
+
+def _time_in_subprocess(func: str, path: Path) -> float:
+    out = subprocess.run(
+        [sys.executable, "-c", _TIMER.format(func=func), str(path)],
+        check=True, capture_output=True, text=True, cwd=store.ROOT,
+    )
+    return float(out.stdout.strip())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[500_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'csv (s)':>10} {'snapshot (s)':>13} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_rows in args.rows:
+            csv_path = write_deploy_csv(n_rows, Path(tmp) / f"deploy_{n_rows}.csv")
+            snapshot_path = store.build_snapshot(csv_path, csv_path.with_suffix(".arrow"))
+
+            csv_time = min(_time_in_subprocess("read_csv", csv_path) for _ in range(args.repeat))
+            snap_time = min(_time_in_subprocess("read_snapshot", snapshot_path) for _ in range(args.repeat))
+            print(f"{n_rows:>10,} {csv_time:>10.3f} {snap_time:>13.3f} {csv_time / snap_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Parity and latency of cube answers vs row-level aggregation of the filtered frame.
+
+For each filter state the Overview KPIs, events per year, events per
+(cluster, year) and severity counts are computed both ways and must match
+exactly before any timing is reported.
+
+Usage:
+    python -m benchmarks.cube [--rows 160000 1000000] [--repeat 20]
+"""
+
+import argparse
+
+import pandas as pd
+
+from acled.cube import Cube
+from acled.derive import SEVERITY_LEVELS, enrich
+from acled.filters import FilterIndex
+from benchmarks.filters import _best_time, filter_states
+from benchmarks.synthetic import make_events
+
+
+def row_level(df: pd.DataFrame) -> dict:
+    """The per-rerun aggregations the pages ran before the cube."""
+    years = df["event_date"].dt.year
+    return {
+        "total_events": df.shape[0],
+        "total_fatalities": int(df["fatalities"].sum()),
+        "num_clusters": df["cluster"].nunique(),
+        "per_year": df.groupby(years).size(),
+        "per_cluster_year": df.groupby([df["cluster"], years]).size(),
+        "severity": df["fatality_severity"].value_counts().reindex(SEVERITY_LEVELS, fill_value=0),
+    }
+
+
+def cube_level(cube: Cube, filters: dict) -> dict:
+    cells = cube.slice(filters)
+    kpis = cube.kpis(cells)
+    return {
+        "total_events": kpis["total_events"],
+        "total_fatalities": kpis["total_fatalities"],
+        "num_clusters": kpis["num_clusters"],
+        "per_year": cube.events_by(cells, "year"),
+        "per_cluster_year": cube.events_by(cells, ["cluster", "year"]),
+        "severity": cube.events_by(cells, "fatality_severity").reindex(SEVERITY_LEVELS, fill_value=0),
+    }
+
+
+def assert_same(expected: dict, actual: dict) -> None:
+    for key, value in expected.items():
+        if isinstance(value, pd.Series):
+            assert value.to_dict() == actual[key].to_dict(), key
+        else:
+            assert value == actual[key], key
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[160_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'filter state':>14} {'rows (ms)':>10} {'cube (ms)':>10}")
+    for n_rows in args.rows:
+        df = enrich(make_events(n_rows))
+        index = FilterIndex(df)
+        cube = Cube(df)
+
+        for name, filters in filter_states(df).items():
+            filtered = df.take(index.select(filters))
+            assert_same(row_level(filtered), cube_level(cube, filters))
+
+            rows_ms = _best_time(lambda: row_level(filtered), args.repeat) * 1e3
+            cube_ms = _best_time(lambda: cube_level(cube, filters), args.repeat) * 1e3
+            print(f"{n_rows:>10,} {name:>14} {rows_ms:>10.2f} {cube_ms:>10.2f}")
+        print(f"{n_rows:>10,} cube cells: {len(cube.cells):,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Per-rerun cost of the derived columns: row-wise apply + .dt.year vs precomputed columns.
+
+Usage:
+    python -m benchmarks.derive [--rows 1000000] [--repeat 5]
+"""
+
+import argparse
+
+import numpy as np
+
+from acled.derive import enrich, fatality_severity
+from benchmarks.filters import _best_time
+from benchmarks.synthetic import make_events
+
+
+def categorize_fatalities(x):
+    """The row-wise binning dashboard_app.py ran on every rerun."""
+    if x <= 3:
+        return "Low (0-3)"
+    elif x <= 10:
+        return "Moderate (4-10)"
+    elif x <= 50:
+        return "High (11-50)"
+    else:
+        return "Extreme (50+)"
+
+
+def previous_rerun(df) -> None:
+    df["fatalities"].apply(categorize_fatalities)
+    # slider bounds and the year comparison in apply_filters
+    years = df["event_date"].dt.year
+    int(years.min()), int(years.max())
+    df["event_date"].dt.year.between(2018, 2025)
+
+
+def enriched_rerun(df) -> None:
+    int(df["year"].min()), int(df["year"].max())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    df = make_events(args.rows)
+    enriched = enrich(df)
+    expected = df["fatalities"].apply(categorize_fatalities).to_numpy()
+    assert np.array_equal(expected, enriched["fatality_severity"].astype(str).to_numpy())
+
+    print(f"rows: {args.rows:,}")
+    print(f"  previous rerun (apply + .dt.year):  {_best_time(lambda: previous_rerun(df), args.repeat) * 1e3:8.1f} ms")
+    print(f"  enriched rerun (read columns):      {_best_time(lambda: enriched_rerun(enriched), args.repeat) * 1e3:8.1f} ms")
+    print(f"  one-off severity binning (pd.cut):  "
+          f"{_best_time(lambda: fatality_severity(df['fatalities']), args.repeat) * 1e3:8.1f} ms")
+    print(f"  one-off enrich (per dataset):       {_best_time(lambda: enrich(df), args.repeat) * 1e3:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Overhead of the per-stage rerun diagnostics, off and on.
+
+Times an empty `with recorder.stage(name) as stage: stage.rows = n` block in
+every mode of acled/diagnostics.py (a rerun opens about a dozen), and one
+cached-filter rerun of the overview aggregates on synthetic data wrapped in
+the same stages as the page.
+
+Usage:
+    python -m benchmarks.diagnostics [--rows 1000000] [--calls 100000] [--repeat 20]
+"""
+
+import argparse
+import time
+import tracemalloc
+
+from acled.derive import enrich
+from acled.diagnostics import Recorder
+from acled.timeindex import TimeIndex
+from benchmarks.filters import _best_time, filter_states
+from benchmarks.synthetic import make_events
+
+
+def stage_calls(mode, calls: int) -> float:
+    """Seconds per empty stage in `mode`."""
+    recorder = Recorder(mode)
+    start = time.perf_counter()
+    for _ in range(calls):
+        with recorder.stage("stage") as stage:
+            stage.rows = 1
+    return (time.perf_counter() - start) / calls
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--calls", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'mode':>8} {'per stage (µs)':>15}")
+    for mode in [None, "time", "memory"]:
+        print(f"{mode or 'off':>8} {stage_calls(mode, args.calls) * 1e6:>15.2f}")
+    # memory mode leaves tracemalloc running
+    tracemalloc.stop()
+
+    df = enrich(make_events(args.rows))
+    index = TimeIndex(df)
+    filters = filter_states(df)["one region"]
+    cells = index.slice(filters)
+
+    def rerun(mode):
+        recorder = Recorder(mode)
+        with recorder.stage("page: Overview"):
+            with recorder.stage("overview: KPIs") as stage:
+                index.kpis(cells)
+                stage.rows = len(cells)
+            with recorder.stage("overview: events over time") as stage:
+                stage.rows = len(index.timeline(filters, "Week", 4))
+            with recorder.stage("overview: severity chart"):
+                index.events_by(cells, "fatality_severity")
+        recorder.records()
+
+    print(f"{'mode':>8} {'aggregates rerun (ms)':>22}")
+    for mode in [None, "time"]:
+        print(f"{mode or 'off':>8} {_best_time(lambda: rerun(mode), args.repeat) * 1e3:>22.2f}")
+
+
+if __name__ == "__main__":
+    main()
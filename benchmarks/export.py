@@ -0,0 +1,90 @@
+"""
+Parity and throughput of the headless batch export over many filter configurations.
+
+A briefing-pack batch (every region x event type over two date ranges) is
+exported from synthetic data. Every configuration's KPIs and severity
+breakdown must equal those of its rows selected by the filter index (what
+apply_filters returns in the dashboard), and its cluster timelines the
+monthly counts of those rows. The export is then timed end to end with 1,
+2, ... worker processes, including the joblib dump the workers memory-map
+and the pool start; the scaling is bounded by the CPUs of the machine.
+
+Usage:
+    python -m benchmarks.export [--rows 1000000] [--jobs 1 2 4] [--ranges 2]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from acled import export
+from acled.derive import SEVERITY_LEVELS, enrich
+from acled.filters import FilterIndex, filter_options
+from acled.profiles import ClusterProfiles
+from acled.timeindex import TimeIndex
+from benchmarks.synthetic import make_events
+
+
+def row_level(df: pd.DataFrame, rows: np.ndarray, clusters: list) -> tuple:
+    """KPIs, severity counts and monthly events per cluster of the selected rows."""
+    selected = df.take(rows)
+    kpis = {
+        "total_events": len(selected),
+        "total_fatalities": int(selected["fatalities"].sum()),
+        "num_clusters": selected["cluster"].nunique(),
+    }
+    severity = selected["fatality_severity"].value_counts().reindex(SEVERITY_LEVELS).to_numpy()
+    in_clusters = selected[selected["cluster"].isin(clusters)]
+    months = in_clusters["event_date"].dt.to_period("M").dt.to_timestamp()
+    monthly = in_clusters.groupby([in_clusters["cluster"], months]).size()
+    return kpis, severity, monthly[monthly > 0]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--ranges", type=int, default=2, help="date ranges per region x event type")
+    args = parser.parse_args()
+
+    df = enrich(make_events(args.rows))
+    options = filter_options(df=df)
+    start = time.perf_counter()
+    time_index, profiles = TimeIndex(df), ClusterProfiles.from_frame(df)
+    print(f"{args.rows:,} rows: aggregates built in {time.perf_counter() - start:.2f} s, {os.cpu_count()} CPU(s)")
+
+    ranges = [{"name": f"{year}-{year + 1}", "date_range": [f"{year}-01-01", f"{year + 1}-12-31"]}
+              for year in range(2024 - 2 * (args.ranges - 1), 2025, 2)]
+    configs = export.expand(ranges, options, ["regions", "event_type"])
+
+    # parity with the rows of every configuration
+    index = FilterIndex(df)
+    start = time.perf_counter()
+    for name, filters in configs:
+        expected_kpis, expected_severity, expected_monthly = row_level(
+            df, index.select(filters), filters["clusters"])
+        result = export.metrics(time_index, profiles, options, filters)
+        kpis = result["kpis"].iloc[0]
+        assert all(kpis[key] == value for key, value in expected_kpis.items()), name
+        assert np.array_equal(result["severity"]["events"].to_numpy(), expected_severity), name
+        timeline = result["timelines"]
+        monthly = timeline[timeline["events"] > 0].set_index(["cluster", "date"])["events"]
+        assert monthly.sort_index().to_numpy().tolist() == expected_monthly.sort_index().to_numpy().tolist(), name
+    print(f"{len(configs)} configurations match their filtered rows ({time.perf_counter() - start:.1f} s)")
+
+    print(f"{'jobs':>5} {'export (s)':>11} {'configs/s':>10}")
+    for n_jobs in args.jobs:
+        with tempfile.TemporaryDirectory() as tmp:
+            start = time.perf_counter()
+            export.export(time_index, profiles, options, configs, Path(tmp), n_jobs=n_jobs)
+            seconds = time.perf_counter() - start
+        print(f"{n_jobs:>5} {seconds:>11.2f} {len(configs) / seconds:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
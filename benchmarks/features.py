@@ -0,0 +1,106 @@
+"""
+Load time and peak memory of the feature matrix vs the dbscan_input.csv round-trip.
+
+The CSV variant reproduces notebook 02's feature engineering and notebook
+03's loading: pd.read_csv(index_col=0) followed by .astype(np.float32).values.
+The matrix variant opens the memory-mapped artifact and reads every value
+once (a column mean), so the pages are actually faulted in.
+
+Each load runs in a fresh interpreter so its peak RSS is its own.
+
+Usage:
+    python -m benchmarks.features [--rows 1000000]
+"""
+
+import argparse
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+from acled import cleaning, features
+from benchmarks.cleaning import peak_rss_bytes
+from benchmarks.synthetic import write_raw_export
+
+
+def engineer_in_memory(clean_path: Path, out_path: Path) -> Path:
+    df = pd.read_csv(clean_path, dtype={col: cleaning.DTYPE_MAP[col] for col in cleaning.CLEAN_COLUMNS})
+    df_input = df.set_index("event_id_cnty")
+    df_input.drop(columns=["country", "sub_event_type"], inplace=True)
+    df_input.drop(df_input[df_input["geo_precision"] == 3].index, axis=0, inplace=True)
+    df_input.drop(columns=["geo_precision"], inplace=True)
+    df_input["interaction_code"] = pd.Categorical(df_input["interaction"]).codes
+    df_input["region_code"] = df_input["region"].map(features.REGION_ORDER)
+    df_input["source_scale_code"] = df_input["source_scale"].map(features.SOURCE_SCALE_ORDER)
+    df_dummies = pd.get_dummies(df_input["event_type"], drop_first=False).astype(int)
+    df_input = pd.concat([df_input, df_dummies], axis=1)
+    df_input.drop(columns=["interaction", "region", "source_scale", "event_type"], inplace=True)
+    df_input["fatalities_log"] = np.log1p(df_input["fatalities"])
+    df_input["popbest_log"] = np.log1p(df_input["population_best"])
+    df_input.drop(columns=["fatalities", "population_best"], inplace=True)
+    numeric_cols = features.NUMERIC_COLUMNS
+    numeric_scaled = pd.DataFrame(StandardScaler().fit_transform(df_input[numeric_cols]),
+                                  columns=numeric_cols, index=df_input.index)
+    df_input.drop(columns=numeric_cols, inplace=True)
+    df_input = pd.concat([df_input, numeric_scaled], axis=1)
+    df_input.to_csv(out_path, index=True)
+    return out_path
+
+
+def load(variant: str, tmp: Path) -> np.ndarray:
+    if variant == "csv":
+        df_input = pd.read_csv(tmp / "dbscan_input.csv", index_col=0)
+        return df_input.astype(np.float32).values
+    return features.open_features(tmp / "features").matrix
+
+
+VARIANTS = {"csv": "dbscan_input.csv", "matrix": "memory-mapped matrix"}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--variant", choices=list(VARIANTS))
+    parser.add_argument("--dir", type=Path)
+    args = parser.parse_args()
+
+    if args.variant is None:
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            raw_path = write_raw_export(args.rows, tmp / "raw.csv")
+            clean_path = cleaning.clean_export(raw_path, tmp / "clean.csv")
+            csv_path = engineer_in_memory(clean_path, tmp / "dbscan_input.csv")
+            features.build_features(clean_path, tmp / "features")
+
+            reference = pd.read_csv(csv_path, index_col=0)
+            matrix = features.open_features(tmp / "features")
+            assert matrix.columns == reference.columns.tolist()
+            assert (matrix.event_ids.astype(str) == reference.index.to_numpy(dtype=str)).all()
+            diff = np.abs(matrix.matrix - reference.astype(np.float32).values)
+            on_disk = sum(f.stat().st_size for f in (tmp / "features").iterdir())
+            print(f"{matrix.matrix.shape[0]:,} x {matrix.matrix.shape[1]} features, "
+                  f"CSV {csv_path.stat().st_size / 1e6:.1f} MB, matrix + sidecars {on_disk / 1e6:.1f} MB, "
+                  f"max abs difference {np.nanmax(diff):.2g}")
+            del reference, matrix, diff
+
+            print(f"{'load':>22} {'open (s)':>9} {'full read (s)':>14} {'peak RSS (MB)':>14}")
+            for variant in VARIANTS:
+                subprocess.run([sys.executable, "-m", "benchmarks.features", "--dir", str(tmp),
+                                "--variant", variant], check=True)
+        return
+
+    start = time.perf_counter()
+    X = load(args.variant, args.dir)
+    opened = time.perf_counter() - start
+    X.mean(axis=0, dtype=np.float64)
+    full = time.perf_counter() - start
+    print(f"{VARIANTS[args.variant]:>22} {opened:>9.3f} {full:>14.3f} {peak_rss_bytes() / 1e6:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
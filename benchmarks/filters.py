@@ -0,0 +1,86 @@
+"""
+Filter latency: chained .isin() copies (previous apply_filters) vs FilterIndex.
+
+Sizes default to the 50% top-15 deployment sample (~160k rows) and the full
+~1M-row ACLED extract. Both paths are checked to select the same rows.
+
+Usage:
+    python -m benchmarks.filters [--rows 160000 1000000] [--repeat 20]
+"""
+
+import argparse
+import datetime
+import time
+
+import numpy as np
+import pandas as pd
+
+from acled.derive import SEVERITY_LEVELS, enrich
+from acled.filters import FilterIndex
+from benchmarks.synthetic import make_events
+
+
+def chained_isin(df_in: pd.DataFrame, filters: dict) -> pd.DataFrame:
+    """The apply_filters implementation this index replaces."""
+    df_out = df_in.copy()
+    if filters["event_type"]:
+        df_out = df_out[df_out["event_type"].isin(filters["event_type"])]
+    if filters["regions"]:
+        df_out = df_out[df_out["region"].isin(filters["regions"])]
+    if filters["clusters"]:
+        df_out = df_out[df_out["cluster"].isin(filters["clusters"])]
+    if filters["fatality_severity"]:
+        df_out = df_out[df_out["fatality_severity"].isin(filters["fatality_severity"])]
+    first, last = (pd.Timestamp(day) for day in filters["date_range"])
+    return df_out[(df_out["event_date"] >= first) & (df_out["event_date"] <= last)]
+
+
+def filter_states(df: pd.DataFrame) -> dict:
+    top_15 = df["cluster"].value_counts().index[:15].tolist()
+    everything = {
+        "event_type": sorted(df["event_type"].unique()),
+        "regions": sorted(df["region"].unique()),
+        "clusters": top_15,
+        "fatality_severity": SEVERITY_LEVELS,
+        "date_range": (datetime.date(2018, 1, 1), datetime.date(2025, 12, 31)),
+    }
+    return {
+        "defaults": everything,
+        "one region": {**everything, "regions": ["Middle East"]},
+        "narrow": {**everything, "regions": ["Africa"], "clusters": top_15[:3],
+                   "fatality_severity": SEVERITY_LEVELS[2:],
+                   "date_range": (datetime.date(2021, 1, 1), datetime.date(2022, 12, 31))},
+    }
+
+
+def _best_time(func, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[160_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'filter state':>14} {'isin (ms)':>10} {'index (ms)':>11}")
+    for n_rows in args.rows:
+        df = enrich(make_events(n_rows))
+        index = FilterIndex(df)
+
+        for name, filters in filter_states(df).items():
+            expected = df.index.get_indexer(chained_isin(df, filters).index)
+            assert np.array_equal(np.sort(expected), index.select(filters)), name
+
+            isin_ms = _best_time(lambda: chained_isin(df, filters), args.repeat) * 1e3
+            index_ms = _best_time(lambda: index.select(filters), args.repeat) * 1e3
+            print(f"{n_rows:>10,} {name:>14} {isin_ms:>10.2f} {index_ms:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
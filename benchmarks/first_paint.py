@@ -0,0 +1,68 @@
+"""
+Time to first paint of each dashboard page, driven headlessly by Streamlit's AppTest.
+
+Every page is opened as the first run of a fresh interpreter, so the first
+paint pays for the imports, data loading, indexing and aggregation the page
+triggers from cold, plus its own rendering. A second run gives the warm rerun.
+
+AppTest treats an app with a pages/ folder as a v1 multipage app and would
+run the selected page on its own; the runner executes the main script
+instead, so st.navigation and the sidebar prelude run as on the server.
+
+Usage:
+    python -m benchmarks.first_paint [--repeat 3]
+"""
+
+import argparse
+import subprocess
+import sys
+
+from acled import store
+
+PAGES = [
+    "pages/01_overview.py",
+    "pages/02_cluster_insights.py",
+    "pages/03_pareto_modelling.py",
+    "pages/04_conclusions.py",
+]
+
+_RUNNER = """
+import runpy, sys, time
+from streamlit.runtime.scriptrunner import script_runner
+from streamlit.testing.v1 import AppTest
+script_runner._mpa_v1 = lambda path: runpy.run_path(str(path), run_name="__main__")
+at = AppTest.from_file(sys.argv[1], default_timeout=600)
+start = time.perf_counter()
+at.switch_page(sys.argv[2]).run()
+cold = time.perf_counter() - start
+assert not at.exception, at.exception
+start = time.perf_counter()
+at.run()
+print(cold, time.perf_counter() - start)
+"""
+
+
+def measure(page: str) -> tuple:
+    out = subprocess.run(
+        [sys.executable, "-c", _RUNNER, str(store.ROOT / "dashboard_app.py"), page],
+        check=True, capture_output=True, text=True, cwd=store.ROOT,
+    )
+    cold, warm = out.stdout.split()
+    return float(cold), float(warm)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'page':>30} {'first paint (s)':>16} {'rerun (s)':>10}")
+    for page in PAGES:
+        runs = [measure(page) for _ in range(args.repeat)]
+        cold = min(run[0] for run in runs)
+        warm = min(run[1] for run in runs)
+        print(f"{page:>30} {cold:>16.3f} {warm:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Parity and latency of the grid pyramid vs binning the filtered rows per map.
+
+For each filter state and map extent (the world, Africa and a 10° window),
+the spatial density map is computed both ways: binning the coordinates of the
+filtered rows at the level the pyramid picks for the extent, and
+GridPyramid.heatmap() summing the pre-binned entries of the selected cells.
+The filter states cover whole years, so both must match exactly. The build
+time and memory of the pyramid are reported per size.
+
+Usage:
+    python -m benchmarks.grid [--rows 1000000 5000000] [--repeat 20]
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from acled.derive import enrich
+from acled.filters import FilterIndex
+from acled.grid import LEVELS, WORLD, GridPyramid, _shape
+from benchmarks.filters import _best_time, filter_states
+from benchmarks.synthetic import make_events
+
+EXTENTS = {
+    "world": WORLD,
+    "Africa": (-35.0, 38.0, -18.0, 52.0),
+    "10° window": (0.0, 10.0, 30.0, 40.0),
+}
+
+
+def row_level(df: pd.DataFrame, rows: np.ndarray, size: float, extent: tuple) -> pd.DataFrame:
+    """Events and fatalities per bin of `size` degrees in `extent`, binned from the rows."""
+    (row0, row1), (col0, col1) = GridPyramid._window(size, extent)
+    n_rows, n_cols = _shape(size)
+    lat = df["latitude"].to_numpy(dtype=np.float64)[rows]
+    lon = df["longitude"].to_numpy(dtype=np.float64)[rows]
+    row = np.clip(np.floor((lat + 90) / size), 0, n_rows - 1)
+    col = np.clip(np.floor((lon + 180) / size), 0, n_cols - 1)
+    inside = (row >= row0) & (row <= row1) & (col >= col0) & (col <= col1)
+    binned = pd.DataFrame({
+        "latitude": (row[inside] + 0.5) * size - 90,
+        "longitude": (col[inside] + 0.5) * size - 180,
+        "fatalities": df["fatalities"].to_numpy()[rows][inside].astype(np.int64),
+    })
+    return (
+        binned.groupby(["latitude", "longitude"], sort=False)["fatalities"]
+        .agg(events="size", fatalities="sum")
+        .reset_index()
+    )
+
+
+def _sorted(bins: pd.DataFrame) -> pd.DataFrame:
+    return bins.sort_values(["latitude", "longitude"]).reset_index(drop=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000, 5_000_000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    for n_rows in args.rows:
+        df = enrich(make_events(n_rows))
+        index = FilterIndex(df)
+        start = time.perf_counter()
+        grid = GridPyramid(df)
+        build = time.perf_counter() - start
+        print(f"{n_rows:,} rows: pyramid built in {build:.2f} s, {grid.nbytes / 2**20:.1f} MB, "
+              f"{len(grid.cells):,} cells, entries per level "
+              + ", ".join(f"{size:g}°: {len(level['bins']):,}" for size, level in zip(LEVELS, grid.levels)))
+
+        print(f"{'filter state':>14} {'extent':>11} {'bin':>5} {'bins':>7} {'rows (ms)':>10} {'pyramid (ms)':>13}")
+        for name, filters in filter_states(df).items():
+            for extent_name, extent in EXTENTS.items():
+                heatmap, size = grid.heatmap(filters, extent)
+                expected = row_level(df, index.select(filters), size, extent)
+                pd.testing.assert_frame_equal(_sorted(heatmap), _sorted(expected), check_dtype=False)
+
+                # the row path includes the filter, as the map would without the pyramid
+                rows_ms = _best_time(lambda: row_level(df, index.select(filters), size, extent), args.repeat) * 1e3
+                grid_ms = _best_time(lambda: grid.heatmap(filters, extent), args.repeat) * 1e3
+                print(f"{name:>14} {extent_name:>11} {size:>4g}° {len(heatmap):>7,} {rows_ms:>10.2f} {grid_ms:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
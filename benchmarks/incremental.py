@@ -0,0 +1,107 @@
+"""
+Cost of assigning new event batches incrementally vs rebuilding the store.
+
+Runs the whole pipeline once on a synthetic raw export (cleaning, features,
+DBSCAN on a sample, k-NN), writes the labelled events as the full-resolution
+CSV and builds the partitioned store from it. Batches of new events, each
+re-publishing a share of already stored events with changed fatalities, are
+then assigned with `acled.incremental.assign_batch`. After every batch the
+store must hold each event once, with the re-published values, and its
+summary must equal the summary of a store rebuilt from scratch.
+
+Usage:
+    python -m benchmarks.incremental [--rows 500000] [--batches 1000 10000 100000] [--updated 0.1]
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from acled import cleaning, clustering, features, incremental, propagation, store
+from benchmarks.synthetic import make_raw_export
+
+
+def stored_events(store_path: Path) -> pd.DataFrame:
+    """Every stored event with its id, read straight from the Parquet files."""
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(store_path, format="parquet", partitioning=store._partitioning())
+    return dataset.to_table().to_pandas()
+
+
+def check_store(store_path: Path, expected: pd.DataFrame, tmp: Path) -> None:
+    """The store holds exactly `expected` and its summary equals the summary of a rebuild."""
+    stored = stored_events(store_path)
+    assert not stored[store.ID_COLUMN].duplicated().any(), "an event is stored twice"
+    stored = stored.set_index(store.ID_COLUMN).sort_index()
+    by_id = expected.set_index(store.ID_COLUMN).sort_index()
+    assert stored.index.equals(by_id.index), "stored events differ"
+    for col in ["fatalities", "cluster"]:
+        assert np.array_equal(stored[col].to_numpy(), by_id[col].to_numpy()), f"stored {col} differ"
+
+    expected.to_csv(tmp / "rebuilt.csv")
+    rebuilt = store.build_partitioned_store(tmp / "rebuilt.csv", tmp / "rebuilt")
+    actual, fresh = store.read_summary(store_path), store.read_summary(rebuilt)
+    for key in ["rows", "years", "regions", "event_types", "cluster_counts"]:
+        assert actual[key] == fresh[key], f"summary {key} differs from a rebuild"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--batches", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--updated", type=float, default=0.1, help="share of each batch re-publishing stored events")
+    parser.add_argument("--sample", type=int, default=20_000, help="DBSCAN sample size")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        raw_path = tmp / "raw.csv"
+        make_raw_export(args.rows).to_csv(raw_path, index=False)
+        clean_path = cleaning.clean_export(raw_path, tmp / "clean.csv")
+        features_path = features.build_features(clean_path, tmp / "features")
+        clusters_path = clustering.cluster_features(features_path, tmp / "labels.npz", sample_size=args.sample)
+        model_path = propagation.train_knn(features_path, clusters_path, tmp / "knn.joblib")
+
+        start = time.perf_counter()
+        labelled = incremental.assign(incremental.read_batch(raw_path), features_path, model_path, clean_path)
+        labelled.to_csv(tmp / "full.csv")
+        store_path = store.build_partitioned_store(tmp / "full.csv", tmp / "store")
+        rebuild = time.perf_counter() - start
+        print(f"{args.rows:,} raw events, {len(labelled):,} stored: labelling all and rebuilding "
+              f"the store takes {rebuild:.1f} s")
+
+        expected = labelled
+        next_id = args.rows
+        rng = np.random.default_rng(0)
+        print(f"{'batch':>8} {'added':>8} {'replaced':>9} {'skipped':>8} {'assign (s)':>11} {'µs/event':>9}")
+        for size in args.batches:
+            n_updated = int(size * args.updated)
+            batch = make_raw_export(size - n_updated, seed=size, first_id=next_id)
+            next_id += len(batch)
+            # re-published events: same ids as stored ones, revised fatalities
+            republished = make_raw_export(n_updated, seed=size + 1)
+            republished["event_id_cnty"] = rng.choice(expected[store.ID_COLUMN].to_numpy(), n_updated, replace=False)
+            republished["fatalities"] += 1
+            batch = pd.concat([batch, republished], ignore_index=True)
+            batch.to_csv(tmp / "batch.csv", index=False)
+
+            start = time.perf_counter()
+            counts = incremental.assign_batch(tmp / "batch.csv", store_path, features_path, model_path, clean_path)
+            seconds = time.perf_counter() - start
+            print(f"{size:>8,} {counts['added']:>8,} {counts['replaced']:>9,} {counts['skipped']:>8,} "
+                  f"{seconds:>11.2f} {seconds / size * 1e6:>9.0f}")
+
+            assigned = incremental.assign(incremental.read_batch(tmp / "batch.csv"), features_path, model_path,
+                                          clean_path)
+            expected = pd.concat([expected[~expected[store.ID_COLUMN].isin(assigned[store.ID_COLUMN])], assigned])
+            check_store(store_path, expected, tmp)
+        print("after every batch: each event stored once, with its latest values; summary equals a rebuild")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Accuracy and wall time of the sampled k-distance curves vs the notebook's exact curve.
+
+The exact curves come from the notebook's call, NearestNeighbors fitted on
+and queried with every row (once, for the largest min_samples of the sweep).
+For each min_samples the estimate must be within its stated tolerance of the
+exact curve: the largest horizontal gap between the two, as a share of the
+rows, is the Kolmogorov-Smirnov distance between the sampled and the exact
+k-distances.
+
+Usage:
+    python -m benchmarks.kdistance [--rows 250000 1000000] [--sample 20000]
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from sklearn.neighbors import NearestNeighbors
+
+from acled import kdistance
+from acled.features import open_features
+from benchmarks.synthetic import write_feature_matrix
+
+
+def exact_k_distances(X: np.ndarray, max_k: int) -> np.ndarray:
+    """The notebook's k-distance computation, for every k up to `max_k`."""
+    neighbors = NearestNeighbors(n_neighbors=max_k).fit(X)
+    distances, _ = neighbors.kneighbors(X)
+    return distances
+
+
+def horizontal_gap(estimate: np.ndarray, exact: np.ndarray) -> float:
+    """Largest gap between the empirical distributions of two sorted samples."""
+    values = np.concatenate([estimate, exact])
+    return float(np.abs(np.searchsorted(estimate, values, side="right") / len(estimate)
+                        - np.searchsorted(exact, values, side="right") / len(exact)).max())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[250_000, 1_000_000])
+    parser.add_argument("--sample", type=int, default=kdistance.SAMPLE_SIZE)
+    parser.add_argument("--jobs", type=int, default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        features = open_features(write_feature_matrix(max(args.rows), Path(tmp)))
+        all_strata = kdistance.feature_strata(features)
+
+        for n_rows in args.rows:
+            X = np.ascontiguousarray(features.matrix[:n_rows])
+
+            start = time.perf_counter()
+            curves = kdistance.estimate_curves(X, strata=all_strata[:n_rows], sample_size=args.sample,
+                                               n_jobs=args.jobs)
+            estimated = time.perf_counter() - start
+
+            start = time.perf_counter()
+            exact = exact_k_distances(X, max(kdistance.SWEEP))
+            exact_seconds = time.perf_counter() - start
+            print(f"{n_rows:,} rows: exact curves {exact_seconds:.1f} s, estimated from {args.sample:,} "
+                  f"query rows {estimated:.1f} s ({exact_seconds / estimated:.0f}x)")
+
+            print(f"{'min_samples':>11} {'gap':>7} {'tolerance':>9} {'in band':>8} {'max |err|':>9} "
+                  f"{'knee':>6} {'exact knee':>10} {'knee band':>12}")
+            for k, curve in curves.items():
+                k_distances = np.sort(exact[:, k - 1])
+                exact_curve = kdistance._quantiles(k_distances, kdistance.POSITIONS)
+                central = (kdistance.POSITIONS >= 0.01) & (kdistance.POSITIONS <= kdistance.MAX_POSITION)
+
+                gap = horizontal_gap(np.sort(curve.distances), k_distances)
+                in_band = ((exact_curve >= curve.lower) & (exact_curve <= curve.upper)).mean()
+                error = np.abs(curve.distances - exact_curve)[central].max()
+                exact_knee = kdistance.find_knee(kdistance.POSITIONS, exact_curve)[0]
+                band = f"{curve.knee_lower:.3f}-{curve.knee_upper:.3f}"
+                print(f"{k:>11} {gap:>7.2%} {curve.tolerance:>9.2%} {in_band:>8.1%} {error:>9.4f} "
+                      f"{curve.knee:>6.3f} {exact_knee:>10.3f} {band:>12}")
+                assert gap <= curve.tolerance, f"min_samples={k}: estimate outside its tolerance"
+
+
+if __name__ == "__main__":
+    main()
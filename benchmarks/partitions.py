@@ -0,0 +1,46 @@
+"""
+Read time and resident size of partitioned-store selections vs the full dataset.
+
+Usage:
+    python -m benchmarks.partitions [--rows 1000000] [--repeat 3]
+"""
+
+import argparse
+import tempfile
+from pathlib import Path
+
+from acled import store
+from benchmarks.filters import _best_time
+from benchmarks.synthetic import write_full_csv
+
+SELECTIONS = {
+    "everything": (None, None),
+    "one region": (None, ["Middle East"]),
+    "two years": ((2021, 2022), None),
+    "1 year, 1 region": ((2023, 2023), ["Africa"]),
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = write_full_csv(args.rows, Path(tmp) / "full.csv")
+        store_path = store.build_partitioned_store(csv_path, Path(tmp) / "store")
+        on_disk = sum(f.stat().st_size for f in store_path.rglob("*.parquet"))
+        print(f"{args.rows:,} rows: CSV {csv_path.stat().st_size / 1e6:.1f} MB, "
+              f"partitioned store {on_disk / 1e6:.1f} MB")
+
+        print(f"{'selection':>18} {'rows':>10} {'read (s)':>9} {'frame (MB)':>11}")
+        for name, (year_range, regions) in SELECTIONS.items():
+            df = store.read_partitions(year_range, regions, store_path)
+            seconds = _best_time(lambda: store.read_partitions(year_range, regions, store_path), args.repeat)
+            frame_mb = df.memory_usage(deep=True).sum() / 1e6
+            print(f"{name:>18} {len(df):>10,} {seconds:>9.3f} {frame_mb:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Parity and latency of merged cluster profiles vs the row-level profile tab.
+
+For each filter state, the largest, a mid-sized and the smallest selected
+cluster are profiled both ways: the row-level .mode()/.mean()/.median()/
+.min()/.max() of the filtered cluster rows (what the Cluster Profile tab ran
+before), and ClusterProfiles.profile() merging the cluster's cells. Everything
+must match exactly, but the sketched median population, which must be within
+the sketch's relative accuracy. The saved profile store is read back and must
+answer the same.
+
+Usage:
+    python -m benchmarks.profiles [--rows 160000 1000000] [--repeat 20]
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from acled.derive import enrich
+from acled.filters import FilterIndex
+from acled.profiles import RELATIVE_ACCURACY, ClusterProfiles, read_profiles
+from benchmarks.filters import _best_time, filter_states
+from benchmarks.synthetic import make_events
+
+
+def row_level(df: pd.DataFrame, cluster) -> dict:
+    """The summary the profile tab computed from the filtered rows."""
+    df_cluster = df[df["cluster"] == cluster]
+    return {
+        "events": df_cluster.shape[0],
+        "mean_fatalities": df_cluster["fatalities"].mean(),
+        "median_fatalities": df_cluster["fatalities"].median(),
+        "event_type": df_cluster["event_type"].mode()[0],
+        "sub_event_type": df_cluster["sub_event_type"].mode()[0],
+        "interaction": df_cluster["interaction"].mode()[0],
+        "region": df_cluster["region"].mode()[0],
+        "country": df_cluster["country"].mode()[0],
+        "median_population_best": df_cluster["population_best"].median(),
+        "first_date": df_cluster["event_date"].min(),
+        "last_date": df_cluster["event_date"].max(),
+    }
+
+
+def assert_same(expected: dict, actual: dict) -> None:
+    for key, value in expected.items():
+        if key == "median_population_best":
+            assert abs(actual[key] - value) <= RELATIVE_ACCURACY * value, key
+        elif key == "mean_fatalities":
+            assert abs(actual[key] - value) <= 1e-9 * max(value, 1), key
+        else:
+            assert actual[key] == value, key
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[160_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'filter state':>14} {'cluster':>8} {'events':>8} {'rows (ms)':>10} {'profile (ms)':>13}")
+    for n_rows in args.rows:
+        df = enrich(make_events(n_rows))
+        index = FilterIndex(df)
+        start = time.perf_counter()
+        profiles = ClusterProfiles.from_frame(df)
+        build = time.perf_counter() - start
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = profiles.save(Path(tmp) / "profiles.npz")
+            size = path.stat().st_size
+            start = time.perf_counter()
+            saved = read_profiles(path)
+            read = time.perf_counter() - start
+
+            for name, filters in filter_states(df).items():
+                filtered = df.take(index.select(filters))
+                sizes = filtered["cluster"].value_counts()
+                sizes = sizes[sizes > 0]
+                for cluster in [sizes.index[0], sizes.index[len(sizes) // 2], sizes.index[-1]]:
+                    expected = row_level(filtered, cluster)
+                    assert_same(expected, profiles.profile(cluster, filters))
+                    assert_same(expected, saved.profile(cluster, filters))
+
+                    rows_ms = _best_time(lambda: row_level(filtered, cluster), args.repeat) * 1e3
+                    profile_ms = _best_time(lambda: saved.profile(cluster, filters), args.repeat) * 1e3
+                    print(f"{n_rows:>10,} {name:>14} {cluster:>8} {sizes[cluster]:>8,} "
+                          f"{rows_ms:>10.2f} {profile_ms:>13.2f}")
+        print(f"{n_rows:>10,} {len(profiles.cells):,} cells, {profiles.nbytes / 1024**2:.1f} MB in memory, "
+              f"{size / 1024**2:.1f} MB on disk; build {build:.2f} s, read {read * 1e3:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Throughput of the batched k-NN propagation against the number of workers, with parity and resume checks.
+
+A DBSCAN-labelled sample of a synthetic feature matrix trains the notebook's
+KNeighborsClassifier. The notebook's single predict() call over the whole
+matrix is the reference: every propagation run must reproduce its labels
+exactly. One run is killed part-way and resumed, and must still match.
+
+Usage:
+    python -m benchmarks.propagation [--rows 1000000] [--sample 50000] [--workers 1 2 4]
+"""
+
+import argparse
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+from acled import clustering, propagation
+from acled.features import open_features
+from benchmarks.synthetic import write_feature_matrix
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--sample", type=int, default=50_000)
+    parser.add_argument("--batch-size", type=int, default=propagation.BATCH_SIZE)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        features_path = write_feature_matrix(args.rows, tmp)
+        clustering.cluster_features(features_path, tmp / "dbscan_labels.npz", args.sample)
+        model_path = propagation.train_knn(features_path, tmp / "dbscan_labels.npz", tmp / "knn.joblib")
+        matrix = open_features(features_path).matrix
+        rows = len(matrix)
+
+        knn = joblib.load(model_path)
+        start = time.perf_counter()
+        expected = knn.predict(matrix)
+        seconds = time.perf_counter() - start
+        print(f"{rows:,} rows, {args.sample:,} training rows, batches of {args.batch_size:,}")
+        print(f"{'propagation':>24} {'time (s)':>9} {'rows/s':>9}")
+        print(f"{'single predict() call':>24} {seconds:>9.1f} {rows / seconds:>9,.0f}")
+
+        for workers in args.workers:
+            out_path = tmp / f"labels_{workers}"
+            start = time.perf_counter()
+            propagation.propagate(features_path, model_path, out_path, args.batch_size, workers)
+            seconds = time.perf_counter() - start
+            assert np.array_equal(propagation.open_labels(out_path), expected), f"labels differ with {workers} workers"
+            print(f"{f'{workers} worker(s)':>24} {seconds:>9.1f} {rows / seconds:>9,.0f}")
+
+        # kill a run once some batches are written, then resume it
+        out_path = tmp / "labels_resumed"
+        run = subprocess.Popen([sys.executable, "-m", "acled", "propagate", "--features", str(features_path),
+                                "--model", str(model_path), "--out", str(out_path),
+                                "--batch-size", str(args.batch_size), "--jobs", "1"],
+                               stdout=subprocess.DEVNULL)
+        done_path = out_path / "done.npy"
+        while not (done_path.exists() and (out_path / "progress.json").exists() and np.load(done_path).sum() >= 2):
+            time.sleep(0.1)
+        run.send_signal(signal.SIGKILL)
+        run.wait()
+        written = int(np.load(done_path).sum())
+        propagation.propagate(features_path, model_path, out_path, args.batch_size, 1)
+        assert np.array_equal(propagation.open_labels(out_path), expected), "labels differ after resuming"
+        print(f"killed after {written} of {len(np.load(done_path))} batches, resumed: labels identical")
+
+
+if __name__ == "__main__":
+    main()
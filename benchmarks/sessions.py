@@ -0,0 +1,79 @@
+"""
+Per-session memory under a simulated multi-session load.
+
+Each simulated session picks a filter state and keeps what dashboard_app.py
+stores in st.session_state["filtered_df"]: previously a filtered DataFrame
+copy, now a FrameView (int32 row positions over the shared base frame).
+
+Each variant runs in a fresh interpreter so freed allocations are not reused.
+
+Usage:
+    python -m benchmarks.sessions [--rows 1000000] [--sessions 50]
+"""
+
+import argparse
+import gc
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+
+from acled.filters import FilterIndex
+from acled.view import FrameView
+from acled.derive import enrich
+from benchmarks.filters import filter_states
+from benchmarks.synthetic import make_events
+
+
+def rss_bytes() -> int:
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * 4096
+
+
+def simulate(df: pd.DataFrame, index: FilterIndex, n_sessions: int, store_copy: bool) -> tuple:
+    states = list(filter_states(df).values())
+    rng = np.random.default_rng(0)
+
+    gc.collect()
+    before = rss_bytes()
+    sessions, held = [], 0
+    for i in range(n_sessions):
+        rows = index.select(states[rng.integers(len(states))])
+        if store_copy:
+            filtered = df.take(rows)
+            held += filtered.memory_usage(deep=True).sum()
+        else:
+            filtered = FrameView(df, rows)
+            held += filtered.nbytes
+        sessions.append(filtered)
+    gc.collect()
+    return (rss_bytes() - before) / n_sessions, held / n_sessions
+
+
+VARIANTS = {"copy": "DataFrame copy", "view": "FrameView"}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--variant", choices=list(VARIANTS))
+    args = parser.parse_args()
+
+    if args.variant is None:
+        print(f"{'session state':>16} {'RSS / session (MB)':>19} {'held / session (MB)':>20}")
+        for variant in VARIANTS:
+            subprocess.run([sys.executable, "-m", "benchmarks.sessions", "--rows", str(args.rows),
+                            "--sessions", str(args.sessions), "--variant", variant], check=True)
+        return
+
+    df = enrich(make_events(args.rows))
+    index = FilterIndex(df)
+
+    rss, held = simulate(df, index, args.sessions, store_copy=args.variant == "copy")
+    print(f"{VARIANTS[args.variant]:>16} {rss / 1e6:>19.2f} {held / 1e6:>20.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Synthetic events with the deployment schema (notebooks/df_deploy.csv), the raw
+ACLED export schema, and feature matrices built from the latter.
+
+Used by the benchmark scripts so that scaling can be measured without the
+ACLED export, which is not shipped with the repository.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+EVENT_TYPES = {
+    "Battles": ["Armed clash", "Government regains territory", "Non-state actor overtakes territory"],
+    "Explosions/Remote violence": ["Air/drone strike", "Shelling/artillery/missile attack",
+                                   "Remote explosive/landmine/IED", "Suicide bomb", "Grenade"],
+    "Violence against civilians": ["Attack", "Abduction/forced disappearance", "Sexual violence"],
+}
+
+INTERACTIONS = [
+    "State forces-Rebel group", "State forces-Civilians", "Rebel group-Civilians",
+    "Political militia-Civilians", "Identity militia-Civilians", "State forces-Political militia",
+    "Rebel group-Rebel group", "Identity militia-Identity militia", "State forces-Identity militia",
+    "Sole military action", "Political militia-Political militia", "External/Other forces-Civilians",
+]
+
+COUNTRIES = {
+    "Africa": ["Nigeria", "Sudan", "Somalia", "Democratic Republic of Congo", "Mali", "Burkina Faso",
+               "Ethiopia", "Cameroon", "Mozambique", "Niger"],
+    "Middle East": ["Syria", "Yemen", "Iraq", "Palestine", "Israel", "Lebanon", "Turkey"],
+    "Asia": ["Myanmar", "Afghanistan", "Pakistan", "India", "Philippines", "Thailand"],
+    "Europe": ["Ukraine", "Russia", "Azerbaijan", "Armenia"],
+    "Americas": ["Mexico", "Colombia", "Brazil", "Haiti", "Ecuador", "Honduras"],
+}
+
+N_CLUSTERS = 47
+
+ACTORS = [f"Military Forces of Country {i}" for i in range(40)] + [f"Militia Group {i}" for i in range(400)]
+
+
+def make_events(n_rows: int, seed: int = 42) -> pd.DataFrame:
+    """Generate `n_rows` events with the dtypes the dashboard loads."""
+    rng = np.random.default_rng(seed)
+
+    event_types = list(EVENT_TYPES)
+    event_type = rng.choice(event_types, size=n_rows, p=[0.45, 0.3, 0.25])
+    sub_event_type = np.empty(n_rows, dtype=object)
+    for etype, subs in EVENT_TYPES.items():
+        mask = event_type == etype
+        sub_event_type[mask] = rng.choice(subs, size=mask.sum())
+
+    regions = list(COUNTRIES)
+    region = rng.choice(regions, size=n_rows, p=[0.45, 0.25, 0.12, 0.1, 0.08])
+    country = np.empty(n_rows, dtype=object)
+    for reg, countries in COUNTRIES.items():
+        mask = region == reg
+        country[mask] = rng.choice(countries, size=mask.sum())
+
+    # cluster sizes follow a steep rank distribution, as in the DBSCAN output
+    weights = 1.0 / np.arange(1, N_CLUSTERS + 2) ** 1.2
+    cluster = rng.choice(np.arange(-1, N_CLUSTERS), size=n_rows, p=weights / weights.sum())
+
+    # heavy tailed fatalities: half of the events are non-lethal, the rest follow a discrete power law
+    lethal = rng.random(n_rows) < 0.5
+    fatalities = np.where(lethal, np.floor(rng.pareto(1.5, size=n_rows) + 1), 0).clip(max=5000)
+
+    start = np.datetime64("2018-01-01")
+    days = rng.integers(0, 365 * 8, size=n_rows)
+
+    df = pd.DataFrame({
+        "event_date": pd.to_datetime(start + days.astype("timedelta64[D]")),
+        "event_type": event_type,
+        "sub_event_type": sub_event_type,
+        "interaction": rng.choice(INTERACTIONS, size=n_rows),
+        "region": region,
+        "country": country,
+        "fatalities": fatalities.astype("int32"),
+        "population_best": rng.lognormal(8, 2, size=n_rows).round().astype("float32"),
+        "cluster": cluster.astype("int32"),
+    })
+
+    # events of a cluster sit around its centre (the clusters were found on the coordinates),
+    # noise events anywhere between the latitudes of the recorded conflicts
+    low, high = [-35.0, -100.0], [60.0, 140.0]
+    centres = rng.uniform(low, high, size=(N_CLUSTERS, 2))
+    spreads = rng.uniform(0.5, 4.0, size=N_CLUSTERS)
+    coordinates = rng.uniform(low, high, size=(n_rows, 2))
+    clustered = cluster >= 0
+    coordinates[clustered] = (centres[cluster[clustered]]
+                              + rng.normal(size=(clustered.sum(), 2)) * spreads[cluster[clustered], None])
+    df["latitude"] = coordinates[:, 0].clip(-89.9, 89.9).astype("float32")
+    df["longitude"] = ((coordinates[:, 1] + 180) % 360 - 180).astype("float32")
+
+    # a few prolific actors and a long tail, as in ACLED; a fifth of the events have no second actor
+    actor_weights = rng.permutation(1.0 / np.arange(1, len(ACTORS) + 1))
+    actor_weights /= actor_weights.sum()
+    df["actor1"] = rng.choice(ACTORS, size=n_rows, p=actor_weights)
+    df["actor2"] = np.where(rng.random(n_rows) < 0.2, None, rng.choice(ACTORS, size=n_rows, p=actor_weights))
+
+    return df.astype({col: "category" for col in
+                      ["event_type", "sub_event_type", "interaction", "region", "country", "actor1", "actor2"]})
+
+
+def write_deploy_csv(n_rows: int, path, seed: int = 42):
+    """Write a synthetic stand-in for notebooks/df_deploy.csv to `path`."""
+    make_events(n_rows, seed).to_csv(path)
+    return path
+
+
+def write_full_csv(n_rows: int, path, seed: int = 42):
+    """Write a synthetic stand-in for models/df_full_with_clusters.csv, with event ids, to `path`."""
+    df = make_events(n_rows, seed)
+    df.insert(0, "event_id_cnty", [f"EVT{i:08d}" for i in range(n_rows)])
+    df.to_csv(path)
+    return path
+
+
+# ---------------- Raw ACLED export ----------------
+
+# ACLED subregions, including the Oceania ones that the cleaning step drops
+RAW_REGIONS = [
+    "Western Africa", "Eastern Africa", "Middle Africa", "Northern Africa", "Southern Africa",
+    "Middle East", "South Asia", "Southeast Asia", "East Asia", "Caucasus and Central Asia",
+    "Eastern Europe", "Europe", "South America", "Central America", "Caribbean", "North America",
+    "Oceania",
+]
+
+RAW_SOURCE_SCALES = [
+    "National", "Subnational", "Local partner-Other", "New media", "Regional", "International",
+    "National-Regional", "Subnational-National", "Other", "New media-National", "Other-Regional",
+]
+
+
+
+def make_raw_export(n_rows: int, seed: int = 42, first_id: int = 0) -> pd.DataFrame:
+    """
+    Generate `n_rows` events with the raw ACLED export columns used by notebook 02,
+    numbered from `first_id`.
+    """
+    rng = np.random.default_rng(seed)
+    events = make_events(n_rows, seed)
+
+    raw_region = rng.choice(RAW_REGIONS, size=n_rows)
+    country = pd.Series(raw_region).str.cat(rng.integers(0, 4, size=n_rows).astype(str), sep=" country ")
+
+    # about 2% of the events come without a population estimate
+    population = rng.lognormal(8, 2, size=n_rows).round().astype("float32")
+    population[rng.random(n_rows) < 0.02] = np.nan
+
+    return pd.DataFrame({
+        "event_id_cnty": [f"EVT{i:08d}" for i in range(first_id, first_id + n_rows)],
+        "event_date": events["event_date"].dt.strftime("%Y-%m-%d"),
+        "year": events["event_date"].dt.year,
+        "time_precision": rng.integers(1, 4, size=n_rows),
+        "disorder_type": "Political violence",
+        "event_type": events["event_type"],
+        "sub_event_type": events["sub_event_type"],
+        "actor1": rng.choice(ACTORS, size=n_rows),
+        "inter1": rng.choice(["State forces", "Rebel group", "Political militia"], size=n_rows),
+        "actor2": rng.choice(ACTORS + [""], size=n_rows),
+        "inter2": rng.choice(["Civilians", "Rebel group", ""], size=n_rows),
+        "interaction": events["interaction"],
+        "region": raw_region,
+        "country": country,
+        "latitude": rng.uniform(-40, 60, size=n_rows).round(4),
+        "longitude": rng.uniform(-100, 140, size=n_rows).round(4),
+        "geo_precision": rng.integers(1, 4, size=n_rows),
+        "source": rng.choice(["BBC", "Reuters", "Local outlet", "ACLED partner"], size=n_rows),
+        "source_scale": rng.choice(RAW_SOURCE_SCALES, size=n_rows),
+        "notes": "On this date, an armed clash was reported.",
+        "fatalities": events["fatalities"].clip(upper=30_000),
+        "population_1km": (population / 10).round(),
+        "population_best": population,
+    })
+
+
+def write_raw_export(n_rows: int, path, seed: int = 42):
+    """Write a synthetic stand-in for data/raw/original_acled.csv to `path`."""
+    make_raw_export(n_rows, seed).to_csv(path, index=False)
+    return path
+
+
+def write_feature_matrix(n_rows: int, path, seed: int = 42):
+    """
+    Run a synthetic raw export through the cleaning and feature steps and write
+    a feature matrix with at least `n_rows` rows to the directory `path`.
+    """
+    from acled import cleaning, features
+
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    # Oceania and geo_precision == 3 remove about 37% of the raw events
+    raw_path = write_raw_export(int(n_rows / 0.6) + 1000, path / "raw.csv", seed)
+    clean_path = cleaning.clean_export(raw_path, path / "clean.csv")
+    raw_path.unlink()
+    out_path = features.build_features(clean_path, path / "features")
+    clean_path.unlink()
+    return out_path
@@ -0,0 +1,80 @@
+"""
+Wall time of the per-cluster and per-region tail table, and of its batched bootstrap.
+
+The batched bootstrap (all resamples as count vectors through one xmin scan)
+must give the alphas and xmins of refitting every resample on its own, which
+is also timed; the table is then built with a growing number of workers.
+
+Usage:
+    python -m benchmarks.tail_table [--rows 1000000] [--bootstrap 200] [--jobs 1 2 4]
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from acled import tailfit
+from benchmarks.synthetic import make_events
+
+
+def bootstrap_one_by_one(x: np.ndarray, counts: np.ndarray, resamples: np.ndarray) -> tuple:
+    """One xmin scan per resample, over the values it holds."""
+    alphas, xmins = [], []
+    for resample in resamples:
+        keep = resample > 0
+        scanned_alphas, distances = tailfit.scan_xmin(x[keep], resample[keep])
+        best = np.argmin(distances)
+        alphas.append(scanned_alphas[best])
+        xmins.append(x[keep][best])
+    return np.array(alphas), np.array(xmins)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--bootstrap", type=int, default=tailfit.N_BOOTSTRAP)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    df = make_events(args.rows)
+    x, counts = tailfit.distinct_counts(df["fatalities"].to_numpy())
+
+    # same resamples both ways: bootstrap_fits draws its blocks from the generator in order
+    start = time.perf_counter()
+    batched = tailfit.bootstrap_fits(x, counts, args.bootstrap, np.random.default_rng(0))
+    batched_seconds = time.perf_counter() - start
+
+    rng = np.random.default_rng(0)
+    per_block = max(1, tailfit.SCAN_BLOCK // (len(x) * len(x)))
+    resamples = np.concatenate([rng.multinomial(counts.sum(), counts / counts.sum(),
+                                                size=min(per_block, args.bootstrap - start))
+                                for start in range(0, args.bootstrap, per_block)])
+    start = time.perf_counter()
+    looped = bootstrap_one_by_one(x, counts, resamples)
+    looped_seconds = time.perf_counter() - start
+
+    assert np.array_equal(batched[1], looped[1]), "bootstrap xmins differ"
+    assert np.allclose(batched[0], looped[0], rtol=1e-9), "bootstrap alphas differ"
+    print(f"{args.bootstrap} bootstrap refits of all {counts.sum():,} lethal events ({len(x)} distinct values): "
+          f"batched {batched_seconds:.2f} s, one by one {looped_seconds:.2f} s, same alphas and xmins")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        out_path = Path(tmp) / "tail_fits.parquet"
+        print(f"{'workers':>8} {'groups':>7} {'build (s)':>10} {'read (ms)':>10}")
+        for jobs in args.jobs:
+            start = time.perf_counter()
+            tailfit.build_tail_table(df, out_path, args.top, args.bootstrap, jobs)
+            build = time.perf_counter() - start
+            start = time.perf_counter()
+            table = tailfit.read_tail_table(out_path)
+            read = time.perf_counter() - start
+            print(f"{jobs:>8} {len(table):>7} {build:>10.1f} {read * 1e3:>10.1f}")
+        print(f"table on disk: {out_path.stat().st_size / 1e3:.1f} kB")
+
+
+if __name__ == "__main__":
+    main()
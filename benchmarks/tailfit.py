@@ -0,0 +1,86 @@
+"""
+Wall time of the Pareto page's power-law fit, and its agreement with powerlaw.Fit.
+
+The fit runs on the fatalities of synthetic events, as the page does on the
+filtered data. If the powerlaw package (used by notebook 04, not a
+dashboard requirement) is installed, xmin, alpha and the KS distance must
+match powerlaw.Fit(discrete=True) on the smaller samples, and both fits are
+timed. The likelihood ratios are printed side by side: powerlaw clamps
+underflowing likelihoods to 1e-308, so its ratio against the exponential
+differs once the tail reaches values the fitted exponential makes vanishingly
+rare.
+
+Usage:
+    python -m benchmarks.tailfit [--rows 100000 1000000 5000000] [--parity-max 1000000]
+"""
+
+import argparse
+import importlib.util
+import time
+import warnings
+
+import numpy as np
+
+from acled.cache import ResultCache
+from acled.tailfit import fit_power_law
+from benchmarks.synthetic import make_events
+
+
+def powerlaw_fit(fatalities: np.ndarray) -> dict:
+    """The notebook's fit and comparisons."""
+    import powerlaw
+
+    positive = fatalities[fatalities > 0]
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        fit = powerlaw.Fit(positive, discrete=True, verbose=False)
+        R_lognormal, p_lognormal = fit.distribution_compare("power_law", "lognormal")
+        R_exponential, p_exponential = fit.distribution_compare("power_law", "exponential")
+    return {"xmin": fit.power_law.xmin, "alpha": fit.power_law.alpha, "D": fit.power_law.D,
+            "R_lognormal": R_lognormal, "p_lognormal": p_lognormal,
+            "R_exponential": R_exponential, "p_exponential": p_exponential}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000, 5_000_000])
+    parser.add_argument("--parity-max", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    has_powerlaw = importlib.util.find_spec("powerlaw") is not None
+    if not has_powerlaw:
+        print("powerlaw is not installed, parity checks skipped")
+
+    cache = ResultCache(max_bytes=8 * 1024**2)
+    print(f"{'rows':>10} {'distinct':>9} {'fit (s)':>8} {'cached (ms)':>12} {'powerlaw (s)':>13} "
+          f"{'xmin':>6} {'alpha':>7} {'R logn':>8} {'R exp':>9}")
+    for n_rows in args.rows:
+        fatalities = make_events(n_rows)["fatalities"].to_numpy()
+        filters = {"rows": [n_rows]}
+
+        start = time.perf_counter()
+        fit = cache.get(filters, lambda _: fit_power_law(fatalities))
+        seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        cache.get(filters, lambda _: fit_power_law(fatalities))
+        cached = time.perf_counter() - start
+
+        reference, reference_seconds = None, float("nan")
+        if has_powerlaw and n_rows <= args.parity_max:
+            start = time.perf_counter()
+            reference = powerlaw_fit(fatalities)
+            reference_seconds = time.perf_counter() - start
+            assert fit.xmin == reference["xmin"], f"xmin {fit.xmin} != {reference['xmin']}"
+            assert abs(fit.alpha - reference["alpha"]) < 1e-4, f"alpha {fit.alpha} != {reference['alpha']}"
+            assert abs(fit.D - reference["D"]) < 1e-4, f"D {fit.D} != {reference['D']}"
+
+        distinct = len(np.unique(fatalities[fatalities > 0]))
+        print(f"{n_rows:>10,} {distinct:>9,} {seconds:>8.3f} {cached * 1e3:>12.3f} {reference_seconds:>13.2f} "
+              f"{fit.xmin:>6g} {fit.alpha:>7.4f} {fit.R_lognormal:>8.2f} {fit.R_exponential:>9.1f}")
+        if reference is not None:
+            print(f"{'powerlaw':>10} {'':>9} {'':>8} {'':>12} {'':>13} {reference['xmin']:>6g} "
+                  f"{reference['alpha']:>7.4f} {reference['R_lognormal']:>8.2f} {reference['R_exponential']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
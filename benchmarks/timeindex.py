@@ -0,0 +1,120 @@
+"""
+Parity and latency of the day-level time index vs row-level date filtering.
+
+For filter states with date windows that cut through weeks, months and
+years, the KPIs, per-region counts and the events-over-time series of every
+granularity (plain and as a rolling mean, total and per cluster) are computed
+from the filtered rows and from TimeIndex, and must match before any timing
+is reported.
+
+Usage:
+    python -m benchmarks.timeindex [--rows 160000 1000000] [--window 4] [--repeat 10]
+"""
+
+import argparse
+import datetime
+import time
+
+import numpy as np
+import pandas as pd
+
+from acled.derive import enrich
+from acled.filters import FilterIndex
+from acled.timeindex import GRANULARITIES, TimeIndex
+from benchmarks.filters import _best_time, filter_states
+from benchmarks.synthetic import make_events
+
+
+def bucket_starts(dates: pd.Series, granularity: str, first: pd.Timestamp) -> pd.Series:
+    """First day of the bucket of every date, the window's first day for the first bucket."""
+    if granularity == "Day":
+        starts = dates
+    elif granularity == "Week":
+        starts = dates - pd.to_timedelta(dates.dt.weekday, unit="D")
+    else:
+        starts = dates.dt.to_period("M" if granularity == "Month" else "Y").dt.start_time
+    return starts.where(starts >= first, first)
+
+
+def row_level(df: pd.DataFrame, window_days: tuple, granularity: str, window: int, by=None):
+    """Events per bucket from the filtered rows, reindexed to every bucket of the date window."""
+    first, last = window_days
+    dates = pd.Series(pd.date_range(first, last, freq="D"))
+    index = pd.DatetimeIndex(bucket_starts(dates, granularity, first).unique(), name="date")
+    starts = bucket_starts(df["event_date"], granularity, first)
+
+    if by is None:
+        counts = starts.value_counts().reindex(index, fill_value=0)
+        return counts.rolling(window, min_periods=1).mean() if window > 1 else counts
+    counts = df.groupby([df[by], starts], observed=True).size()
+    series = {}
+    for group in np.unique(df[by]):
+        counts_group = counts[group].reindex(index, fill_value=0)
+        series[group] = counts_group.rolling(window, min_periods=1).mean() if window > 1 else counts_group
+    return series
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[160_000, 1_000_000])
+    parser.add_argument("--window", type=int, default=4, help="rolling window checked, in buckets")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'filter state':>14} {'granularity':>11} {'rows (ms)':>10} {'index (ms)':>11}")
+    for n_rows in args.rows:
+        df = enrich(make_events(n_rows))
+        filter_index = FilterIndex(df)
+        start = time.perf_counter()
+        index = TimeIndex(df)
+        build = time.perf_counter() - start
+
+        states = filter_states(df)
+        states = {
+            "defaults": states["defaults"],
+            "one quarter": {**states["one region"],
+                            "date_range": (datetime.date(2022, 2, 15), datetime.date(2022, 5, 10))},
+            "narrow": {**states["narrow"], "date_range": (datetime.date(2020, 7, 9), datetime.date(2022, 3, 3))},
+        }
+        for name, filters in states.items():
+            filtered = df.take(filter_index.select(filters))
+            # the index covers the days from the first to the last event of the data
+            window_days = (max(pd.Timestamp(filters["date_range"][0]), df["event_date"].min()),
+                           min(pd.Timestamp(filters["date_range"][1]), df["event_date"].max()))
+            cells = index.slice(filters)
+            kpis = index.kpis(cells)
+            assert kpis["total_events"] == len(filtered), name
+            assert kpis["total_fatalities"] == filtered["fatalities"].sum(), name
+            assert kpis["num_clusters"] == filtered["cluster"].nunique(), name
+            by_region = filtered["region"].value_counts()
+            assert index.events_by(cells, "region").to_dict() == by_region[by_region > 0].to_dict(), name
+            span = index.date_span(filters)
+            assert span == (filtered["event_date"].min(), filtered["event_date"].max()), name
+
+            for granularity in GRANULARITIES:
+                for window in [1, args.window]:
+                    expected = row_level(filtered, window_days, granularity, window)
+                    actual = index.timeline(filters, granularity, window)
+                    assert actual.index.equals(expected.index), (name, granularity)
+                    assert np.allclose(actual.to_numpy(), expected.to_numpy()), (name, granularity, window)
+                expected = row_level(filtered, window_days, granularity, args.window, by="cluster")
+                actual = index.timeline(filters, granularity, args.window, by="cluster")
+                for cluster, series in expected.items():
+                    assert np.allclose(actual[actual["cluster"] == cluster]["events"], series), (name, cluster)
+
+                def rows():
+                    selected = df.take(filter_index.select(filters))
+                    return row_level(selected, window_days, granularity, args.window)
+
+                def indexed():
+                    return index.kpis(index.slice(filters)), index.timeline(filters, granularity, args.window)
+
+                rows_ms = _best_time(rows, args.repeat) * 1e3
+                index_ms = _best_time(indexed, args.repeat) * 1e3
+                print(f"{n_rows:>10,} {name:>14} {granularity:>11} {rows_ms:>10.2f} {index_ms:>11.2f}")
+        print(f"{n_rows:>10,} {len(index.series):,} series, {len(index._keys):,} (series, day) entries, "
+              f"{index.nbytes / 1024**2:.1f} MB; build {build:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+First-request latency of the dashboard with and without the server-start warm-up.
+
+For each size a synthetic deployment CSV is written with its Arrow snapshot
+(as in benchmarks/app_reruns.py) and every data page is opened in a fresh
+interpreter through Streamlit's AppTest, in three ways:
+
+- cold: no warm-up, the first request builds everything (before);
+- in flight: the warm-up is started and the request arrives at once, so it
+  waits on the steps still running instead of repeating them;
+- warm: the request arrives once the warm-up is ready.
+
+Usage:
+    python -m benchmarks.warmup [--rows 1000000 5000000] [--pages pages/01_overview.py ...]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from acled import store
+from benchmarks.first_paint import PAGES
+from benchmarks.synthetic import write_deploy_csv
+
+MODES = ["cold", "in flight", "warm"]
+
+_RUNNER = """
+import json, runpy, sys, time
+from streamlit.runtime.scriptrunner import script_runner
+from streamlit.testing.v1 import AppTest
+from acled import warmup
+script_runner._mpa_v1 = lambda path: runpy.run_path(str(path), run_name="__main__")
+
+start = time.perf_counter()
+if sys.argv[3] != "cold":
+    thread = warmup.start()
+    if sys.argv[3] == "warm":
+        thread.join()
+ready = time.perf_counter() - start
+
+at = AppTest.from_file(sys.argv[1], default_timeout=600)
+start = time.perf_counter()
+at.switch_page(sys.argv[2]).run()
+assert not at.exception, at.exception
+print(json.dumps({"first_request_s": time.perf_counter() - start, "warmup_s": ready, "status": warmup.status()}))
+"""
+
+
+def measure(page: str, mode: str, csv_path: Path, store_path: Path) -> dict:
+    """First-request latency of `page` in a fresh interpreter, with the warm-up in `mode`."""
+    env = {**os.environ, "ACLED_DEPLOY_CSV": str(csv_path), "ACLED_STORE": str(store_path)}
+    out = subprocess.run(
+        [sys.executable, "-c", _RUNNER, str(store.ROOT / "dashboard_app.py"), page, mode],
+        check=True, capture_output=True, text=True, cwd=store.ROOT, env=env,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000, 5_000_000])
+    parser.add_argument("--pages", nargs="+", default=[page for page in PAGES if "conclusions" not in page])
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'page':>30} " + " ".join(f"{mode + ' (s)':>13}" for mode in MODES) + f" {'warm-up (s)':>12}")
+    for n_rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            csv_path = write_deploy_csv(n_rows, tmp / "df_deploy.csv")
+            store.build_snapshot(csv_path, csv_path.with_suffix(".arrow"))
+            for page in args.pages:
+                runs = {mode: measure(page, mode, csv_path, tmp / "no_store") for mode in MODES}
+                print(f"{n_rows:>10,} {page:>30} "
+                      + " ".join(f"{runs[mode]['first_request_s']:>13.2f}" for mode in MODES)
+                      + f" {runs['warm']['warmup_s']:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,8 +2,11 @@
 Dashboard application for Armed Conflicts Analytics using Streamlit.
 Includes page navigation and sidebar filters.
 """
+import os
+
 import streamlit as st
-import pandas as pd
+
+from acled.diagnostics import Recorder, select_mode
 
 # ---------------- Basic Configuration ----------------
 
@@ -15,33 +18,204 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
-# Load data and store in session state
-@st.cache_data
-def load_data():
-    return pd.read_csv(
-        "notebooks/df_deploy.csv",
-        index_col=0,
-        parse_dates=["event_date"]
-    )
-
-df = load_data()
-
-# compute top 15 clusters
-cluster_counts = df["cluster"].value_counts().sort_values(ascending=False)
-top_15_clusters = cluster_counts.index[:15].tolist()
-
-# bin fatalities into categories
-def categorize_fatalities(x):
-    if x <= 3:
-        return "Low (0-3)"
-    elif x <= 10:
-        return "Moderate (4-10)"
-    elif x <= 50:
-        return "High (11-50)"
+# ---------------- Data Pipeline ----------------
+# Nothing below runs unless the current page reads the filtered data, so the
+# data modules (pandas, pyarrow) are only imported inside these functions.
+
+# full-resolution store partitioned by year and region, used instead of the
+# deployment sample once it has been built (python -m acled partitions);
+# `python -m acled assign` updates it in place, which changes its version
+def store_version():
+    from acled import store
+    return store.summary_version()
+
+@st.cache_resource(max_entries=1)
+def load_store_summary(version):
+    from acled import store
+    return None if version is None else store.read_summary()
+
+def partition_key(filters: dict):
+    """Store version, years of the date range and regions pushed down to the partitioned store (None without one)."""
+    from acled import store
+    return store.partition_key(store_version(), filters)
+
+# Load data once per process (per partition selection with the partitioned store);
+# the frame is shared read-only by all sessions
+# (reads the typed Arrow snapshot, falls back to notebooks/df_deploy.csv if it is missing or stale;
+# fatality_severity, year and month are derived once per dataset version, see acled/derive.py).
+# Under `python -m acled serve` the loaders below take what the warm-up thread
+# built for the default view at server start, waiting for it if still in
+# flight (see acled/warmup.py).
+@st.cache_resource(max_entries=4)
+def load_data(partition=None):
+    from acled import store, warmup
+    if partition is None:
+        return warmup.shared("data", partition, store.load_frame)
+    _, year_range, regions = partition
+    return warmup.shared("data", partition, lambda: store.read_partitions(year_range, regions))
+
+# sidebar options, discovered once per dataset (and store version)
+@st.cache_resource(max_entries=1)
+def load_filter_options(version=None) -> dict:
+    from acled import warmup
+    from acled.filters import filter_options
+
+    summary = load_store_summary(version)
+    # the partitioned store lists its options without reading any partition
+    return warmup.shared("filter_options", version,
+                         lambda: filter_options(summary, None if summary is not None else load_data()))
+
+def actor_key(filters: dict) -> tuple:
+    """Selected actors of `filters` as a cache key (empty without an actor filter)."""
+    return tuple(sorted(filters.get("actors") or ()))
+
+# bitmap index over the filter columns, built once per loaded frame
+# (with the inverted actor index when the data has actors)
+@st.cache_resource(max_entries=4)
+def load_filter_index(partition=None):
+    from acled import warmup
+    from acled.filters import FilterIndex
+    return warmup.shared("filter_index", partition, lambda: FilterIndex(load_data(partition)))
+
+# pre-aggregated cube for page KPIs and chart series, at day resolution
+# (prefix sums per series, answering any date range and time bucket)
+@st.cache_resource(max_entries=4)
+def load_cube(partition=None):
+    from acled import warmup
+    from acled.timeindex import TimeIndex
+    return warmup.shared("time_index", partition, lambda: TimeIndex(load_data(partition)))
+
+# multi-resolution grid of event counts for the Overview's spatial density map,
+# built once per loaded frame (None if the dataset has no coordinates)
+@st.cache_resource(max_entries=4)
+def load_grid(partition=None):
+    from acled import warmup
+    from acled.grid import GridPyramid
+    df = load_data(partition)
+    if "latitude" not in df.columns:
+        return None
+    return warmup.shared("grid", partition, lambda: GridPyramid(df))
+
+# the aggregates have no actor dimension: with an actor filter their counts are
+# summed again over the events naming the selected actors (see restrict() in
+# acled/timeindex.py and acled/grid.py), and the other filters slice them as
+# usual; in caches of their own, so actor selections never evict the aggregates
+@st.cache_resource(max_entries=4)
+def load_actor_rows(partition=None, actors=()):
+    return load_filter_index(partition).select({"actors": list(actors)})
+
+@st.cache_resource(max_entries=4)
+def load_actor_cube(partition=None, actors=()):
+    rows = load_actor_rows(partition, actors)
+    return load_cube(partition).restrict(rows, load_data(partition)["fatalities"].to_numpy()[rows])
+
+@st.cache_resource(max_entries=4)
+def load_actor_grid(partition=None, actors=()):
+    grid = load_grid(partition)
+    if grid is None:
+        return None
+    rows = load_actor_rows(partition, actors)
+    return grid.restrict(rows, load_data(partition)["fatalities"].to_numpy()[rows])
+
+# process-wide LRU cache of filter results, shared by all sessions
+# (memory ceiling in MB via the ACLED_FILTER_CACHE_MB environment variable;
+# a new store version starts an empty cache)
+@st.cache_resource(max_entries=1)
+def load_result_cache(version=None):
+    from acled.cache import ResultCache
+    return ResultCache(max_bytes=int(os.environ.get("ACLED_FILTER_CACHE_MB", 64)) * 1024**2)
+
+# power-law fits of the filtered fatalities for the Pareto page, cached per
+# filter signature like the filter results
+@st.cache_resource(max_entries=1)
+def load_fit_cache(version=None):
+    from acled.cache import ResultCache
+    return ResultCache(max_bytes=int(os.environ.get("ACLED_FIT_CACHE_MB", 8)) * 1024**2)
+
+# per-cluster and per-region tail fits of the whole dataset (python -m acled tails),
+# read once per saved table
+def tail_table_version():
+    from acled.tailfit import TAIL_FITS
+    try:
+        return TAIL_FITS.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+@st.cache_resource(max_entries=1)
+def load_tail_table(version):
+    from acled import warmup
+    from acled.tailfit import read_tail_table
+    return None if version is None else warmup.shared("tail_table", version, read_tail_table)
+
+# mergeable cluster profiles for the Cluster Profile tab: the saved profile
+# store (python -m acled profiles) while it matches the loaded dataset,
+# else built once per loaded frame
+def profiles_version():
+    from acled.profiles import PROFILES
+    try:
+        return PROFILES.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+def deploy_csv_version():
+    from acled import store
+    return store.source_file()
+
+@st.cache_resource(max_entries=1)
+def load_saved_profiles(version, data_version=None, source_file=None):
+    from acled import warmup
+    from acled.profiles import read_profiles
+    if version is None:
+        return None
+    profiles = warmup.shared("saved_profiles", version, read_profiles)
+    summary = load_store_summary(data_version)
+    if summary is not None:
+        current = {"rows": summary["rows"], "generation": summary.get("generation"), "source_file": None}
     else:
-        return "Extreme (50+)"
-        
-df["fatality_severity"] = df["fatalities"].apply(categorize_fatalities)
+        # a regenerated CSV may keep the row count: compare the file itself
+        current = {"rows": len(load_data()), "generation": None, "source_file": source_file}
+    return profiles if profiles.source == current else None
+
+@st.cache_resource(max_entries=4)
+def load_profiles(partition=None):
+    from acled import warmup
+    from acled.profiles import ClusterProfiles
+    return warmup.shared("profiles", partition, lambda: ClusterProfiles.from_frame(load_data(partition)))
+
+# profiles of the events naming the selected actors, summarized from their rows
+@st.cache_resource(max_entries=4)
+def load_actor_profiles(partition=None, actors=()):
+    from acled.profiles import RowProfiles
+    return RowProfiles(load_data(partition), load_actor_rows(partition, actors))
+
+# ---------------- Apply Filters Through Function ----------------
+
+def apply_filters(filters: dict):
+    """Return the row positions of the loaded data matching the sidebar selections."""
+    return load_filter_index(partition_key(filters)).select(filters)
+
+def compute_filter_result(filters: dict):
+    from acled import warmup
+    from acled.cache import FilterResult, filter_signature
+
+    def compute():
+        partition, actors = partition_key(filters), actor_key(filters)
+        cube = load_actor_cube(partition, actors) if actors else load_cube(partition)
+        return FilterResult(rows=apply_filters(filters), cells=cube.slice(filters))
+
+    return warmup.shared("filter_result", filter_signature(filters), compute)
+
+def compute_tail_fit(filters: dict):
+    """Power-law fit of the fatalities of the rows selected by `filters`."""
+    from acled import warmup
+    from acled.cache import filter_signature
+    from acled.tailfit import fit_power_law
+
+    def compute():
+        rows = load_result_cache(store_version()).get(filters, compute_filter_result).rows
+        return fit_power_law(load_data(partition_key(filters))["fatalities"].to_numpy()[rows])
+
+    return warmup.shared("tail_fit", filter_signature(filters), compute)
 
 # ---------------- Page Navigation ----------------
 overview = st.Page(
@@ -71,97 +245,182 @@ conclusions = st.Page(
 nav = st.navigation([overview, cluster_insights, pareto_modelling, conclusions])
 current_page = nav.title
 
-# ---------------- Sidebar (filters) ----------------
-with st.sidebar:
-    st.header("Filters")
-
-    # Event type filter
-    event_types = sorted(df["event_type"].dropna().unique())
-    selected_event_types = st.multiselect(
-        "Event Type",
-        options=event_types,
-        default=event_types
-    )
-
-    # Region filter
-    regions = sorted(df["region"].dropna().unique())
-    selected_regions = st.multiselect(
-        "Region",
-        options=regions,
-        default=regions
-    )
-
-    # Cluster filter (top 15 most frequent)
-    selected_clusters = st.multiselect(
-        "Cluster (Top 15 by Size)",
-        options=top_15_clusters,
-        default=top_15_clusters
-    )
-
-    # Year range filter
-    min_year = int(df["event_date"].dt.year.min())
-    max_year = int(df["event_date"].dt.year.max())
-
-    selected_years = st.slider(
-        "Year Range",
-        min_value=min_year,
-        max_value=max_year,
-        value=(min_year, max_year)
-    )
-
-    severity_levels = [
-        "Low (0-3)",
-        "Moderate (4-10)",
-        "High (11-50)",
-        "Extreme (50+)"
+# ---------------- Diagnostics ----------------
+# per-stage timings of this rerun, off unless the ACLED_DIAGNOSTICS environment
+# variable or the ?diagnostics= query parameter is set (1, or memory to also
+# trace allocations, from the environment only; see acled/diagnostics.py)
+diagnostics_mode = select_mode(os.environ.get("ACLED_DIAGNOSTICS", ""), st.query_params.get("diagnostics", ""))
+diagnostics = Recorder(diagnostics_mode, current_page)
+st.session_state["diagnostics"] = diagnostics
+
+def show_diagnostics(recorder):
+    """Sidebar panel and structured log lines of the rerun's stages."""
+    if not recorder.enabled:
+        return
+    recorder.log()
+    rows = [
+        {"stage": "· " * record["depth"] + record["stage"], "ms": record["ms"], "rows": record["rows"],
+         **({"allocated MB": round(record["allocated_bytes"] / 1024**2, 2)} if recorder.mode == "memory" else {})}
+        for record in recorder.records()
     ]
+    with st.sidebar.expander("Diagnostics", expanded=True):
+        st.dataframe(rows, hide_index=True)
 
-    selected_severity = st.multiselect(
-        "Fatality Severity",
-        options=severity_levels,
-        default=severity_levels
-    )
+# pages that read the filtered data; the others are rendered without loading it
+data_pages = [overview.title, cluster_insights.title, pareto_modelling.title]
+needs_data = current_page in data_pages
 
+# ---------------- Sidebar (filters) ----------------
+# Selections are kept in st.session_state["global_filters"], so they survive
+# visits to pages that don't render the filter widgets.
+saved_filters = st.session_state.get("global_filters", {})
 
-# ---------------- Apply Filters Through Function ----------------
-
-def apply_filters(df_in: pd.DataFrame) -> pd.DataFrame:
-    df_out = df_in.copy()
-
-    if selected_event_types:
-        df_out = df_out[df_out["event_type"].isin(selected_event_types)]
-
-    if selected_regions:
-        df_out = df_out[df_out["region"].isin(selected_regions)]
-
-    if selected_clusters:
-        df_out = df_out[df_out["cluster"].isin(selected_clusters)]
-    
-    if selected_severity:
-        df_out = df_out[df_out["fatality_severity"].isin(selected_severity)]
-
-    df_out = df_out[
-        (df_out["event_date"].dt.year >= selected_years[0]) &
-        (df_out["event_date"].dt.year <= selected_years[1])
-    ]
-    
-    return df_out
-
+with st.sidebar:
+    st.header("Filters")
 
-# Save filtered df for all pages
-st.session_state['filtered_df'] = apply_filters(df)
+    if not needs_data:
+        st.caption(f"Filters apply to the {' and '.join(data_pages)} pages.")
 
-# Show number of events after filtering
-st.sidebar.info(f"**Events after filtering: {st.session_state['filtered_df'].shape[0]}**")
+    else:
+        with diagnostics.stage("filter options"):
+            options = load_filter_options(store_version())
+
+        # Event type filter
+        event_types = options["event_types"]
+        st.session_state.setdefault("filter_event_type", saved_filters.get("event_type", event_types))
+        selected_event_types = st.multiselect(
+            "Event Type",
+            options=event_types,
+            key="filter_event_type"
+        )
+
+        # Region filter
+        regions = options["regions"]
+        st.session_state.setdefault("filter_regions", saved_filters.get("regions", regions))
+        selected_regions = st.multiselect(
+            "Region",
+            options=regions,
+            key="filter_regions"
+        )
+
+        # Cluster filter (top 15 most frequent)
+        top_15_clusters = options["top_15_clusters"]
+        st.session_state.setdefault("filter_clusters", saved_filters.get("clusters", top_15_clusters))
+        selected_clusters = st.multiselect(
+            "Cluster (Top 15 by Size)",
+            options=top_15_clusters,
+            key="filter_clusters"
+        )
+
+        # Date range filter
+        first_date, last_date = options["date_range"]
+        st.session_state.setdefault("filter_dates", saved_filters.get("date_range", (first_date, last_date)))
+        selected_dates = st.slider(
+            "Date Range",
+            min_value=first_date,
+            max_value=last_date,
+            format="YYYY-MM-DD",
+            key="filter_dates"
+        )
+
+        severity_levels = options["severity_levels"]
+        st.session_state.setdefault(
+            "filter_severity", saved_filters.get("fatality_severity", severity_levels)
+        )
+        selected_severity = st.multiselect(
+            "Fatality Severity",
+            options=severity_levels,
+            key="filter_severity"
+        )
+
+        # Actor filter: names starting with the typed text, from the inverted
+        # actor index of the data the selected years and regions load
+        with diagnostics.stage("actor search"):
+            actor_index = load_filter_index(
+                partition_key({"date_range": selected_dates, "regions": selected_regions})).actors
+        if actor_index is None:
+            selected_actors = []
+        else:
+            st.session_state.setdefault("filter_actors", saved_filters.get("actors", []))
+            actor_prefix = st.text_input("Find actors", key="filter_actor_prefix",
+                                         placeholder="Name starts with...")
+            matches = actor_index.search(actor_prefix) if actor_prefix.strip() else []
+            selected_actors = st.multiselect(
+                "Actor (either side)",
+                options=list(dict.fromkeys(st.session_state["filter_actors"] + matches)),
+                key="filter_actors",
+                help="Events naming any of the selected actors as actor1 or actor2. Empty: all events."
+            )
+
+if needs_data:
+    # ---------------- Save global filters to session_state ----------------
+    st.session_state['global_filters'] = {
+        "event_type": selected_event_types,
+        "regions": selected_regions,
+        "clusters": selected_clusters,
+        'fatality_severity': selected_severity,
+        "date_range": selected_dates,
+        "actors": selected_actors
+    }
+
+    # ---------------- Filtered data for the data pages ----------------
+    from acled.view import FrameView
+
+    partition = partition_key(st.session_state['global_filters'])
+    actors = actor_key(st.session_state['global_filters'])
+    with diagnostics.stage("load data") as stage:
+        frame = load_data(partition)
+        stage.rows = len(frame)
+
+    result_cache = load_result_cache(store_version())
+    with diagnostics.stage("apply filters") as stage:
+        filter_result = result_cache.get(st.session_state['global_filters'], compute_filter_result)
+        stage.rows = len(filter_result.rows)
+
+    # Save filtered rows for all pages, as a read-only view over the shared frame
+    st.session_state['filtered_df'] = FrameView(frame, filter_result.rows)
+    st.session_state['filtered_cells'] = filter_result.cells
+    with diagnostics.stage("time index"):
+        st.session_state["cube"] = load_actor_cube(partition, actors) if actors else load_cube(partition)
+
+    # Show number of events after filtering
+    st.sidebar.info(f"**Events after filtering: {len(st.session_state['filtered_df'])}**")
+
+    with st.sidebar.expander("Filter cache", expanded=False):
+        st.json(result_cache.stats())
+
+    # progress of the server-start warm-up, when the server was started with it
+    from acled import warmup
+    if warmup.status()["state"] != "off":
+        with st.sidebar.expander("Warm-up", expanded=False):
+            st.json(warmup.status())
+
+    if current_page == overview.title:
+        with diagnostics.stage("spatial grid"):
+            st.session_state["grid"] = load_actor_grid(partition, actors) if actors else load_grid(partition)
+
+    if current_page == cluster_insights.title:
+        with diagnostics.stage("tail table"):
+            st.session_state["tail_table"] = load_tail_table(tail_table_version())
+        with diagnostics.stage("cluster profiles"):
+            if actors:
+                st.session_state["profiles"] = load_actor_profiles(partition, actors)
+            else:
+                profiles = load_saved_profiles(profiles_version(), store_version(), deploy_csv_version())
+                st.session_state["profiles"] = profiles if profiles is not None else load_profiles(partition)
+
+    if current_page == pareto_modelling.title:
+        with diagnostics.stage("tail fit"):
+            try:
+                st.session_state["tail_fit"] = load_fit_cache(store_version()).get(
+                    st.session_state['global_filters'], compute_tail_fit)
+            except ValueError:
+                # too few distinct fatality counts in the selection
+                st.session_state["tail_fit"] = None
+
+    # ---------------- Global top 15 clusters ----------------
+    st.session_state["top_15_clusters"] = top_15_clusters
 
-# ---------------- Save global filters to session_state ----------------
-st.session_state['global_filters'] = {
-    "event_type": selected_event_types,
-    "regions": selected_regions,
-    "clusters": selected_clusters,
-    'fatality_severity': selected_severity,
-    "year_range": selected_years
-}
 # ---------------- Global Color Settings ----------------
 severity_colors = {
     "Low (0-3)": "#91cfff",        # light blue
@@ -172,8 +431,9 @@ severity_colors = {
 
 st.session_state["severity_colors"] = severity_colors
 
-# ---------------- Global top 15 clusters ----------------
-st.session_state["top_15_clusters"] = top_15_clusters
-
-# Run the navigation
-nav.run()
\ No newline at end of file
+# Run the navigation (the page may end the run early with st.stop())
+try:
+    with diagnostics.stage(f"page: {current_page}"):
+        nav.run()
+finally:
+    show_diagnostics(diagnostics)